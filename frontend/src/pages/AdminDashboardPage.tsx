@@ -30,60 +30,58 @@ import { useNavigate } from 'react-router-dom';
 const { Content } = Layout;
 const { Title, Text } = Typography;
 
-interface Agente {
-  id: number;
-  username: string;
-  first_name: string;
-  last_name: string;
-  email: string;
-}
-
-interface Poliza {
+interface PolizaReciente {
   id: number;
   numero_poliza: string;
   estado: string;
-  suma_asegurada: string;
   prima_anual: string;
-  cliente_info: {
-    usuario_info: {
-      first_name: string;
-      last_name: string;
-    };
-  };
+  cliente: string;
 }
 
-interface Siniestro {
+interface SiniestroReciente {
   id: number;
   numero_siniestro: string;
   estado: string;
-  monto_reclamado: string;
   tipo_siniestro: string;
-  poliza_info: {
-    numero_poliza: string;
-  };
+  monto_reclamado: string;
+  numero_poliza: string;
 }
 
-interface Cliente {
+interface AgenteReciente {
   id: number;
-  usuario_info: {
-    first_name: string;
-    last_name: string;
-    email: string;
-  };
+  username: string;
+  first_name: string;
+  last_name: string;
+  email: string;
+}
+
+// Respuesta de /api/admin/dashboard-stats/ (los totales se calculan en el servidor)
+interface AdminStats {
+  total_agentes: number;
+  total_clientes: number;
+  total_polizas: number;
+  total_siniestros: number;
+  polizas_activas: number;
+  polizas_cotizacion: number;
+  siniestros_pendientes: number;
+  siniestros_aprobados: number;
+  total_primas: string;
+  total_reclamado: string;
+  polizas_por_estado: { [key: string]: number };
+  ultimas_polizas: PolizaReciente[];
+  ultimos_siniestros: SiniestroReciente[];
+  agentes_recientes: AgenteReciente[];
 }
 
 const AdminDashboardPage: React.FC = () => {
-  const [agentes, setAgentes] = useState<Agente[]>([]);
-  const [polizas, setPolizas] = useState<Poliza[]>([]);
-  const [siniestros, setSiniestros] = useState<Siniestro[]>([]);
-  const [clientes, setClientes] = useState<Cliente[]>([]);
+  const [stats, setStats] = useState<AdminStats | null>(null);
   const [loading, setLoading] = useState(true);
   const navigate = useNavigate();
 
   const getToken = () => localStorage.getItem('accessToken');
 
   useEffect(() => {
-    const fetchAllData = async () => {
+    const fetchStats = async () => {
       setLoading(true);
       try {
         const token = getToken();
@@ -94,29 +92,9 @@ const AdminDashboardPage: React.FC = () => {
         }
         const headers = { Authorization: `Bearer ${token}` };
 
-        // Hacer peticiones con manejo de errores individual
-        const requests = [
-          axios.get('https://proyecto-univida2.onrender.com/api/agentes/', { headers }),
-          axios.get('https://proyecto-univida2.onrender.com/api/polizas/', { headers }),
-          axios.get('https://proyecto-univida2.onrender.com/api/siniestros/', { headers }),
-          axios.get('https://proyecto-univida2.onrender.com/api/clientes/', { headers })
-        ];
-
-        const responses = await Promise.allSettled(requests);
-
-        // Procesar respuestas individualmente
-        responses.forEach((response, index) => {
-          if (response.status === 'fulfilled') {
-            switch (index) {
-              case 0: setAgentes(response.value.data); break;
-              case 1: setPolizas(response.value.data); break;
-              case 2: setSiniestros(response.value.data); break;
-              case 3: setClientes(response.value.data); break;
-            }
-          } else {
-            console.warn(`Error cargando datos del índice ${index}:`, response.reason);
-          }
-        });
+        // Una sola petición con los totales ya agregados
+        const response = await axios.get('https://proyecto-univida2.onrender.com/api/admin/dashboard-stats/', { headers });
+        setStats(response.data);
 
       } catch (error: any) {
         console.error('Error general al cargar datos:', error);
@@ -126,54 +104,30 @@ const AdminDashboardPage: React.FC = () => {
       }
     };
 
-    fetchAllData();
+    fetchStats();
   }, []);
 
   // Calcular estadísticas
-  const dashboardStats = useMemo(() => {
-    const polizasActivas = polizas.filter(p => p.estado === 'activa').length;
-    const polizasCotizacion = polizas.filter(p => p.estado === 'cotizacion').length;
-    const siniestrosPendientes = siniestros.filter(s => 
-      s.estado === 'reportado' || s.estado === 'en_revision'
-    ).length;
-    const siniestrosAprobados = siniestros.filter(s => s.estado === 'aprobado').length;
-    
-    const totalPrimas = polizas.reduce((sum, poliza) => 
-      sum + parseFloat(poliza.prima_anual || '0'), 0
-    );
-    
-    const totalReclamado = siniestros.reduce((sum, siniestro) => 
-      sum + parseFloat(siniestro.monto_reclamado || '0'), 0
-    );
-
-    // Distribución de pólizas por estado
-    const distribucionPolizas = polizas.reduce((acc, poliza) => {
-      const estado = poliza.estado || 'desconocido';
-      acc[estado] = (acc[estado] || 0) + 1;
-      return acc;
-    }, {} as { [key: string]: number });
-
-    return {
-      totalAgentes: agentes.length,
-      totalClientes: clientes.length,
-      totalPolizas: polizas.length,
-      totalSiniestros: siniestros.length,
-      polizasActivas,
-      polizasCotizacion,
-      siniestrosPendientes,
-      siniestrosAprobados,
-      totalPrimas,
-      totalReclamado,
-      distribucionPolizas
-    };
-  }, [agentes, clientes, polizas, siniestros]);
+  const dashboardStats = useMemo(() => ({
+    totalAgentes: stats?.total_agentes ?? 0,
+    totalClientes: stats?.total_clientes ?? 0,
+    totalPolizas: stats?.total_polizas ?? 0,
+    totalSiniestros: stats?.total_siniestros ?? 0,
+    polizasActivas: stats?.polizas_activas ?? 0,
+    polizasCotizacion: stats?.polizas_cotizacion ?? 0,
+    siniestrosPendientes: stats?.siniestros_pendientes ?? 0,
+    siniestrosAprobados: stats?.siniestros_aprobados ?? 0,
+    totalPrimas: parseFloat(stats?.total_primas || '0'),
+    totalReclamado: parseFloat(stats?.total_reclamado || '0'),
+    distribucionPolizas: stats?.polizas_por_estado ?? {}
+  }), [stats]);
 
   // Obtener últimos registros para mostrar
   const ultimosRegistros = useMemo(() => ({
-    ultimasPolizas: polizas.slice(-5).reverse(),
-    ultimosSiniestros: siniestros.slice(-5).reverse(),
-    agentesRecientes: agentes.slice(-5).reverse()
-  }), [polizas, siniestros, agentes]);
+    ultimasPolizas: stats?.ultimas_polizas ?? [],
+    ultimosSiniestros: stats?.ultimos_siniestros ?? [],
+    agentesRecientes: stats?.agentes_recientes ?? []
+  }), [stats]);
 
   if (loading) {
     return (
@@ -348,7 +302,7 @@ const AdminDashboardPage: React.FC = () => {
                       }
                       description={
                         <div>
-                          <div>{poliza.cliente_info?.usuario_info?.first_name} {poliza.cliente_info?.usuario_info?.last_name}</div>
+                          <div>{poliza.cliente}</div>
                           <Tag color={poliza.estado === 'activa' ? 'green' : 'orange'}>
                             {poliza.estado}
                           </Tag>
@@ -384,7 +338,7 @@ const AdminDashboardPage: React.FC = () => {
                       }
                       description={
                         <div>
-                          <div>Póliza: {siniestro.poliza_info?.numero_poliza}</div>
+                          <div>Póliza: {siniestro.numero_poliza}</div>
                           <div>
                             <Tag color={
                               siniestro.estado === 'reportado' ? 'red' : 
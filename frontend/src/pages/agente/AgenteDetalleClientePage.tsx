@@ -44,7 +44,7 @@ const AgenteDetalleClientePage: React.FC = () => {
         setCliente(resCliente.data);
 
         // 2. Cargar Pólizas de este Cliente
-        const resPolizas = await axios.get('https://proyecto-univida2.onrender.com/api/polizas/', { headers });
+        const resPolizas = await axios.get('https://proyecto-univida2.onrender.com/api/polizas/', { headers, params: { cliente_id: id } });
         // Filtro robusto: revisa ID de cliente directo o anidado
         const misPolizas = resPolizas.data.filter((p: any) => 
             p.cliente === parseInt(id!) || p.cliente_info?.id === parseInt(id!)
@@ -42,7 +42,7 @@ const AgenteSolicitudesPage: React.FC = () => {
       if (!token) return;
       const headers = { Authorization: `Bearer ${token}` };
       
-      const response = await axios.get('https://proyecto-univida2.onrender.com/api/polizas/', { headers });
+      const response = await axios.get('https://proyecto-univida2.onrender.com/api/polizas/', { headers, params: { estado: 'cotizacion' } });
       
       // Filtramos solo las que están en cotización (y opcionalmente canceladas si quieres verlas)
       const filtradas = response.data.filter((p: any) => 
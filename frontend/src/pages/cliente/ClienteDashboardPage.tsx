@@ -56,16 +56,18 @@ const ClienteDashboardPage: React.FC = () => {
         const headers = { Authorization: `Bearer ${token}` };
         const decodedToken: any = jwtDecode(token);
         const miUsername = decodedToken.username;
+        // Filtrado en el servidor por el cliente del token
+        const porCliente = decodedToken.cliente_id ? { cliente_id: decodedToken.cliente_id } : {};
 
         // 1. Cargar Pólizas
-        const resPolizas = await axios.get('https://proyecto-univida2.onrender.com/api/polizas/', { headers });
+        const resPolizas = await axios.get('https://proyecto-univida2.onrender.com/api/polizas/', { headers, params: porCliente });
         const miPolizaEncontrada = resPolizas.data.find((p: any) => 
             p.cliente_info?.usuario_info?.username === miUsername &&
             p.estado !== 'cancelada'
         );
         
         // 2. Cargar Siniestros (Independiente de si hay póliza activa o no, queremos ver el historial)
-        const resSiniestros = await axios.get('https://proyecto-univida2.onrender.com/api/siniestros/', { headers });
+        const resSiniestros = await axios.get('https://proyecto-univida2.onrender.com/api/siniestros/', { headers, params: porCliente });
         const misSiniestros = resSiniestros.data.filter((s: any) => 
             s.poliza_info?.cliente_info?.usuario_info?.username === miUsername
         );
@@ -75,11 +77,10 @@ const ClienteDashboardPage: React.FC = () => {
             setPoliza(miPolizaEncontrada);
 
             // 3. Cargar Pagos y Facturas
-            const resPagos = await axios.get('https://proyecto-univida2.onrender.com/api/pagos/', { headers });
-            const misPagos = resPagos.data.filter((p: any) => p.factura_info?.poliza_id === miPolizaEncontrada.id);
-            setPagos(misPagos);
+            const resPagos = await axios.get('https://proyecto-univida2.onrender.com/api/pagos/', { headers, params: { poliza_id: miPolizaEncontrada.id } });
+            setPagos(resPagos.data);
             
-            const resFacturas = await axios.get(`https://proyecto-univida2.onrender.com/api/facturas/?poliza_id=${miPolizaEncontrada.id}`, { headers });
+            const resFacturas = await axios.get('https://proyecto-univida2.onrender.com/api/facturas/', { headers, params: { poliza_id: miPolizaEncontrada.id } });
             setFacturas(resFacturas.data);
         } else {
             setPoliza(null);
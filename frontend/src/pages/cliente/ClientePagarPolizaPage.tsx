@@ -72,32 +72,63 @@ const ClientePagarPolizaPage: React.FC = () => {
       }
   };
 
-  // 3. POLLING: Escuchar si el pago se completó
+  // 3. ESPERAR LA CONFIRMACIÓN: se pregunta cada 3 segundos. Si el servidor
+  // corre por ASGI (responde en_vivo: true) se pasa a server-sent events y
+  // el servidor avisa apenas el pago se completa.
   useEffect(() => {
-      let interval: NodeJS.Timeout;
-      
-      if (esperandoConfirmacion && pagoId) {
-          interval = setInterval(async () => {
-              try {
-                  const token = getToken();
-                  const headers = { Authorization: `Bearer ${token}` };
-                  const res = await axios.get(`https://proyecto-univida2.onrender.com/api/pagos/estado/${pagoId}/`, { headers });
-                  
-                  if (res.data.status === 'completado') {
-                      clearInterval(interval);
-                      setEsperandoConfirmacion(false);
-                      message.success("¡Pago confirmado automáticamente!");
-                      
-                      // Esperar un momento para que el usuario vea el éxito
-                      setTimeout(() => window.location.reload(), 2000);
-                  }
-              } catch (e) {
-                  console.error("Error verificando pago");
+      if (!esperandoConfirmacion || !pagoId) return;
+
+      const token = getToken();
+      const headers = { Authorization: `Bearer ${token}` };
+      let interval: NodeJS.Timeout | undefined;
+      let eventos: EventSource | undefined;
+      let cerrado = false;
+
+      const confirmado = () => {
+          if (interval) clearInterval(interval);
+          eventos?.close();
+          setEsperandoConfirmacion(false);
+          message.success("¡Pago confirmado automáticamente!");
+
+          // Esperar un momento para que el usuario vea el éxito
+          setTimeout(() => window.location.reload(), 2000);
+      };
+
+      const escucharEventos = () => {
+          // EventSource no manda headers: el token va en la URL
+          eventos = new EventSource(
+              `https://proyecto-univida2.onrender.com/api/pagos/estado/${pagoId}/eventos/?token=${encodeURIComponent(token || '')}`
+          );
+          eventos.onmessage = (evento) => {
+              if (JSON.parse(evento.data).status === 'completado') confirmado();
+          };
+          // Si se corta, EventSource se reconecta solo (cada 3 segundos)
+          eventos.onerror = () => console.error("Conexión de estado del pago interrumpida, reintentando...");
+      };
+
+      const verificar = async () => {
+          try {
+              const res = await axios.get(`https://proyecto-univida2.onrender.com/api/pagos/estado/${pagoId}/`, { headers });
+              if (cerrado) return;
+              if (res.data.status === 'completado') {
+                  confirmado();
+              } else if (res.data.en_vivo && !eventos) {
+                  if (interval) clearInterval(interval);
+                  escucharEventos();
               }
-          }, 3000); // Preguntar cada 3 segundos
-      }
-
-      return () => clearInterval(interval);
+          } catch (e) {
+              console.error("Error verificando pago");
+          }
+      };
+
+      verificar();
+      interval = setInterval(verificar, 3000); // Preguntar cada 3 segundos
+
+      return () => {
+          cerrado = true;
+          if (interval) clearInterval(interval);
+          eventos?.close();
+      };
   }, [esperandoConfirmacion, pagoId]);
 
 
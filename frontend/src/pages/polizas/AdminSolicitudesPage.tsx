@@ -30,7 +30,7 @@ const AdminSolicitudesPage: React.FC = () => {
       const headers = { Authorization: `Bearer ${token}` };
 
       // Cargar Pólizas
-      const resPolizas = await axios.get('https://proyecto-univida2.onrender.com/api/polizas/', { headers });
+      const resPolizas = await axios.get('https://proyecto-univida2.onrender.com/api/polizas/', { headers, params: { estado: 'cotizacion' } });
       // Filtrar solo las que están en cotización (sin asignar o pendientes)
       const pendientes = resPolizas.data.filter((p: any) => p.estado === 'cotizacion');
       setSolicitudes(pendientes);
@@ -1,5 +1,10 @@
-from django.contrib import admin
+import tempfile
+
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
+from django.http import FileResponse
+from django.utils import timezone
+from . import busqueda, lote_documentos
 from .models import Usuario, Cliente, Poliza, Beneficiario, Agente, Factura, Pago, Siniestro, NotaPoliza
 
 # Configuración personalizada para Usuario
@@ -24,17 +29,43 @@ class ClienteAdmin(admin.ModelAdmin):
         return f"{obj.usuario.first_name} {obj.usuario.last_name}"
     get_nombre.short_description = 'Nombre Completo'
 
+    def get_search_results(self, request, queryset, search_term):
+        # Usa el índice del buscador en vez de icontains sobre tres columnas
+        if not search_term:
+            return queryset, False
+        return busqueda.buscar_clientes(queryset, search_term, limite=None), False
+
 # Configuración para Póliza
 @admin.register(Poliza)
 class PolizaAdmin(admin.ModelAdmin):
     list_display = ('numero_poliza', 'get_cliente', 'suma_asegurada', 'prima_anual', 'estado', 'fecha_inicio')
     list_filter = ('estado', 'fecha_inicio')
     search_fields = ('numero_poliza', 'cliente__usuario__first_name', 'cliente__usuario__last_name')
+    actions = ['descargar_pdfs']
+    # Más que esto de una vez, con el comando generar_pdfs_lote
+    maximo_pdfs = 50
     
     def get_cliente(self, obj):
         return f"{obj.cliente.usuario.first_name} {obj.cliente.usuario.last_name}"
     get_cliente.short_description = 'Cliente'
 
+    @admin.action(description='Descargar PDF de las pólizas seleccionadas (ZIP)')
+    def descargar_pdfs(self, request, queryset):
+        # En este proceso y con tope: nada de pools ni de cerrar conexiones
+        # dentro de un worker web. Los lotes grandes, con el comando
+        ids = list(queryset.order_by('id').values_list('id', flat=True)[:self.maximo_pdfs + 1])
+        if len(ids) > self.maximo_pdfs:
+            self.message_user(request, f'Se pueden descargar hasta {self.maximo_pdfs} pólizas de una vez. '
+                                       'Para más, usar el comando generar_pdfs_lote.', messages.ERROR)
+            return None
+        archivo = tempfile.TemporaryFile()
+        resumen = lote_documentos.generar_lote(ids, archivo, procesos=1)
+        if resumen['errores']:
+            self.message_user(request, f"{len(resumen['errores'])} pólizas no se pudieron generar.", messages.WARNING)
+        archivo.seek(0)
+        return FileResponse(archivo, as_attachment=True,
+                            filename=f'polizas-{timezone.localtime():%Y%m%d-%H%M%S}.zip')
+
 # Configuración para Beneficiario
 @admin.register(Beneficiario)
 class BeneficiarioAdmin(admin.ModelAdmin):
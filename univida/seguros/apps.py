@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class SegurosConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'seguros'
+
+    def ready(self):
+        # Señales que mantienen al día las estadísticas de los agentes y el buscador
+        from . import signals
+        post_migrate.connect(signals.preparar_busqueda, sender=self)
+        post_migrate.connect(signals.preparar_numeracion, sender=self)
@@ -0,0 +1,243 @@
+# en seguros/autenticacion.py
+"""
+Rol y perfil (Agente / Cliente) del usuario que hace la petición, resueltos
+una sola vez por request.
+
+JWTConPerfil carga el usuario del token con select_related('agente',
+'cliente'): una consulta con dos LEFT JOIN en vez de la del usuario más
+las de cada hasattr(request.user, 'agente') / Cliente.objects.get(...).
+Las vistas leen el resultado con perfil_de(request).
+
+JWTSinConsulta (opcional, ver AUTENTICACION_JWT en settings) no va a la BD:
+arma el usuario con los claims del token (rol, agente_id, cliente_id...).
+Para que desactivar a alguien o cambiarle el rol siga teniendo efecto, las
+señales llaman a revocar() y cada petición mira la lista de revocados en la
+cache. Cada entrada vive lo que dura un refresh token: pasado ese tiempo no
+queda ningún token de antes de la revocación.
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.settings import api_settings as drf_settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .models import Agente, Cliente, Usuario
+
+
+# Claim con el momento del login (en microsegundos). Se copia del refresh al
+# access token, así que sirve para revocar también los tokens renovados.
+CLAIM_SESION = 'sesion'
+
+
+@dataclass
+class Perfil:
+    usuario_id: Optional[int]
+    rol: Optional[str]
+    es_staff: bool = False
+    agente_id: Optional[int] = None
+    cliente_id: Optional[int] = None
+    # Los objetos vienen ya cargados con JWTConPerfil; con JWTSinConsulta se
+    # buscan la primera vez que una vista los pide
+    _agente: Optional[Agente] = field(default=None, repr=False)
+    _cliente: Optional[Cliente] = field(default=None, repr=False)
+
+    @property
+    def agente(self) -> Optional[Agente]:
+        if self._agente is None and self.agente_id is not None:
+            self._agente = Agente.objects.select_related('usuario').filter(pk=self.agente_id).first()
+        return self._agente
+
+    @property
+    def cliente(self) -> Optional[Cliente]:
+        if self._cliente is None and self.cliente_id is not None:
+            self._cliente = Cliente.objects.select_related('usuario').filter(pk=self.cliente_id).first()
+        return self._cliente
+
+    @property
+    def es_admin(self) -> bool:
+        return self.rol == 'ADMIN'
+
+    @property
+    def es_agente(self) -> bool:
+        # Como el antiguo hasattr(request.user, 'agente'): lo que cuenta es tener perfil
+        return self.agente_id is not None
+
+    @property
+    def es_cliente(self) -> bool:
+        return self.cliente_id is not None
+
+
+ANONIMO = Perfil(usuario_id=None, rol=None)
+
+
+def perfil_de(request) -> Perfil:
+    """Perfil del usuario de la petición (se calcula una vez y queda en el request)."""
+    perfil = getattr(request, '_perfil', None)
+    if perfil is None:
+        perfil = _construir(getattr(request, 'user', None))
+        request._perfil = perfil
+    return perfil
+
+
+def _construir(usuario):
+    if usuario is None or not usuario.is_authenticated:
+        return ANONIMO
+    if isinstance(usuario, UsuarioToken):
+        return Perfil(usuario_id=usuario.pk, rol=usuario.rol, es_staff=usuario.is_staff,
+                      agente_id=usuario.agente_id, cliente_id=usuario.cliente_id)
+
+    cargados = usuario._state.fields_cache
+    if 'agente' not in cargados or 'cliente' not in cargados:
+        # Autenticado por otra vía (sesión del admin, tests): misma consulta con los JOIN
+        completo = Usuario.objects.select_related('agente', 'cliente').filter(pk=usuario.pk).first()
+        cargados = completo._state.fields_cache if completo is not None else {}
+    agente, cliente = cargados.get('agente'), cargados.get('cliente')
+    return Perfil(
+        usuario_id=usuario.pk,
+        rol=usuario.rol,
+        es_staff=usuario.is_staff,
+        agente_id=agente.id if agente else None,
+        cliente_id=cliente.id if cliente else None,
+        _agente=agente,
+        _cliente=cliente,
+    )
+
+
+class JWTConPerfil(JWTAuthentication):
+    """JWTAuthentication que trae el agente y el cliente en la misma consulta del usuario."""
+
+    def get_user(self, validated_token):
+        # Igual que JWTAuthentication.get_user() pero con select_related
+        try:
+            usuario_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken('El token no identifica a ningún usuario') from e
+
+        try:
+            usuario = (Usuario.objects.select_related('agente', 'cliente')
+                       .get(**{api_settings.USER_ID_FIELD: usuario_id}))
+        except Usuario.DoesNotExist as e:
+            raise AuthenticationFailed('Usuario no encontrado', code='user_not_found') from e
+
+        if api_settings.CHECK_USER_IS_ACTIVE and not usuario.is_active:
+            raise AuthenticationFailed('Usuario inactivo', code='user_inactive')
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(usuario.password):
+                raise AuthenticationFailed('La contraseña del usuario cambió', code='password_changed')
+
+        return usuario
+
+
+# --- Modo sin consulta ---
+
+def marca_sesion():
+    return time.time_ns() // 1000
+
+
+def _cache():
+    return caches[getattr(settings, 'CACHE_REVOCACIONES', 'default')]
+
+
+def _clave_revocado(usuario_id):
+    return f'jwt:revocado:{usuario_id}'
+
+
+def revocar(usuario_id):
+    """Invalida todas las sesiones de `usuario_id` abiertas hasta ahora."""
+    duracion = api_settings.REFRESH_TOKEN_LIFETIME.total_seconds()
+    _cache().set(_clave_revocado(usuario_id), marca_sesion(), int(duracion) + 60)
+
+
+def revocado(usuario_id, sesion):
+    desde = _cache().get(_clave_revocado(usuario_id))
+    return desde is not None and sesion <= desde
+
+
+class UsuarioToken(TokenUser):
+    """Usuario armado con los claims de MyTokenObtainPairSerializer, sin tocar la BD."""
+
+    # simplejwt guarda el id como texto; las vistas lo comparan con ids de la BD
+    @property
+    def id(self):
+        return int(self.token[api_settings.USER_ID_CLAIM])
+
+    @property
+    def pk(self):
+        return self.id
+
+    @property
+    def rol(self):
+        return self.token.get('rol')
+
+    @property
+    def first_name(self):
+        return self.token.get('first_name', '')
+
+    @property
+    def last_name(self):
+        return self.token.get('last_name', '')
+
+    @property
+    def email(self):
+        return self.token.get('email', '')
+
+    @property
+    def agente_id(self):
+        return self.token.get('agente_id')
+
+    @property
+    def cliente_id(self):
+        return self.token.get('cliente_id')
+
+
+class JWTSinConsulta(JWTConPerfil):
+    """
+    Autenticación sin consulta a la BD: el usuario sale del token. Sirve para
+    las vistas que solo miran el rol y los ids (request.user no es un
+    Usuario, no se puede asignar a una FK ni guardar).
+    """
+
+    def get_user(self, validated_token):
+        if CLAIM_SESION not in validated_token:
+            # Token emitido antes de este modo: no trae agente_id/cliente_id
+            return super().get_user(validated_token)
+
+        try:
+            usuario_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken('El token no identifica a ningún usuario') from e
+
+        if revocado(usuario_id, validated_token[CLAIM_SESION]):
+            raise AuthenticationFailed('La sesión fue revocada', code='token_revoked')
+        return UsuarioToken(validated_token)
+
+
+# --- Vistas fuera de DRF (SSE / long-poll) ---
+
+def usuario_de(request):
+    """
+    Usuario del token para las vistas async que no pasan por DRF, con la
+    misma clase de autenticación que el resto de la API. Acepta el header
+    Authorization o ?token= (EventSource no deja mandar headers). None si
+    no hay token o no vale.
+    """
+    clase = next((c for c in drf_settings.DEFAULT_AUTHENTICATION_CLASSES
+                  if issubclass(c, JWTAuthentication)), JWTConPerfil)
+    autenticador = clase()
+    crudo = request.GET.get('token')
+    try:
+        if crudo:
+            return autenticador.get_user(autenticador.get_validated_token(crudo.encode()))
+        resultado = autenticador.authenticate(request)
+    except AuthenticationFailed:
+        return None
+    return resultado[0] if resultado else None
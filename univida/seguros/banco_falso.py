@@ -0,0 +1,93 @@
+# en seguros/banco_falso.py
+"""
+Banco de mentira para probar la ingesta de confirmaciones (comando
+banco_falso y tests).
+
+Hace lo que hace un banco de verdad: manda los callbacks firmados en
+ráfagas, desordenados y repitiendo algunos (reintentos). Se le pasa cómo
+enviar: enviar_local() llama a la vista directamente, enviar_http(url) va
+por la red a un servidor levantado.
+"""
+import json
+import random
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from . import confirmaciones
+
+RUTA = '/api/pagos/confirmaciones/'
+
+
+def enviar_local():
+    from rest_framework.test import APIRequestFactory
+    from .views import recibir_confirmaciones_pago
+
+    fabrica = APIRequestFactory()
+
+    def enviar(cuerpo, firma):
+        peticion = fabrica.post(RUTA, cuerpo, content_type='application/json',
+                                headers={confirmaciones.CABECERA_FIRMA: firma})
+        return recibir_confirmaciones_pago(peticion).status_code
+    return enviar
+
+
+def enviar_http(url, timeout=10):
+    import requests
+
+    sesion = requests.Session()
+
+    def enviar(cuerpo, firma):
+        respuesta = sesion.post(url, data=cuerpo, timeout=timeout, headers={
+            'Content-Type': 'application/json', confirmaciones.CABECERA_FIRMA: firma})
+        return respuesta.status_code
+    return enviar
+
+
+class BancoFalso:
+    def __init__(self, enviar, secreto, semilla=42):
+        self.enviar = enviar
+        self.secreto = secreto
+        self.azar = random.Random(semilla)
+
+    def callback(self, referencia, monto=None, estado='completado'):
+        """(cuerpo, firma) de un callback como los del banco."""
+        datos = {'referencia': referencia, 'estado': estado}
+        if monto is not None:
+            datos['monto'] = str(monto)
+        cuerpo = json.dumps(datos).encode()
+        return cuerpo, confirmaciones.firmar(cuerpo, self.secreto)
+
+    def rafagas(self, pagos, por_rafaga=50, reintentos=1, fallidos=0.0):
+        """
+        Callbacks para `pagos` [(referencia, monto)] agrupados en ráfagas.
+        Cada uno sale 1 + reintentos veces; `fallidos` es la fracción que el
+        banco rechaza. Todo desordenado.
+        """
+        callbacks = []
+        for referencia, monto in pagos:
+            estado = 'fallido' if self.azar.random() < fallidos else 'completado'
+            callbacks += [self.callback(referencia, monto, estado)] * (1 + reintentos)
+        self.azar.shuffle(callbacks)
+        return [callbacks[i:i + por_rafaga] for i in range(0, len(callbacks), por_rafaga)]
+
+    def reproducir(self, rafagas, hilos=1, pausa=0.0, al_terminar_rafaga=None):
+        """
+        Manda las ráfagas (cada una con `hilos` envíos a la vez). Devuelve
+        cuántas respuestas hubo de cada código y el tiempo total.
+        """
+        codigos = Counter()
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=hilos) as pool:
+            for numero, rafaga in enumerate(rafagas, 1):
+                if hilos == 1:
+                    resultados = [self.enviar(cuerpo, firma) for cuerpo, firma in rafaga]
+                else:
+                    resultados = list(pool.map(lambda c: self.enviar(*c), rafaga))
+                codigos.update(resultados)
+                if al_terminar_rafaga:
+                    al_terminar_rafaga(numero, len(rafaga))
+                if pausa:
+                    time.sleep(pausa)
+        return {'enviados': sum(codigos.values()), 'codigos': dict(codigos),
+                'segundos': round(time.perf_counter() - inicio, 3)}
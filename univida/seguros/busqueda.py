@@ -0,0 +1,205 @@
+# en seguros/busqueda.py
+"""
+Búsqueda aproximada de clientes sobre la columna Cliente.busqueda.
+
+La columna guarda "nombre apellido identificacion email" en minúsculas y
+sin tildes (ver normalizar()) y se mantiene desde las señales. Encima va
+un índice de trigramas, distinto según la base de datos:
+
+  PostgreSQL  GIN gin_trgm_ops (extensión pg_trgm) y el operador %> , que
+              tolera errores de tipeo y prefijos.
+  SQLite      tabla virtual FTS5 con tokenizer trigram sincronizada con
+              triggers. Se buscan candidatos que comparten trigramas y se
+              ordenan en Python con la misma similitud que pg_trgm.
+
+En cualquier otro motor se cae a un LIKE por prefijo (sin índice).
+"""
+import re
+import unicodedata
+
+from django.db import connections
+from django.db.models import Case, F, IntegerField, Value, When
+
+TABLA_FTS = 'univida_cliente_fts'
+UMBRAL = 0.3
+CANDIDATOS = 200
+
+
+def normalizar(texto):
+    """Minúsculas, sin tildes y con espacios simples: 'Pérez  ÁLVAREZ' -> 'perez alvarez'."""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return ' '.join(texto.lower().split())
+
+
+def texto_busqueda(first_name, last_name, identificacion, email=''):
+    return normalizar(f'{first_name} {last_name} {identificacion} {email or ""}')
+
+
+def texto_cliente(cliente):
+    usuario = cliente.usuario
+    return texto_busqueda(usuario.first_name, usuario.last_name, cliente.identificacion, usuario.email)
+
+
+def buscar_clientes(queryset, texto, limite=20):
+    """
+    Filtra `queryset` por similitud con `texto`, los más parecidos primero.
+    Con limite=None devuelve todos los que pasan, sin ese orden (el admin
+    ordena a su manera).
+    """
+    consulta = normalizar(texto)
+    if not consulta:
+        return queryset.none()
+
+    vendor = connections[queryset.db].vendor
+    if vendor == 'postgresql':
+        return _buscar_postgres(queryset, consulta, limite)
+    if vendor == 'sqlite' and len(consulta) >= 3:
+        return _buscar_sqlite(queryset, consulta, limite)
+    resultados = queryset.filter(busqueda__startswith=consulta)
+    return resultados if limite is None else resultados.order_by('busqueda')[:limite]
+
+
+def _buscar_postgres(queryset, consulta, limite):
+    # Import diferido: django.contrib.postgres necesita psycopg instalado
+    from django.contrib.postgres.lookups import TrigramWordSimilar
+    from django.contrib.postgres.search import TrigramWordSimilarity
+
+    resultados = queryset.filter(TrigramWordSimilar(F('busqueda'), Value(consulta)))
+    if limite is None:
+        return resultados
+    return (resultados.annotate(similitud=TrigramWordSimilarity(Value(consulta), 'busqueda'))
+            .order_by('-similitud', 'id')[:limite])
+
+
+def _buscar_sqlite(queryset, consulta, limite):
+    conexion = connections[queryset.db]
+    trigramas = sorted({t for palabra in consulta.split() for t in _trigramas_fts(palabra)})
+    if not trigramas:
+        return queryset.none()
+
+    # Los candidatos salen solo de las filas del queryset (p. ej. los clientes
+    # del agente): si se filtrara después del LIMIT, los de otros podrían
+    # llenar los candidatos y dejar fuera a los suyos
+    restriccion, params = _restriccion(queryset)
+    with conexion.cursor() as cursor:
+        # Primero coincidencias exactas (contienen todos los trigramas): no hace falta
+        # ordenarlas en SQLite, así FTS5 corta en cuanto junta los candidatos.
+        # Sin límite (admin) se traen todas (LIMIT -1)
+        cursor.execute(
+            f'SELECT rowid, busqueda FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s{restriccion} LIMIT %s',
+            [' AND '.join(f'"{t}"' for t in trigramas), *params, CANDIDATOS if limite else -1],
+        )
+        filas = dict(cursor.fetchall())
+        if len(filas) < (limite or CANDIDATOS):
+            # Errores de tipeo: cualquiera que comparta trigramas, los que más comparten primero
+            cursor.execute(
+                f'SELECT rowid, busqueda FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s{restriccion} '
+                f'ORDER BY rank LIMIT %s',
+                [' OR '.join(f'"{t}"' for t in trigramas), *params, CANDIDATOS],
+            )
+            filas.update(cursor.fetchall())
+
+    puntuados = sorted(
+        ((similitud_palabra(consulta, texto), rowid) for rowid, texto in filas.items()),
+        key=lambda par: (-par[0], par[1]),
+    )
+    ids = [rowid for puntos, rowid in puntuados if puntos >= UMBRAL][:limite]
+    if not ids:
+        return queryset.none()
+    if limite is None:
+        return queryset.filter(id__in=ids)
+    orden = Case(*[When(id=pk, then=Value(i)) for i, pk in enumerate(ids)], output_field=IntegerField())
+    return queryset.filter(id__in=ids).order_by(orden)
+
+
+def _restriccion(queryset):
+    """(' AND +rowid IN (...)', params) con los ids del queryset, o vacío si no filtra nada."""
+    if not queryset.query.where:
+        return '', []
+    sql, params = queryset.order_by().values('id').query.sql_with_params()
+    # Con '+' SQLite recorre lo que da MATCH y filtra; con 'rowid IN' a secas
+    # haría un MATCH por cada id del queryset (100 veces más lento)
+    return f' AND +rowid IN ({sql})', list(params)
+
+
+def _trigramas_fts(palabra):
+    palabra = palabra.replace('"', '')
+    return [palabra[i:i + 3] for i in range(len(palabra) - 2)]
+
+
+def _trigramas(texto):
+    # Igual que pg_trgm: cada palabra con dos espacios delante y uno detrás
+    resultado = set()
+    for palabra in re.findall(r'\w+', texto):
+        palabra = f'  {palabra} '
+        resultado.update(palabra[i:i + 3] for i in range(len(palabra) - 2))
+    return resultado
+
+
+def similitud_palabra(consulta, texto):
+    """
+    Aproximación de word_similarity() de pg_trgm: la mejor similitud de la
+    consulta contra cualquier tramo de palabras seguidas del texto.
+    """
+    buscados = _trigramas(consulta)
+    if not buscados:
+        return 0.0
+    palabras = texto.split()
+    mejor = 0.0
+    for inicio in range(len(palabras)):
+        tramo = set()
+        for fin in range(inicio, min(len(palabras), inicio + len(consulta.split()) + 1)):
+            tramo |= _trigramas(palabras[fin])
+            comunes = len(buscados & tramo)
+            mejor = max(mejor, comunes / len(buscados | tramo))
+    return mejor
+
+
+# --- Índice (lo usan la migración 0018 y post_migrate) ---
+
+def preparar_indice(conexion):
+    if conexion.vendor == 'postgresql':
+        with conexion.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS cliente_busqueda_trgm_idx '
+                'ON univida_cliente USING gin (busqueda gin_trgm_ops)'
+            )
+    elif conexion.vendor == 'sqlite':
+        with conexion.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM sqlite_master WHERE name LIKE %s", [f'{TABLA_FTS}%'])
+            # La tabla virtual, sus 4 tablas internas y los 3 triggers
+            completo = cursor.fetchone()[0] == 8
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS} USING fts5("
+                f"busqueda, content='univida_cliente', content_rowid='id', tokenize='trigram')"
+            )
+            # Los triggers se pierden cuando una migración reconstruye univida_cliente
+            # (SQLite no tiene ALTER completo), por eso se recrean en cada migrate
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ai AFTER INSERT ON univida_cliente BEGIN "
+                f"INSERT INTO {TABLA_FTS}(rowid, busqueda) VALUES (new.id, new.busqueda); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ad AFTER DELETE ON univida_cliente BEGIN "
+                f"INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, busqueda) VALUES ('delete', old.id, old.busqueda); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_au AFTER UPDATE OF busqueda ON univida_cliente BEGIN "
+                f"INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, busqueda) VALUES ('delete', old.id, old.busqueda); "
+                f"INSERT INTO {TABLA_FTS}(rowid, busqueda) VALUES (new.id, new.busqueda); END"
+            )
+            if not completo:
+                # Faltaba la tabla o algún trigger: el índice puede estar desfasado
+                cursor.execute(f"INSERT INTO {TABLA_FTS}({TABLA_FTS}) VALUES ('rebuild')")
+
+
+def borrar_indice(conexion):
+    with conexion.cursor() as cursor:
+        if conexion.vendor == 'postgresql':
+            cursor.execute('DROP INDEX IF EXISTS cliente_busqueda_trgm_idx')
+        elif conexion.vendor == 'sqlite':
+            for sufijo in ('ai', 'ad', 'au'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {TABLA_FTS}_{sufijo}')
+            cursor.execute(f'DROP TABLE IF EXISTS {TABLA_FTS}')
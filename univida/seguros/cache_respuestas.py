@@ -0,0 +1,192 @@
+# en seguros/cache_respuestas.py
+"""
+Cache de respuestas GET para lecturas que cambian poco (perfiles, lista de
+agentes, detalle de póliza).
+
+- La clave lleva la vista, el alcance (el usuario o su rol) y la URL
+  completa, así ?fields=/?expand= no se mezclan.
+- Cada entrada guarda las "etiquetas" de las que depende ('poliza:5',
+  'usuario:3', 'agentes'...) con la versión que tenían al guardarla. La vista
+  las declara con depende_de() mientras carga los objetos.
+- Las señales de seguros/signals.py llaman a invalidar() con las etiquetas
+  del objeto que cambió: se le da una versión nueva a cada una y las
+  entradas que dependían de ella dejan de ser válidas, sin tener que
+  buscarlas ni borrarlas.
+
+Las versiones son tokens aleatorios y no contadores: si el backend expulsa
+una versión, la entrada vieja no puede volver a coincidir por casualidad.
+Lo que no pasa por señales (.update(), SQL directo) queda cubierto por el
+TIMEOUT del backend.
+
+Las versiones viven en la misma cache que las respuestas, así que
+invalidar() solo llega a quien comparte esa cache. En memoria (locmem) cada
+worker tiene la suya y los demás seguirían sirviendo la respuesta vieja
+hasta el TIMEOUT: con más de un worker la cache tiene que ser compartida
+(settings la pone en disco con WEB_CONCURRENCY > 1; con varias máquinas,
+Redis o memcached).
+"""
+import hashlib
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+PREFIJO = 'resp'
+VISTAS = set()
+# Validadores de @condicional que se guardan junto con la respuesta
+CABECERAS = ('ETag', 'Last-Modified', 'Cache-Control')
+
+
+def _cache():
+    return caches[getattr(settings, 'CACHE_RESPUESTAS', 'default')]
+
+
+def depende_de(request, *etiquetas):
+    """
+    Declara de qué objetos depende la respuesta que se está construyendo. Las
+    versiones se leen en este momento: si algo cambia mientras la vista
+    termina, la entrada se guarda ya vencida en vez de quedar desfasada.
+    """
+    if not hasattr(request, '_versiones_cache'):
+        request._versiones_cache = {}
+    nuevas = [e for e in etiquetas if e and _clave_version(e) not in request._versiones_cache]
+    if nuevas:
+        request._versiones_cache.update(_versiones(_cache(), nuevas))
+
+
+def invalidar(*etiquetas):
+    etiquetas = [e for e in etiquetas if e]
+    if not etiquetas:
+        return
+
+    def cambiar_versiones():
+        _cache().set_many({_clave_version(e): uuid.uuid4().hex for e in etiquetas}, None)
+
+    # Ahora y otra vez al confirmar la transacción: lo que se guarde en cache
+    # leyendo los datos de antes del commit queda vencido igual
+    cambiar_versiones()
+    transaction.on_commit(cambiar_versiones)
+
+
+def en_cache(alcance='usuario'):
+    """
+    Decorador para vistas de DRF. Va debajo de @api_view/@permission_classes,
+    así la autenticación y los permisos se siguen comprobando en cada llamada.
+    alcance='usuario' separa la cache por usuario; 'rol' la comparte entre
+    todos los usuarios del mismo rol.
+    """
+    def decorador(vista):
+        nombre = vista.__name__
+        VISTAS.add(nombre)
+
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if request.method != 'GET':
+                return vista(request, *args, **kwargs)
+
+            cache = _cache()
+            clave = _clave_entrada(nombre, alcance, request)
+            guardado = cache.get(clave)
+            if guardado is not None:
+                datos, versiones, cabeceras = guardado
+                if cache.get_many(list(versiones)) == versiones:
+                    _contar(cache, nombre, 'hits')
+                    return _desde_cache(request, datos, cabeceras)
+
+            _contar(cache, nombre, 'misses')
+            respuesta = vista(request, *args, **kwargs)
+            versiones = getattr(request, '_versiones_cache', None)
+            if respuesta.status_code == 200 and versiones:
+                cabeceras = {c: respuesta[c] for c in CABECERAS if respuesta.has_header(c)}
+                cache.set(clave, (respuesta.data, versiones, cabeceras))
+            return respuesta
+        return envoltura
+    return decorador
+
+
+def estadisticas():
+    """Aciertos y fallos por vista (acumulados en el backend de cache)."""
+    cache = _cache()
+    claves = {(vista, tipo): f'{PREFIJO}:n:{vista}:{tipo}' for vista in VISTAS for tipo in ('hits', 'misses')}
+    valores = cache.get_many(list(claves.values()))
+    resultado = {}
+    for vista in sorted(VISTAS):
+        hits = valores.get(claves[(vista, 'hits')], 0)
+        misses = valores.get(claves[(vista, 'misses')], 0)
+        total = hits + misses
+        resultado[vista] = {'hits': hits, 'misses': misses, 'ratio': round(hits / total, 3) if total else None}
+    return resultado
+
+
+def reiniciar_estadisticas():
+    _cache().delete_many([f'{PREFIJO}:n:{vista}:{tipo}' for vista in VISTAS for tipo in ('hits', 'misses')])
+
+
+def etiquetas_poliza(poliza):
+    """Lo que muestra el detalle de una póliza: ella, su cliente y su agente."""
+    return [f'poliza:{poliza.id}', f'cliente:{poliza.cliente_id}',
+            f'agente:{poliza.agente_id}' if poliza.agente_id else None]
+
+
+def etiquetas_de(instancia):
+    """Etiquetas a invalidar cuando se guarda o borra `instancia` (ver signals.py)."""
+    from .models import Agente, Beneficiario, Pago
+
+    etiquetas = [f'{instancia._meta.model_name}:{instancia.pk}']
+    if isinstance(instancia, Agente):
+        etiquetas.append('agentes')
+    elif isinstance(instancia, Beneficiario):
+        etiquetas.append(f'poliza:{instancia.poliza_id}')
+    elif isinstance(instancia, Pago):
+        etiquetas.append(f'factura:{instancia.factura_id}')
+    return etiquetas
+
+
+def _desde_cache(request, datos, cabeceras):
+    from .condicional import no_modificado
+
+    etag = cabeceras.get('ETag')
+    ultima = parse_http_date_safe(cabeceras.get('Last-Modified', ''))
+    if etag and no_modificado(request, etag, ultima):
+        respuesta = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        respuesta = Response(datos)
+    for cabecera, valor in cabeceras.items():
+        respuesta[cabecera] = valor
+    return respuesta
+
+
+def _clave_version(etiqueta):
+    return f'{PREFIJO}:v:{etiqueta}'
+
+
+def _clave_entrada(nombre, alcance, request):
+    quien = request.user.pk if alcance == 'usuario' else getattr(request.user, 'rol', '')
+    huella = hashlib.md5(f'{quien}|{request.get_full_path()}'.encode()).hexdigest()
+    return f'{PREFIJO}:e:{nombre}:{huella}'
+
+
+def _versiones(cache, etiquetas):
+    claves = [_clave_version(e) for e in etiquetas]
+    versiones = cache.get_many(claves)
+    nuevas = {clave: uuid.uuid4().hex for clave in claves if clave not in versiones}
+    for clave, version in nuevas.items():
+        # add() no pisa una versión que otro proceso haya puesto justo ahora
+        if not cache.add(clave, version, None):
+            nuevas[clave] = cache.get(clave)
+    versiones.update(nuevas)
+    return versiones
+
+
+def _contar(cache, vista, tipo):
+    clave = f'{PREFIJO}:n:{vista}:{tipo}'
+    try:
+        cache.incr(clave)
+    except ValueError:
+        cache.add(clave, 0, None)
+        cache.incr(clave)
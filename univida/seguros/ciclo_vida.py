@@ -0,0 +1,118 @@
+# en seguros/ciclo_vida.py
+"""
+Cambios de estado por fecha (pólizas y facturas vencidas) y bajas en
+bloque, con UPDATE por conjunto en vez de un save() por fila.
+
+- barrer() pasa a 'vencida' las pólizas y facturas cuya fecha_vencimiento
+  ya pasó (TRANSICIONES). Lo corre cada noche el comando
+  barrer_ciclo_vida.
+- inactivar_polizas_cliente() es la baja de toggle_estado_cliente.
+
+Se trabaja por bloques de TANDA filas, cada uno en su transacción: se
+leen (y bloquean) las filas del bloque por el índice (estado,
+fecha_vencimiento), se actualizan con un UPDATE y se pasa al siguiente.
+Como las filas cambiadas salen del filtro, cada pasada lee solo lo que
+todavía falta y cortar el barrido a la mitad no deja nada a medias.
+
+Los update() no disparan señales: aquí se hace a mano lo que harían
+(estadísticas del agente si salen pólizas activas, cache de respuestas y
+actualizado_en). Cada cambio se entrega a `registrar` como Transicion
+para la auditoría; por defecto va al log.
+"""
+import logging
+import time
+from collections import Counter, namedtuple
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import cache_respuestas, estadisticas
+from .models import Factura, Poliza
+
+logger = logging.getLogger(__name__)
+
+TANDA = 5000
+
+Transicion = namedtuple('Transicion', 'modelo id antes despues motivo')
+
+# (modelo, estado antes, estado después) cuando pasa su fecha_vencimiento
+TRANSICIONES = [
+    (Poliza, 'activa', 'vencida'),
+    (Poliza, 'pendiente_pago', 'vencida'),
+    (Factura, 'pendiente', 'vencida'),
+]
+# Lo que se da de baja con el cliente
+POLIZAS_VIVAS = ['activa', 'pendiente_pago', 'cotizacion']
+
+
+def registrar_en_log(transiciones):
+    if logger.isEnabledFor(logging.INFO):
+        for t in transiciones:
+            logger.info('%s %s: %s -> %s (%s)', t.modelo, t.id, t.antes, t.despues, t.motivo)
+
+
+def barrer(hoy=None, tanda=TANDA, registrar=registrar_en_log, progreso=None):
+    """
+    Aplica las TRANSICIONES a todo lo vencido antes de `hoy`. Devuelve un
+    resumen con cuántas filas hubo de cada transición y filas por segundo.
+    `progreso(filas)` se llama después de cada bloque.
+    """
+    hoy = hoy or timezone.localdate()
+    conteo = Counter()
+    inicio = time.perf_counter()
+    for modelo, antes, despues in TRANSICIONES:
+        clave = f'{modelo._meta.model_name}:{antes}->{despues}'
+        vencidas = modelo.objects.filter(estado=antes, fecha_vencimiento__lt=hoy).order_by('fecha_vencimiento')
+        while True:
+            hechas = _mover(vencidas[:tanda], despues, 'vencimiento', registrar)
+            if not hechas:
+                break
+            conteo[clave] += hechas
+            if progreso:
+                progreso(sum(conteo.values()))
+
+    segundos = time.perf_counter() - inicio
+    filas = sum(conteo.values())
+    return {
+        'fecha': hoy.isoformat(),
+        'transiciones': dict(conteo),
+        'filas': filas,
+        'segundos': round(segundos, 2),
+        'filas_por_segundo': round(filas / segundos) if segundos else None,
+    }
+
+
+def inactivar_polizas_cliente(cliente_id, registrar=registrar_en_log):
+    """Pasa a 'inactiva' las pólizas vivas del cliente. Devuelve cuántas."""
+    vivas = Poliza.objects.filter(cliente_id=cliente_id, estado__in=POLIZAS_VIVAS)
+    total = 0
+    while hechas := _mover(vivas[:TANDA], 'inactiva', 'baja del cliente', registrar):
+        total += hechas
+    return total
+
+
+def _mover(bloque, despues, motivo, registrar):
+    """Pasa a `despues` las filas del queryset `bloque`. Devuelve cuántas."""
+    modelo = bloque.model
+    campos = ['id', 'estado'] + (['cliente_id', 'agente_id'] if modelo is Poliza else [])
+    with transaction.atomic():
+        filas = list(bloque.select_for_update().values_list(*campos))
+        if not filas:
+            return 0
+        ahora = timezone.now()
+        modelo.objects.filter(id__in=[f[0] for f in filas]).update(estado=despues, actualizado_en=ahora)
+
+        # Lo que harían las señales con save()
+        if modelo is Poliza:
+            etiquetas = []
+            for poliza_id, _, cliente_id, agente_id in filas:
+                etiquetas += [f'poliza:{poliza_id}', f'cliente:{cliente_id}',
+                              f'agente:{agente_id}' if agente_id else None]
+            estadisticas.recalcular_agentes(agente_id for _, antes, _, agente_id in filas if antes == 'activa')
+        else:
+            etiquetas = [f'factura:{fila[0]}' for fila in filas]
+        cache_respuestas.invalidar(*etiquetas)
+
+    if registrar:
+        registrar([Transicion(modelo._meta.model_name, fila[0], fila[1], despues, motivo) for fila in filas])
+    return len(filas)
@@ -0,0 +1,88 @@
+# en seguros/codigos_qr.py
+"""
+QR de los pagos como imagen aparte (SVG o PNG), en vez de un PNG en base64
+dentro del JSON de iniciar_pago_qr.
+
+La imagen se pide por la referencia del pago, se dibuja la primera vez que
+alguien la pide y queda en la cache de respuestas (que expulsa lo viejo
+por TIMEOUT y MAX_ENTRIES). El SVG se arma a mano con un path por fila: es
+vectorial y pesa bastante menos que el SvgPathImage de qrcode.
+"""
+import secrets
+from io import BytesIO
+
+import qrcode
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import Pago
+
+FORMATOS = {'svg': 'image/svg+xml', 'png': 'image/png'}
+# Lo que dura en cache una imagen: de sobra para lo que tarda alguien en pagar
+DURACION = 60 * 60
+BORDE = 4
+
+
+def _cache():
+    return caches[getattr(settings, 'CACHE_RESPUESTAS', 'default')]
+
+
+def nueva_referencia():
+    # Larga y al azar: la imagen se sirve sin token (la pide un <img>)
+    return f'QR-{secrets.token_hex(8).upper()}'
+
+
+def datos_pago(pago_id):
+    # En la vida real, aquí iría lo que devuelve la API del Banco.
+    # Es una URL para "Simular el Pago" (sirve para probar el flujo sin dinero real)
+    return f"http://localhost:8000/api/pagos/simular-exito/{pago_id}/"
+
+
+def _codigo(datos):
+    qr = qrcode.QRCode(border=BORDE)
+    qr.add_data(datos)
+    qr.make(fit=True)
+    return qr
+
+
+def svg(datos):
+    matriz = _codigo(datos).get_matrix()
+    lado = len(matriz)
+    trazos = []
+    for y, fila in enumerate(matriz):
+        x = 0
+        while x < lado:
+            if not fila[x]:
+                x += 1
+                continue
+            inicio = x
+            while x < lado and fila[x]:
+                x += 1
+            trazos.append(f'M{inicio} {y}h{x - inicio}v1h-{x - inicio}z')
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {lado} {lado}" shape-rendering="crispEdges">'
+        f'<rect width="{lado}" height="{lado}" fill="#fff"/>'
+        f'<path fill="#000" d="{"".join(trazos)}"/></svg>'
+    ).encode()
+
+
+def png(datos):
+    qr = _codigo(datos)
+    qr.box_size = 10
+    buffer = BytesIO()
+    qr.make_image(fill='black', back_color='white').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def imagen(referencia, formato):
+    """Bytes de la imagen del pago con esa referencia, o None si no existe."""
+    cache = _cache()
+    clave = f'qr:{formato}:{referencia}'
+    contenido = cache.get(clave)
+    if contenido is None:
+        pago_id = Pago.objects.filter(referencia_pago=referencia).values_list('id', flat=True).first()
+        if pago_id is None:
+            return None
+        contenido = (svg if formato == 'svg' else png)(datos_pago(pago_id))
+        cache.set(clave, contenido, DURACION)
+    return contenido
@@ -0,0 +1,268 @@
+# en seguros/conciliacion.py
+"""
+Conciliación de extractos bancarios: lo que hoy hace el agente a mano en
+AgenteRegistrarPagoPage, para un archivo entero de una pasada.
+
+- El extracto se lee en streaming (CSV con ',' o ';', o XML camt.053 con
+  iterparse): nunca está entero en memoria.
+- Antes de leerlo se arma un índice en memoria (dicts) con los pagos
+  pendientes por referencia_pago y las facturas abiertas por número. Cada
+  línea se resuelve con una o dos búsquedas en esos dicts, sin ir a la BD.
+- Las coincidencias se juntan y se aplican por bloques (TANDA) pasando por
+  confirmaciones.py: mismas transacciones con bloqueo, misma idempotencia
+  que las confirmaciones del banco. A una factura pagada sin QR se le crea
+  primero su Pago pendiente con la referencia de la línea.
+- Lo que no concilia va al reporte de diferencias, con el motivo.
+
+Con agente_id solo se concilia contra lo de las pólizas de ese agente (el
+endpoint lo usa cuando concilia un agente): lo demás queda sin coincidencia.
+"""
+import csv
+import io
+import re
+import time
+import unicodedata
+import xml.etree.ElementTree as ET
+from collections import Counter, namedtuple
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+
+from . import confirmaciones
+from .models import ConfirmacionPago, Factura, Pago
+
+TANDA = 2000
+
+Linea = namedtuple('Linea', 'numero referencia monto descripcion')
+Diferencia = namedtuple('Diferencia', 'linea referencia monto motivo detalle')
+
+# Nombres de columna que se aceptan en el CSV (sin tildes, en minúsculas)
+COLUMNAS = {
+    'referencia': ('referencia', 'referencia_pago', 'ref', 'reference', 'nro_operacion'),
+    'monto': ('monto', 'importe', 'abono', 'credito', 'amount'),
+    'descripcion': ('descripcion', 'glosa', 'concepto', 'detalle', 'description'),
+}
+# Posibles números de factura dentro de la glosa o la referencia (FAC-12345)
+NUMERO_DOCUMENTO = re.compile(r'[A-Z0-9]+(?:-[A-Z0-9]+)+')
+
+
+class ExtractoInvalido(ValueError):
+    pass
+
+
+# --- Lectura del extracto ---
+
+def _simple(texto):
+    texto = unicodedata.normalize('NFKD', texto.strip().lower())
+    return ''.join(c for c in texto if not unicodedata.combining(c)).replace(' ', '_')
+
+
+def _monto(texto):
+    """'1.200,50', '1,200.50' o '1200.5' -> Decimal; None si no es un número."""
+    texto = (texto or '').strip().replace(' ', '')
+    if ',' in texto and '.' in texto:
+        # El separador decimal es el que va último
+        miles = '.' if texto.rfind(',') > texto.rfind('.') else ','
+        texto = texto.replace(miles, '')
+    texto = texto.replace(',', '.')
+    try:
+        return Decimal(texto).quantize(Decimal('0.01'))
+    except InvalidOperation:
+        return None
+
+
+def leer_csv(texto):
+    """Líneas de un CSV (archivo de texto). Detecta ',' o ';' por la cabecera."""
+    cabecera = texto.readline()
+    separador = ';' if cabecera.count(';') > cabecera.count(',') else ','
+    nombres = [_simple(n) for n in next(csv.reader([cabecera], delimiter=separador))]
+    indices = {}
+    for campo, alias in COLUMNAS.items():
+        indices[campo] = next((nombres.index(a) for a in alias if a in nombres), None)
+    if indices['monto'] is None or (indices['referencia'] is None and indices['descripcion'] is None):
+        raise ExtractoInvalido('El CSV necesita una columna de monto y una de referencia o glosa')
+
+    def columna(fila, campo):
+        i = indices[campo]
+        return fila[i].strip() if i is not None and i < len(fila) else ''
+
+    for numero, fila in enumerate(csv.reader(texto, delimiter=separador), start=2):
+        if not any(fila):
+            continue
+        yield Linea(numero, columna(fila, 'referencia'), _monto(columna(fila, 'monto')),
+                    columna(fila, 'descripcion'))
+
+
+def leer_camt(archivo):
+    """Abonos (CRDT) de un extracto camt.053/camt.054, con iterparse."""
+    numero = 0
+    for _, elemento in ET.iterparse(archivo, events=('end',)):
+        if elemento.tag.rsplit('}', 1)[-1] != 'Ntry':
+            continue
+        numero += 1
+        datos = {hijo.tag.rsplit('}', 1)[-1]: (hijo.text or '').strip() for hijo in elemento.iter()}
+        if datos.get('CdtDbtInd', 'CRDT') == 'CRDT':
+            referencia = next((datos[c] for c in ('EndToEndId', 'NtryRef', 'AcctSvcrRef')
+                               if datos.get(c) and datos[c] != 'NOTPROVIDED'), '')
+            yield Linea(numero, referencia, _monto(datos.get('Amt')), datos.get('Ustrd', ''))
+        # Lo leído ya no hace falta: así el árbol no crece con el archivo
+        elemento.clear()
+
+
+def leer(archivo):
+    """Líneas del extracto `archivo` (binario), CSV o camt según lo que empiece."""
+    inicio = archivo.read(64)
+    archivo.seek(0)
+    if inicio.lstrip(b'\xef\xbb\xbf \t\r\n').startswith(b'<'):
+        return leer_camt(archivo)
+    return leer_csv(io.TextIOWrapper(archivo, encoding='utf-8-sig', errors='replace', newline=''))
+
+
+# --- Índice en memoria ---
+
+def _pagos(agente_id=None):
+    pagos = Pago.objects.all()
+    return pagos if agente_id is None else pagos.filter(factura__poliza__agente_id=agente_id)
+
+
+def indice_pagos(agente_id=None):
+    """{referencia_pago: (pago_id, monto)} de los pagos pendientes."""
+    filas = (_pagos(agente_id).filter(estado='pendiente').exclude(referencia_pago__isnull=True)
+             .exclude(referencia_pago='').values_list('referencia_pago', 'id', 'monto_pagado'))
+    return {referencia: (pago_id, monto) for referencia, pago_id, monto in filas.iterator(chunk_size=10000)}
+
+
+def indice_facturas(agente_id=None):
+    """{numero_factura: (factura_id, monto)} de las facturas abiertas."""
+    facturas = Factura.objects.filter(estado__in=['pendiente', 'vencida'])
+    if agente_id is not None:
+        facturas = facturas.filter(poliza__agente_id=agente_id)
+    filas = facturas.values_list('numero_factura', 'id', 'monto')
+    return {numero.upper(): (factura_id, monto) for numero, factura_id, monto in filas.iterator(chunk_size=10000)}
+
+
+# --- Conciliación ---
+
+class Conciliacion:
+    def __init__(self, tanda=TANDA, progreso=None, agente_id=None):
+        self.tanda = tanda
+        self.progreso = progreso
+        self.agente_id = agente_id
+        self.pagos = indice_pagos(agente_id)
+        self.facturas = indice_facturas(agente_id)
+        self.vistas = set()
+        self.pendientes = []       # (linea, referencia) a aplicar
+        self.pagos_nuevos = []     # Pago de facturas conciliadas sin QR
+        self.sin_coincidencia = []
+        self.diferencias = []
+        self.conteo = Counter()
+
+    def procesar(self, lineas):
+        inicio = time.perf_counter()
+        for linea in lineas:
+            self.conteo['lineas'] += 1
+            self.resolver(linea)
+            if len(self.pendientes) >= self.tanda:
+                self.aplicar()
+            if len(self.sin_coincidencia) >= self.tanda:
+                self.ya_conciliadas()
+        self.aplicar()
+        self.ya_conciliadas()
+
+        segundos = time.perf_counter() - inicio
+        motivos = Counter(d.motivo for d in self.diferencias)
+        return {
+            'lineas': self.conteo['lineas'],
+            'conciliadas': self.conteo['conciliadas'],
+            'diferencias': dict(motivos),
+            'segundos': round(segundos, 2),
+            'lineas_por_segundo': round(self.conteo['lineas'] / segundos) if segundos else None,
+        }
+
+    def resolver(self, linea):
+        if linea.monto is None:
+            return self.diferencia(linea, 'invalida', 'Monto ilegible')
+        if linea.referencia in self.vistas:
+            return self.diferencia(linea, 'duplicada', 'La referencia ya apareció antes en el extracto')
+
+        pago = self.pagos.pop(linea.referencia, None)
+        if pago is not None:
+            pago_id, monto = pago
+            if monto != linea.monto:
+                self.pagos[linea.referencia] = pago
+                return self.diferencia(linea, 'monto_distinto', f'El pago {pago_id} es de {monto}')
+            self.vistas.add(linea.referencia)
+            self.pendientes.append((linea, linea.referencia))
+            return
+
+        for numero in NUMERO_DOCUMENTO.findall(f'{linea.referencia} {linea.descripcion}'.upper()):
+            factura = self.facturas.get(numero)
+            if factura is None:
+                continue
+            factura_id, monto = factura
+            if monto != linea.monto:
+                return self.diferencia(linea, 'monto_distinto', f'La factura {numero} es de {monto}')
+            del self.facturas[numero]
+            referencia = linea.referencia or f'EXT-{numero}'
+            self.vistas.add(referencia)
+            self.pagos_nuevos.append(Pago(
+                factura_id=factura_id, monto_pagado=linea.monto, metodo_pago='transferencia',
+                estado='pendiente', referencia_pago=referencia,
+                descripcion=f'Conciliado desde extracto bancario (línea {linea.numero}).'))
+            self.pendientes.append((linea, referencia))
+            return
+
+        # Puede ser un pago que ya se concilió antes: se mira por bloques al final
+        self.sin_coincidencia.append(linea)
+
+    def diferencia(self, linea, motivo, detalle):
+        self.diferencias.append(Diferencia(linea.numero, linea.referencia, linea.monto, motivo, detalle))
+
+    def aplicar(self):
+        if not self.pendientes:
+            return
+        pendientes, self.pendientes = self.pendientes, []
+        nuevos, self.pagos_nuevos = self.pagos_nuevos, []
+        with transaction.atomic():
+            Pago.objects.bulk_create(nuevos)
+            confirmaciones.recibir([
+                {'referencia': referencia, 'estado_banco': 'completado', 'monto': linea.monto}
+                for linea, referencia in pendientes
+            ], programar=False)
+        confirmaciones.procesar_pendientes(self.tanda)
+
+        # Las que el banco ya había confirmado por webhook o se rechazaron al aplicar
+        estados = dict(ConfirmacionPago.objects.filter(referencia__in=[r for _, r in pendientes])
+                       .values_list('referencia', 'estado'))
+        for linea, referencia in pendientes:
+            if estados.get(referencia) == 'aplicada':
+                self.conteo['conciliadas'] += 1
+            else:
+                self.diferencia(linea, 'no_aplicada', f'Confirmación {estados.get(referencia, "perdida")}')
+        if self.progreso:
+            self.progreso(self.conteo['lineas'], self.conteo['conciliadas'])
+
+    def ya_conciliadas(self):
+        lineas, self.sin_coincidencia = self.sin_coincidencia, []
+        referencias = {linea.referencia for linea in lineas if linea.referencia}
+        completadas = set(_pagos(self.agente_id).filter(referencia_pago__in=referencias, estado='completado')
+                          .values_list('referencia_pago', flat=True)) if referencias else set()
+        for linea in lineas:
+            if linea.referencia in completadas:
+                self.diferencia(linea, 'ya_conciliada', 'El pago ya estaba completado')
+            else:
+                self.diferencia(linea, 'sin_coincidencia', 'Ningún pago pendiente ni factura abierta')
+
+
+def conciliar(archivo, tanda=TANDA, progreso=None, agente_id=None):
+    """Concilia el extracto `archivo` (binario). Devuelve (resumen, diferencias)."""
+    conciliacion = Conciliacion(tanda, progreso, agente_id)
+    resumen = conciliacion.procesar(leer(archivo))
+    return resumen, conciliacion.diferencias
+
+
+def escribir_reporte(diferencias, destino):
+    """Reporte de diferencias en CSV sobre `destino` (archivo de texto)."""
+    escritor = csv.writer(destino)
+    escritor.writerow(Diferencia._fields)
+    escritor.writerows(diferencias)
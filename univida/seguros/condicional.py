@@ -0,0 +1,102 @@
+# en seguros/condicional.py
+"""
+GET condicional (ETag / Last-Modified) para los detalles que el frontend
+vuelve a pedir sin parar.
+
+Cada vista declara una función de validadores que, con UNA consulta de
+values_list, trae los `actualizado_en` de todo lo que muestra (el objeto y
+sus relaciones anidadas). Si el cliente manda If-None-Match o
+If-Modified-Since y nada cambió, se contesta 304 sin cargar el objeto ni
+pasar por el serializer. Si la vista además usa @en_cache (va por fuera),
+la cache guarda estas cabeceras y contesta el 304 sin tocar la BD.
+"""
+import hashlib
+from functools import wraps
+
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import Cliente, Poliza, Siniestro
+
+# Lo que muestra PolizaSerializer: la póliza, su cliente y su agente (con sus usuarios).
+# Los beneficiarios tocan Poliza.actualizado_en al cambiar.
+CAMPOS_POLIZA = [
+    'actualizado_en', 'cliente__actualizado_en', 'cliente__usuario__actualizado_en',
+    'agente__actualizado_en', 'agente__usuario__actualizado_en',
+]
+
+
+def condicional(validadores):
+    """
+    Decorador para vistas de DRF (debajo de @permission_classes, así los
+    permisos se comprueban antes). `validadores(**kwargs)` devuelve la lista
+    de fechas de modificación, o None si el objeto no existe (la vista se
+    encarga del 404).
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return vista(request, *args, **kwargs)
+
+            fechas = validadores(**kwargs)
+            if not fechas:
+                return vista(request, *args, **kwargs)
+
+            ultima = max(fechas)
+            etag = _etag(request, fechas)
+            if no_modificado(request, etag, int(ultima.timestamp())):
+                respuesta = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                respuesta = vista(request, *args, **kwargs)
+                if respuesta.status_code != 200:
+                    return respuesta
+
+            respuesta['ETag'] = etag
+            respuesta['Last-Modified'] = http_date(ultima.timestamp())
+            # Que el navegador guarde la respuesta pero pregunte siempre
+            respuesta['Cache-Control'] = 'private, no-cache'
+            return respuesta
+        return envoltura
+    return decorador
+
+
+def _etag(request, fechas):
+    # La URL (?fields=/?expand=) y el Accept cambian el cuerpo, así que van en el ETag
+    partes = [request.get_full_path(), request.META.get('HTTP_ACCEPT', '')]
+    partes += [f.isoformat() for f in fechas]
+    return 'W/' + quote_etag(hashlib.md5('|'.join(partes).encode()).hexdigest())
+
+
+def no_modificado(request, etag, ultima):
+    """¿Coincide lo que trae el cliente con el ETag / la fecha (timestamp) actuales?"""
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match:
+        # Comparación débil, como manda la RFC 9110 para GET
+        pedidos = [e.removeprefix('W/') for e in parse_etags(if_none_match)]
+        return '*' in pedidos or etag.removeprefix('W/') in pedidos
+    desde = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return desde is not None and ultima is not None and ultima <= desde
+
+
+def _fechas(queryset, campos):
+    fila = queryset.values_list(*campos).first()
+    return None if fila is None else [f for f in fila if f is not None]
+
+
+# --- Validadores de cada vista ---
+
+def validadores_poliza(poliza_id):
+    return _fechas(Poliza.objects.filter(id=poliza_id), CAMPOS_POLIZA)
+
+
+def validadores_siniestro(siniestro_id):
+    # SiniestroSerializer anida la póliza completa
+    return _fechas(Siniestro.objects.filter(id=siniestro_id),
+                   ['actualizado_en'] + [f'poliza__{c}' for c in CAMPOS_POLIZA])
+
+
+def validadores_cliente(cliente_id):
+    return _fechas(Cliente.objects.filter(id=cliente_id), ['actualizado_en', 'usuario__actualizado_en'])
+
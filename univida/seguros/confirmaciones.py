@@ -0,0 +1,276 @@
+# en seguros/confirmaciones.py
+"""
+Confirmaciones de pago del banco: se reciben rápido y se aplican por tandas.
+
+- recibir() guarda lo que manda el banco en ConfirmacionPago y nada más.
+  La referencia es única, así que los reintentos del banco (que repite el
+  callback si tardamos o si no le llega la respuesta) no duplican nada.
+- procesar_tanda() toma las pendientes por orden de llegada y las aplica
+  en UNA transacción, con las filas de Pago, Factura y Poliza bloqueadas
+  (select_for_update; en SQLite la transacción ya bloquea la base). Los
+  cambios se hacen con update() por conjunto, no con un save() por fila.
+- Aplicar es idempotente: un pago que ya estaba completado deja la
+  confirmación como 'repetida' y no toca nada.
+
+Los update() no disparan señales: aquí se hace a mano lo que harían
+(estadísticas del agente, cache de respuestas, estado del pago en cache y
+aviso a quien lo espera).
+
+Quién aplica: un hilo del propio proceso que se despierta al recibir (como
+documentos.py), o el comando procesar_confirmaciones en un worker aparte.
+Con CONFIRMACIONES_SINCRONO se aplica dentro del request (tests).
+
+El banco firma el cuerpo con HMAC-SHA256 y BANCO_SECRETO (cabecera
+X-Firma-Banco); ver firma_valida().
+"""
+import hashlib
+import hmac
+import logging
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models import F, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+
+from . import cache_respuestas, estadisticas, estado_pagos
+from .models import ConfirmacionPago, Factura, Pago, Poliza
+
+logger = logging.getLogger(__name__)
+
+TANDA = 200
+CABECERA_FIRMA = 'X-Firma-Banco'
+
+
+class ConfirmacionInvalida(ValueError):
+    pass
+
+
+# --- Recepción ---
+
+def firmar(cuerpo, secreto=None):
+    secreto = secreto or settings.BANCO_SECRETO
+    return hmac.new(secreto.encode(), cuerpo, hashlib.sha256).hexdigest()
+
+
+def firma_valida(cuerpo, firma):
+    return bool(firma) and hmac.compare_digest(firmar(cuerpo), firma)
+
+
+def normalizar(datos):
+    """Lo que manda el banco por cada pago -> campos de ConfirmacionPago."""
+    if not isinstance(datos, dict):
+        raise ConfirmacionInvalida('Cada confirmación tiene que ser un objeto')
+    referencia = str(datos.get('referencia') or '').strip()
+    if not referencia or len(referencia) > 100:
+        raise ConfirmacionInvalida('Falta la referencia o es demasiado larga')
+    estado_banco = datos.get('estado', 'completado')
+    if estado_banco not in dict(ConfirmacionPago.ESTADOS_BANCO):
+        raise ConfirmacionInvalida(f'Estado desconocido: {estado_banco}')
+    monto = datos.get('monto')
+    if monto is not None:
+        try:
+            monto = Decimal(str(monto)).quantize(Decimal('0.01'))
+        except InvalidOperation:
+            raise ConfirmacionInvalida(f'Monto inválido: {monto}')
+    return {'referencia': referencia, 'estado_banco': estado_banco, 'monto': monto}
+
+
+def recibir(lista, programar=True):
+    """
+    Guarda las confirmaciones (dicts ya normalizados) que no se hayan
+    recibido antes. Devuelve (nuevas, repetidas). Con programar=False no
+    despierta al worker: las aplica quien llama (p. ej. conciliacion.py).
+    """
+    # La misma referencia dos veces en el mismo envío cuenta una sola vez
+    por_referencia = {datos['referencia']: datos for datos in lista}
+    existentes = set(ConfirmacionPago.objects.filter(referencia__in=por_referencia)
+                     .values_list('referencia', flat=True))
+    nuevas = [ConfirmacionPago(**datos) for referencia, datos in por_referencia.items()
+              if referencia not in existentes]
+    # ignore_conflicts: si dos reintentos llegan a la vez, la BD deja pasar uno
+    ConfirmacionPago.objects.bulk_create(nuevas, ignore_conflicts=True)
+    if nuevas and programar:
+        despertar()
+    return len(nuevas), len(lista) - len(nuevas)
+
+
+# --- Aplicación ---
+
+def procesar_tanda(tanda=TANDA):
+    """
+    Aplica hasta `tanda` confirmaciones pendientes en una transacción.
+    Devuelve el resumen de la tanda (con su latencia) o None si no había nada.
+    """
+    inicio = time.perf_counter()
+    with transaction.atomic():
+        pendientes = ConfirmacionPago.objects.filter(estado='pendiente').order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            # Varios workers: cada uno se lleva tandas distintas
+            pendientes = pendientes.select_for_update(skip_locked=True)
+        confirmaciones = list(pendientes[:tanda])
+        if not confirmaciones:
+            return None
+
+        pagos = {
+            p.referencia_pago: p for p in
+            Pago.objects.select_for_update()
+            .filter(referencia_pago__in=[c.referencia for c in confirmaciones])
+            .only('id', 'referencia_pago', 'estado', 'monto_pagado', 'factura_id')
+        }
+        cambios = {'completado': [], 'fallido': []}
+        for confirmacion in confirmaciones:
+            pago = pagos.get(confirmacion.referencia)
+            confirmacion.pago = pago
+            confirmacion.estado, confirmacion.detalle = _resultado(confirmacion, pago)
+            if confirmacion.estado == 'aplicada':
+                cambios[confirmacion.estado_banco].append(pago)
+                pago.estado = confirmacion.estado_banco
+
+        ahora = timezone.now()
+        completados = cambios['completado']
+        Pago.objects.filter(id__in=[p.id for p in completados]).update(
+            estado='completado', descripcion='Pago confirmado por el banco.', actualizado_en=ahora)
+        Pago.objects.filter(id__in=[p.id for p in cambios['fallido']]).update(
+            estado='fallido', descripcion='El banco rechazó el pago.', actualizado_en=ahora)
+        facturas, polizas = _activar(completados, ahora)
+
+        # Un UPDATE por resultado (bulk_update arma un CASE por fila y campo: en
+        # tandas grandes cuesta más armarlo en Python que ejecutarlo)
+        grupos = defaultdict(list)
+        for confirmacion in confirmaciones:
+            confirmacion.aplicada_en = ahora
+            grupos[confirmacion.estado, confirmacion.detalle].append(confirmacion.id)
+        pago_de_la_referencia = Pago.objects.filter(referencia_pago=OuterRef('referencia')).values('id')[:1]
+        for (estado, detalle), ids in grupos.items():
+            ConfirmacionPago.objects.filter(id__in=ids).update(
+                estado=estado, detalle=detalle, aplicada_en=ahora, pago_id=Subquery(pago_de_la_referencia))
+
+        # Lo que harían las señales con save()
+        estadisticas.recalcular_agentes(agente_id for _, _, agente_id in polizas)
+        tocados = completados + cambios['fallido']
+        transaction.on_commit(lambda: _avisar(tocados, facturas, polizas))
+
+    segundos = time.perf_counter() - inicio
+    resumen = {
+        'confirmaciones': len(confirmaciones),
+        'aplicadas': len(tocados),
+        'repetidas': sum(c.estado == 'repetida' for c in confirmaciones),
+        'rechazadas': sum(c.estado == 'rechazada' for c in confirmaciones),
+        'polizas_activadas': len(polizas),
+        'segundos': round(segundos, 4),
+        # Desde que llegó la más vieja de la tanda hasta que quedó aplicada
+        'espera_max': round((timezone.now() - min(c.recibida_en for c in confirmaciones)).total_seconds(), 3),
+    }
+    logger.info('Tanda de confirmaciones: %s', resumen)
+    return resumen
+
+
+def _resultado(confirmacion, pago):
+    """(estado, detalle) de la confirmación para ese pago."""
+    if pago is None:
+        return 'rechazada', 'No hay un pago con esa referencia'
+    if pago.estado == 'completado' or pago.estado == confirmacion.estado_banco:
+        return 'repetida', f'El pago ya estaba {pago.estado}'
+    if pago.estado != 'pendiente':
+        return 'rechazada', f'El pago está {pago.estado}'
+    if (confirmacion.estado_banco == 'completado' and confirmacion.monto is not None
+            and confirmacion.monto != pago.monto_pagado):
+        return 'rechazada', f'El banco informa {confirmacion.monto} y el pago es de {pago.monto_pagado}'
+    return 'aplicada', ''
+
+
+def _activar(completados, ahora):
+    """
+    Marca pagadas las facturas cubiertas por sus pagos completados (como el
+    POST de lista_pagos) y activa sus pólizas pendientes de pago.
+    Devuelve (ids de facturas, [(poliza_id, cliente_id, agente_id)]).
+    """
+    # Primero se bloquean las filas: FOR UPDATE no se puede combinar con GROUP BY
+    factura_ids = list(Factura.objects.select_for_update()
+                       .filter(id__in={p.factura_id for p in completados}).exclude(estado='pagada')
+                       .values_list('id', flat=True))
+    if not factura_ids:
+        return [], []
+    facturas = list(
+        Factura.objects.filter(id__in=factura_ids)
+        .annotate(pagado=Sum('pagos__monto_pagado', filter=Q(pagos__estado='completado')))
+        .filter(pagado__gte=F('monto'))
+        .values_list('id', flat=True)
+    )
+    Factura.objects.filter(id__in=facturas).update(estado='pagada', actualizado_en=ahora)
+
+    polizas = list(
+        Poliza.objects.select_for_update()
+        .filter(id__in=Factura.objects.filter(id__in=facturas).values('poliza_id'), estado='pendiente_pago')
+        .values_list('id', 'cliente_id', 'agente_id')
+    )
+    Poliza.objects.filter(id__in=[p[0] for p in polizas]).update(estado='activa', actualizado_en=ahora)
+    return facturas, polizas
+
+
+def _avisar(pagos, facturas, polizas):
+    etiquetas = [f'pago:{p.id}' for p in pagos] + [f'factura:{f}' for f in facturas]
+    for poliza_id, cliente_id, agente_id in polizas:
+        etiquetas += [f'poliza:{poliza_id}', f'cliente:{cliente_id}']
+        if agente_id:
+            etiquetas.append(f'agente:{agente_id}')
+    cache_respuestas.invalidar(*etiquetas)
+    for pago in pagos:
+        estado_pagos.cambiado(pago.id, pago.estado)
+
+
+def procesar_pendientes(tanda=TANDA):
+    """Aplica tandas hasta que no quede nada pendiente. Devuelve sus resúmenes."""
+    resumenes = []
+    while (resumen := procesar_tanda(tanda)) is not None:
+        resumenes.append(resumen)
+    return resumenes
+
+
+# --- Worker en el proceso ---
+
+_ejecutor = None
+_programado = threading.Event()
+
+
+def _hilo():
+    global _ejecutor
+    if _ejecutor is None:
+        # Un solo hilo: las tandas no compiten entre sí por los mismos pagos
+        _ejecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='confirmaciones')
+    return _ejecutor
+
+
+def despertar():
+    """Pide que se apliquen las pendientes después del commit de lo recibido."""
+    tanda = getattr(settings, 'CONFIRMACIONES_TANDA', TANDA)
+    if getattr(settings, 'CONFIRMACIONES_SINCRONO', False):
+        transaction.on_commit(lambda: procesar_pendientes(tanda))
+        return
+    if not getattr(settings, 'CONFIRMACIONES_EN_PROCESO', True):
+        return  # las aplica el comando procesar_confirmaciones
+    transaction.on_commit(_programar)
+
+
+def _programar():
+    # Una ráfaga de callbacks programa una sola vuelta, no una por callback
+    if _programado.is_set():
+        return
+    _programado.set()
+    _hilo().submit(_procesar_en_hilo)
+
+
+def _procesar_en_hilo():
+    # Lo que llegue desde ahora programa otra vuelta
+    _programado.clear()
+    try:
+        procesar_pendientes(getattr(settings, 'CONFIRMACIONES_TANDA', TANDA))
+    except Exception:
+        logger.exception('No se pudieron aplicar las confirmaciones de pago')
+    finally:
+        connections.close_all()
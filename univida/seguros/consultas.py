@@ -0,0 +1,82 @@
+# en seguros/consultas.py
+"""
+Precarga de relaciones según el serializer que se va a usar.
+
+En vez de escribir a mano los select_related/prefetch_related en cada vista,
+recorremos los campos del serializer (incluidos los anidados) y deducimos
+qué relaciones va a tocar. Así una lista siempre hace el mismo número de
+consultas, tenga 5 filas o 5.000.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+def plan_de_carga(serializer):
+    """
+    Devuelve (select_related, prefetch_related) para un serializer.
+    Acepta la clase, una instancia o un ListSerializer (many=True).
+    """
+    if isinstance(serializer, type):
+        serializer = serializer()
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+
+    select = {}
+    prefetch = {}
+    _recorrer(serializer, serializer.Meta.model, '', select, prefetch)
+    return list(select), list(prefetch.values())
+
+
+def precargar(queryset, serializer):
+    """Aplica al queryset las relaciones que necesita el serializer."""
+    select, prefetch = plan_de_carga(serializer)
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+def _recorrer(serializer, modelo, prefijo, select, prefetch):
+    for campo in serializer.fields.values():
+        if campo.write_only or campo.source == '*':
+            continue
+
+        anidado = campo.child if isinstance(campo, serializers.ListSerializer) else campo
+        es_anidado = isinstance(anidado, serializers.BaseSerializer)
+
+        # Un campo simple ('poliza.numero_poliza') solo necesita la relación
+        # hasta el penúltimo atributo; uno anidado necesita la ruta completa.
+        attrs = campo.source_attrs if es_anidado else campo.source_attrs[:-1]
+
+        actual = modelo
+        ruta = prefijo
+        completo = True
+        for attr in attrs:
+            try:
+                relacion = actual._meta.get_field(attr)
+            except FieldDoesNotExist:
+                completo = False
+                break
+            if not relacion.is_relation:
+                completo = False
+                break
+
+            ruta = f'{ruta}__{attr}' if ruta else attr
+            actual = relacion.related_model
+
+            if relacion.one_to_many or relacion.many_to_many:
+                # Relación "a muchos": va en su propia consulta, y lo que
+                # cuelga de ella se precarga sobre el queryset del Prefetch.
+                queryset = actual._default_manager.all()
+                if es_anidado:
+                    queryset = precargar(queryset, anidado)
+                prefetch.setdefault(ruta, Prefetch(ruta, queryset=queryset))
+                completo = False
+                break
+
+            select[ruta] = True
+
+        if es_anidado and completo:
+            _recorrer(anidado, actual, ruta, select, prefetch)
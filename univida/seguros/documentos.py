@@ -0,0 +1,229 @@
+# en seguros/documentos.py
+"""
+PDF de las pólizas fuera del request y guardados en disco por contenido.
+
+- La huella es un sha256 de lo que muestra poliza_pdf.html (póliza, cliente,
+  beneficiarios) más la versión de la plantilla. El archivo se llama como su
+  huella: si nada cambió, el PDF ya está hecho y bajarlo es leer un archivo.
+- encolar() crea un TrabajoDocumento y lo renderiza en un hilo aparte (o en
+  el momento con DOCUMENTOS_SINCRONO, p. ej. en los tests). El frontend
+  consulta el estado y descarga cuando está 'listo'.
+- respuesta_archivo() sirve el PDF con FileResponse, ETag (la huella) y
+  soporte de Range para reanudar descargas.
+
+El PDF lleva la fecha en que se generó: mientras la póliza no cambie se
+sigue sirviendo el mismo.
+"""
+import hashlib
+import json
+import os
+import re
+import tempfile
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from functools import lru_cache
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.template.loader import get_template
+from django.utils import timezone
+from django.utils.http import parse_etags, quote_etag
+from xhtml2pdf import pisa
+
+from .models import Beneficiario, Poliza, TrabajoDocumento
+
+PLANTILLA = 'poliza_pdf.html'
+# Subir si cambia cómo se arma el PDF (la plantilla ya cuenta por su contenido)
+VERSION = 1
+
+# Lo que se muestra en poliza_pdf.html: si se agrega algo allí, va aquí también
+CAMPOS_POLIZA = [
+    'numero_poliza', 'estado', 'suma_asegurada', 'fecha_inicio', 'fecha_vencimiento',
+    'cliente__identificacion', 'cliente__usuario__first_name', 'cliente__usuario__last_name',
+]
+CAMPOS_BENEFICIARIO = ['nombre_completo', 'parentesco', 'porcentaje']
+
+# nuevo: si hubo que renderizarlo ahora (False = ya estaba en disco)
+Documento = namedtuple('Documento', 'ruta huella nombre nuevo', defaults=(False,))
+
+
+class ErrorPdf(Exception):
+    pass
+
+
+@lru_cache(maxsize=None)
+def version_plantilla():
+    origen = get_template(PLANTILLA).template.source
+    return f'{VERSION}:{hashlib.sha256(origen.encode()).hexdigest()[:16]}'
+
+
+def datos_huella(poliza_id):
+    """(huella, numero_poliza) con dos consultas de values(), o None si la póliza no existe."""
+    poliza = Poliza.objects.filter(id=poliza_id).values(*CAMPOS_POLIZA).first()
+    if poliza is None:
+        return None
+    beneficiarios = list(Beneficiario.objects.filter(poliza_id=poliza_id)
+                         .order_by('id').values_list(*CAMPOS_BENEFICIARIO))
+    contenido = json.dumps([version_plantilla(), poliza, beneficiarios], default=str, sort_keys=True)
+    return hashlib.sha256(contenido.encode()).hexdigest(), poliza['numero_poliza']
+
+
+def ruta(huella):
+    return Path(settings.DOCUMENTOS_ROOT) / huella[:2] / f'{huella}.pdf'
+
+
+def nombre_descarga(numero_poliza):
+    return f'Poliza_{numero_poliza}.pdf'
+
+
+def renderizar(poliza):
+    """Bytes del PDF de `poliza` (la misma plantilla que usaba generar_pdf_poliza)."""
+    context = {
+        'poliza': poliza,
+        'cliente': poliza.cliente,
+        'usuario': poliza.cliente.usuario,
+        'beneficiarios': poliza.beneficiarios.all(),
+        'fecha_hoy': date.today()
+    }
+    html = get_template(PLANTILLA).render(context)
+    result = BytesIO()
+    pdf = pisa.pisaDocument(BytesIO(html.encode("ISO-8859-1")), result)
+    if pdf.err:
+        raise ErrorPdf(f'xhtml2pdf devolvió {pdf.err} errores')
+    return result.getvalue()
+
+
+def guardar(huella, contenido):
+    return guardar_en(ruta(huella), contenido)
+
+
+def guardar_en(destino, contenido):
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    # Se escribe aparte y se renombra: nadie lee nunca un PDF a medias
+    fd, temporal = tempfile.mkstemp(dir=destino.parent, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as archivo:
+        archivo.write(contenido)
+    os.replace(temporal, destino)
+    return destino
+
+
+def obtener_pdf(poliza_id):
+    """
+    El PDF actual de la póliza, renderizándolo solo si no está en disco.
+    Lanza Poliza.DoesNotExist o ErrorPdf.
+    """
+    datos = datos_huella(poliza_id)
+    if datos is None:
+        raise Poliza.DoesNotExist
+    huella, numero = datos
+    destino = ruta(huella)
+    if destino.exists():
+        return Documento(destino, huella, nombre_descarga(numero))
+    poliza = (Poliza.objects.select_related('cliente__usuario')
+              .prefetch_related('beneficiarios').get(id=poliza_id))
+    guardar(huella, renderizar(poliza))
+    return Documento(destino, huella, nombre_descarga(numero), nuevo=True)
+
+
+# --- Trabajos en segundo plano ---
+
+_ejecutor = None
+
+
+def _hilos():
+    global _ejecutor
+    if _ejecutor is None:
+        _ejecutor = ThreadPoolExecutor(max_workers=getattr(settings, 'DOCUMENTOS_HILOS', 2),
+                                       thread_name_prefix='documentos')
+    return _ejecutor
+
+
+def encolar(poliza_id, usuario_id=None):
+    """Crea el trabajo del PDF de la póliza. Si ya está en disco nace 'listo'."""
+    datos = datos_huella(poliza_id)
+    if datos is None:
+        raise Poliza.DoesNotExist
+    huella = datos[0]
+    if ruta(huella).exists():
+        return TrabajoDocumento.objects.create(poliza_id=poliza_id, usuario_id=usuario_id, estado='listo',
+                                               huella=huella, terminado_en=timezone.now())
+
+    trabajo = TrabajoDocumento.objects.create(poliza_id=poliza_id, usuario_id=usuario_id)
+    if getattr(settings, 'DOCUMENTOS_SINCRONO', False):
+        procesar(trabajo.id)
+        trabajo.refresh_from_db()
+    else:
+        # El hilo usa su propia conexión: tiene que ver el trabajo ya confirmado
+        transaction.on_commit(lambda: _hilos().submit(_procesar_en_hilo, trabajo.id))
+    return trabajo
+
+
+def procesar(trabajo_id):
+    trabajo = TrabajoDocumento.objects.get(id=trabajo_id)
+    TrabajoDocumento.objects.filter(id=trabajo_id).update(estado='procesando')
+    try:
+        documento = obtener_pdf(trabajo.poliza_id)
+    except Exception as e:
+        TrabajoDocumento.objects.filter(id=trabajo_id).update(
+            estado='error', error=str(e) or e.__class__.__name__, terminado_en=timezone.now())
+        return
+    TrabajoDocumento.objects.filter(id=trabajo_id).update(
+        estado='listo', huella=documento.huella, terminado_en=timezone.now())
+
+
+def _procesar_en_hilo(trabajo_id):
+    try:
+        procesar(trabajo_id)
+    finally:
+        connections.close_all()
+
+
+# --- Descarga ---
+
+RANGO = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def respuesta_archivo(request, ruta_pdf, nombre):
+    """
+    FileResponse del PDF. El nombre del archivo es su huella y nunca cambia
+    de contenido, así que el ETag es fuerte y sirve para If-None-Match y If-Range.
+    """
+    etag = quote_etag(ruta_pdf.stem)
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        respuesta = HttpResponseNotModified()
+        respuesta['ETag'] = etag
+        return respuesta
+
+    tamano = ruta_pdf.stat().st_size
+    rango = request.META.get('HTTP_RANGE', '')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    coincide = RANGO.match(rango.replace(' ', '')) if rango and (not if_range or if_range == etag) else None
+    if coincide and coincide.group(1) + coincide.group(2):
+        inicio, fin = coincide.groups()
+        if inicio:
+            inicio, fin = int(inicio), min(int(fin) if fin else tamano - 1, tamano - 1)
+        else:
+            # bytes=-N: los últimos N bytes
+            inicio, fin = max(tamano - int(fin), 0), tamano - 1
+        if inicio > fin:
+            respuesta = HttpResponse(status=416)
+            respuesta['Content-Range'] = f'bytes */{tamano}'
+            return respuesta
+        with open(ruta_pdf, 'rb') as archivo:
+            archivo.seek(inicio)
+            respuesta = HttpResponse(archivo.read(fin - inicio + 1), status=206, content_type='application/pdf')
+        respuesta['Content-Range'] = f'bytes {inicio}-{fin}/{tamano}'
+    else:
+        # Varios rangos o mal formado: se manda entero, como permite la RFC
+        respuesta = FileResponse(open(ruta_pdf, 'rb'), as_attachment=True, filename=nombre,
+                                 content_type='application/pdf')
+
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre}"'
+    respuesta['Accept-Ranges'] = 'bytes'
+    respuesta['ETag'] = etag
+    respuesta['Cache-Control'] = 'private, no-cache'
+    return respuesta
@@ -0,0 +1,204 @@
+# en seguros/estadisticas.py
+"""
+Estadísticas del panel del agente mantenidas de forma incremental.
+
+Cada vez que se guarda o borra un Cliente o una Poliza comparamos su
+"huella" anterior con la nueva y aplicamos solo la diferencia (+1/-1,
++prima/-prima) sobre EstadisticaAgente y EstadisticaAgenteMes. Así el
+dashboard es una lectura por clave primaria en vez de siete consultas.
+
+Si alguna vez se desincronizan (updates masivos con .update(), cargas
+directas en la BD...) se reconstruyen con recalcular_agente() o con el
+comando `python manage.py recalcular_estadisticas_agentes`.
+"""
+from collections import defaultdict
+
+from django.db.models import Count, F, Sum, Window
+from django.db.models.functions import ExtractMonth, ExtractYear, RowNumber
+from django.utils import timezone
+
+from .models import Agente, Cliente, Poliza, EstadisticaAgente, EstadisticaAgenteMes
+
+ULTIMAS_VENTAS = 5
+
+
+# --- Huellas: lo que de cada objeto le importa a las estadísticas ---
+
+def huella_poliza(poliza):
+    # Leemos de __dict__ para no disparar consultas en campos diferidos
+    datos = poliza.__dict__
+    return (
+        datos.get('agente_id'), datos.get('estado'), datos.get('prima_anual'),
+        datos.get('creado_en'), datos.get('cobertura'),
+    )
+
+
+def huella_cliente(cliente):
+    return cliente.__dict__.get('agente_id')
+
+
+def _venta(huella):
+    """(agente_id, anio, mes, prima) si la póliza cuenta como venta activa."""
+    agente_id, estado, prima, creado_en, _cobertura = huella
+    if not agente_id or estado != 'activa' or creado_en is None:
+        return None
+    creado_en = timezone.localtime(creado_en) if timezone.is_aware(creado_en) else creado_en
+    return (agente_id, creado_en.year, creado_en.month, prima or 0)
+
+
+# --- Cambios incrementales ---
+
+def poliza_cambiada(anterior, actual):
+    """Aplica la diferencia entre dos huellas de póliza (None = no existía)."""
+    if anterior == actual:
+        return
+    venta_antes = _venta(anterior) if anterior else None
+    venta_despues = _venta(actual) if actual else None
+
+    afectados = set()
+    if venta_antes != venta_despues:
+        if venta_antes:
+            afectados.add(_sumar_venta(venta_antes, -1))
+        if venta_despues:
+            afectados.add(_sumar_venta(venta_despues, 1))
+
+    # Las últimas ventas también cambian si se edita una póliza activa
+    for huella in (anterior, actual):
+        if huella and _venta(huella):
+            afectados.add(huella[0])
+
+    for agente_id in afectados:
+        _refrescar_ultimas_ventas(agente_id)
+
+
+def cliente_cambiado(agente_antes, agente_despues):
+    if agente_antes == agente_despues:
+        return
+    if agente_antes:
+        _sumar(agente_antes, total_clientes=F('total_clientes') - 1)
+    if agente_despues:
+        _sumar(agente_despues, total_clientes=F('total_clientes') + 1)
+
+
+def _sumar(agente_id, **cambios):
+    """Actualiza la fila del agente; si no existe la reconstruye completa."""
+    actualizadas = EstadisticaAgente.objects.filter(agente_id=agente_id).update(
+        actualizado_en=timezone.now(), **cambios
+    )
+    if not actualizadas:
+        # La fila se crea ya con el estado actual de la BD, que incluye este cambio
+        recalcular_agente(agente_id)
+        return False
+    return True
+
+
+def _sumar_venta(venta, signo):
+    agente_id, anio, mes, prima = venta
+    if _sumar(agente_id, polizas_activas=F('polizas_activas') + signo):
+        fila, _ = EstadisticaAgenteMes.objects.get_or_create(agente_id=agente_id, anio=anio, mes=mes)
+        EstadisticaAgenteMes.objects.filter(pk=fila.pk).update(
+            ventas_monto=F('ventas_monto') + signo * prima,
+            polizas_vendidas=F('polizas_vendidas') + signo,
+        )
+    return agente_id
+
+
+def _refrescar_ultimas_ventas(agente_id):
+    EstadisticaAgente.objects.filter(agente_id=agente_id).update(
+        ultimas_ventas=_ultimas_ventas(agente_id)
+    )
+
+
+def _ultimas_ventas(agente_id):
+    polizas = (Poliza.objects.filter(agente_id=agente_id, estado='activa')
+               .order_by('-creado_en')
+               .values('id', 'cobertura', 'prima_anual', 'creado_en')[:ULTIMAS_VENTAS])
+    return [_venta_reciente(p) for p in polizas]
+
+
+def _venta_reciente(p):
+    return {
+        'id': p['id'],
+        'plan': p['cobertura'].split('.')[0] if p['cobertura'] else 'Seguro',
+        # Número en el JSON, como lo devolvía el dashboard antes de guardarlo aquí
+        'monto': float(p['prima_anual']) if p['prima_anual'] is not None else None,
+        'fecha': timezone.localtime(p['creado_en']).date().isoformat(),
+    }
+
+
+# --- Reconstrucción completa ---
+
+def recalcular_agente(agente_id):
+    """Recalcula desde cero las estadísticas de un agente. Devuelve la fila."""
+    if not Agente.objects.filter(id=agente_id).exists():
+        return None
+
+    activas = Poliza.objects.filter(agente_id=agente_id, estado='activa')
+    estadistica, _ = EstadisticaAgente.objects.update_or_create(
+        agente_id=agente_id,
+        defaults={
+            'total_clientes': Cliente.objects.filter(agente_id=agente_id).count(),
+            'polizas_activas': activas.count(),
+            'ultimas_ventas': _ultimas_ventas(agente_id),
+        },
+    )
+
+    por_mes = (activas.annotate(anio=ExtractYear('creado_en'), mes=ExtractMonth('creado_en'))
+               .values('anio', 'mes')
+               .annotate(monto=Sum('prima_anual'), cantidad=Count('id')))
+    EstadisticaAgenteMes.objects.filter(agente_id=agente_id).delete()
+    EstadisticaAgenteMes.objects.bulk_create([
+        EstadisticaAgenteMes(agente_id=agente_id, anio=fila['anio'], mes=fila['mes'],
+                             ventas_monto=fila['monto'] or 0, polizas_vendidas=fila['cantidad'])
+        for fila in por_mes
+    ])
+    return estadistica
+
+
+def recalcular_agentes(agente_ids):
+    """
+    recalcular_agente() de muchos agentes a la vez (después de un update()
+    masivo): unas pocas consultas agrupadas por agente en vez de ocho por
+    cada uno. Devuelve cuántos agentes recalculó.
+    """
+    agente_ids = list(Agente.objects.filter(id__in=set(agente_ids)).values_list('id', flat=True))
+    if not agente_ids:
+        return 0
+
+    clientes = dict(Cliente.objects.filter(agente_id__in=agente_ids).values('agente_id')
+                    .annotate(n=Count('id')).values_list('agente_id', 'n'))
+    activas = Poliza.objects.filter(agente_id__in=agente_ids, estado='activa')
+    cantidad = dict(activas.values('agente_id').annotate(n=Count('id')).values_list('agente_id', 'n'))
+    ultimas = defaultdict(list)
+    recientes = (activas.annotate(puesto=Window(RowNumber(), partition_by=F('agente_id'), order_by=F('creado_en').desc()))
+                 .filter(puesto__lte=ULTIMAS_VENTAS).order_by('agente_id', 'puesto')
+                 .values('agente_id', 'id', 'cobertura', 'prima_anual', 'creado_en'))
+    for p in recientes:
+        ultimas[p['agente_id']].append(_venta_reciente(p))
+
+    EstadisticaAgente.objects.bulk_create(
+        [EstadisticaAgente(agente_id=agente_id, total_clientes=clientes.get(agente_id, 0),
+                           polizas_activas=cantidad.get(agente_id, 0), ultimas_ventas=ultimas[agente_id])
+         for agente_id in agente_ids],
+        update_conflicts=True, unique_fields=['agente'],
+        update_fields=['total_clientes', 'polizas_activas', 'ultimas_ventas', 'actualizado_en'],
+    )
+
+    por_mes = (activas.annotate(anio=ExtractYear('creado_en'), mes=ExtractMonth('creado_en'))
+               .values('agente_id', 'anio', 'mes')
+               .annotate(monto=Sum('prima_anual'), cantidad=Count('id')))
+    EstadisticaAgenteMes.objects.filter(agente_id__in=agente_ids).delete()
+    EstadisticaAgenteMes.objects.bulk_create([
+        EstadisticaAgenteMes(agente_id=fila['agente_id'], anio=fila['anio'], mes=fila['mes'],
+                             ventas_monto=fila['monto'] or 0, polizas_vendidas=fila['cantidad'])
+        for fila in por_mes
+    ], batch_size=1000)
+    return len(agente_ids)
+
+
+def recalcular_todos():
+    total = 0
+    for agente_id in Agente.objects.values_list('id', flat=True).iterator():
+        recalcular_agente(agente_id)
+        total += 1
+    return total
@@ -0,0 +1,71 @@
+# en seguros/estado_pagos.py
+"""
+Estado de cada pago en la cache, para las vistas que lo consultan sin parar
+(verificar_estado_pago cada 3 s, y al conectar las de estado en vivo).
+
+Las señales de Pago lo escriben después del commit cada vez que se crea un
+pago o cambia su estado (iniciar_pago_qr, lista_pagos POST,
+simular_pago_exitoso, el admin...). Si falta, se lee de la BD y se guarda
+con add(): si justo entre medio se confirmó el pago, el valor de la señal
+gana y la lectura vieja no lo pisa.
+
+Las actualizaciones masivas (QuerySet.update) no disparan señales: después
+de una hay que llamar a cambiado() u olvidar() con los pagos tocados (ver
+confirmaciones.py).
+
+Para que lo que escribe la señal en un proceso lo vean los demás (otros
+workers, procesar_confirmaciones) la cache tiene que ser compartida: ver
+CACHE_COMPARTIDA en settings.
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+from . import notificaciones
+from .models import Pago
+
+DURACION = 60 * 60
+
+
+def _cache():
+    return caches[getattr(settings, 'CACHE_RESPUESTAS', 'default')]
+
+
+def _clave(pago_id):
+    return f'pago:estado:{pago_id}'
+
+
+def guardar(pago_id, estado):
+    _cache().set(_clave(pago_id), estado, DURACION)
+
+
+def cambiado(pago_id, estado, nuevo=False):
+    """Después del commit: deja el estado en la cache y despierta a los que esperan."""
+    guardar(pago_id, estado)
+    if not nuevo:
+        notificaciones.notificador().publicar(notificaciones.canal_pago(pago_id), estado)
+
+
+def olvidar(*pago_ids):
+    _cache().delete_many([_clave(pago_id) for pago_id in pago_ids])
+
+
+def estado(pago_id):
+    """Estado del pago ('pendiente', 'completado'...) o None si no existe."""
+    clave = _clave(pago_id)
+    valor = _cache().get(clave)
+    if valor is None:
+        valor = Pago.objects.filter(id=pago_id).values_list('estado', flat=True).first()
+        if valor is not None:
+            _cache().add(clave, valor, DURACION)
+    return valor
+
+
+async def aestado(pago_id):
+    """estado() para las vistas async."""
+    clave = _clave(pago_id)
+    valor = await _cache().aget(clave)
+    if valor is None:
+        valor = await Pago.objects.filter(id=pago_id).values_list('estado', flat=True).afirst()
+        if valor is not None:
+            await _cache().aadd(clave, valor, DURACION)
+    return valor
@@ -0,0 +1,136 @@
+# en seguros/facturacion.py
+"""
+Facturación mensual: la factura del mes de cada póliza activa, con su
+prima_mensual. Hasta ahora las facturas solo salían al emitir la póliza.
+
+- Las pólizas se recorren por id en bloques (TANDA) y las facturas de cada
+  bloque se crean con bulk_create, en una transacción por bloque.
+- Idempotente: la factura lleva su periodo (día 1 del mes) y hay una
+  restricción única (poliza, periodo). Lo ya emitido se salta.
+- La factura de emisión (la prima anual, al emitir la póliza) cubre su mes:
+  las vistas le ponen el periodo. Las anteriores a eso no lo tienen; cuenta
+  cualquier factura sin periodo emitida dentro del mes.
+- Reanudable: CorridaFacturacion guarda la última póliza facturada en la
+  misma transacción que el bloque. Si el proceso se corta, la siguiente
+  corrida del mismo periodo sigue desde ahí.
+
+bulk_create no dispara señales, pero una factura nueva no deja vieja
+ninguna respuesta en cache (las que se guardan dependen de la póliza, el
+cliente o el agente, no de sus facturas), así que no hay nada que avisar.
+"""
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import CorridaFacturacion, Factura, Poliza
+
+TANDA = 5000
+DIAS_PARA_PAGAR = 30
+
+
+def periodo_de(fecha):
+    return fecha.replace(day=1)
+
+
+def fin_de(periodo):
+    """Último día del mes de `periodo`."""
+    return (periodo + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+
+
+def numero_factura(periodo, poliza_id):
+    # Sale de la póliza y el mes: el mismo número si se vuelve a facturar
+    return f'FAC-{periodo:%Y%m}-{poliza_id:07d}'
+
+
+def a_facturar(periodo):
+    """Pólizas activas vigentes en algún día del mes."""
+    return Poliza.objects.filter(estado='activa', fecha_inicio__lte=fin_de(periodo),
+                                 fecha_vencimiento__gte=periodo)
+
+
+def _monto(prima_mensual, prima_anual):
+    # Las cargadas con bulk_create no pasan por Poliza.save() y pueden no tenerla
+    if prima_mensual:
+        return prima_mensual
+    return (prima_anual / 12).quantize(Decimal('0.01')) if prima_anual else None
+
+
+def facturar_tanda(periodo, tanda=TANDA):
+    """
+    Factura el siguiente bloque de pólizas de la corrida del `periodo`.
+    Devuelve (pólizas revisadas, facturas creadas); (0, 0) si ya no quedan.
+    """
+    with transaction.atomic():
+        # Bloqueada: dos corridas a la vez se turnan los bloques
+        corrida = CorridaFacturacion.objects.select_for_update().get(periodo=periodo)
+        polizas = list(
+            a_facturar(periodo).filter(id__gt=corrida.ultima_poliza).order_by('id')
+            .values_list('id', 'numero_poliza', 'prima_mensual', 'prima_anual')[:tanda]
+        )
+        if not polizas:
+            return 0, 0
+
+        desde, hasta = polizas[0][0], polizas[-1][0]
+        emitidas = set(
+            Factura.objects.filter(poliza_id__gte=desde, poliza_id__lte=hasta)
+            .filter(Q(periodo=periodo) | Q(periodo__isnull=True, fecha_emision__range=(periodo, fin_de(periodo))))
+            .values_list('poliza_id', flat=True)
+        )
+        vence = periodo + timedelta(days=DIAS_PARA_PAGAR)
+        nuevas = []
+        for poliza_id, numero_poliza, prima_mensual, prima_anual in polizas:
+            monto = _monto(prima_mensual, prima_anual)
+            if poliza_id in emitidas or not monto:
+                continue
+            nuevas.append(Factura(
+                poliza_id=poliza_id, numero_factura=numero_factura(periodo, poliza_id), monto=monto,
+                fecha_emision=periodo, fecha_vencimiento=vence, estado='pendiente', periodo=periodo,
+                concepto=f'Prima {periodo:%m/%Y} póliza {numero_poliza}',
+            ))
+        # ignore_conflicts por si otra cosa emitió la misma factura entre medio
+        Factura.objects.bulk_create(nuevas, ignore_conflicts=True)
+        CorridaFacturacion.objects.filter(pk=corrida.pk).update(
+            ultima_poliza=hasta, polizas=F('polizas') + len(polizas),
+            facturas=F('facturas') + len(nuevas), actualizada_en=timezone.now())
+    return len(polizas), len(nuevas)
+
+
+def facturar_periodo(periodo=None, tanda=TANDA, desde_cero=False, progreso=None):
+    """
+    Emite las facturas del mes `periodo` (por defecto, el actual). Sigue la
+    corrida que haya quedado a medias; con desde_cero vuelve a revisar
+    todas las pólizas (p. ej. para las activadas después de la corrida).
+    `progreso(polizas, facturas)` se llama después de cada bloque.
+    """
+    periodo = periodo_de(periodo or timezone.localdate())
+    corrida, creada = CorridaFacturacion.objects.get_or_create(periodo=periodo)
+    if desde_cero and not creada:
+        CorridaFacturacion.objects.filter(pk=corrida.pk).update(
+            estado='en_curso', ultima_poliza=0, terminada_en=None)
+        corrida.ultima_poliza = 0
+    elif corrida.estado == 'terminada':
+        CorridaFacturacion.objects.filter(pk=corrida.pk).update(estado='en_curso', terminada_en=None)
+
+    resumen = {'periodo': f'{periodo:%Y-%m}', 'reanudada_desde': corrida.ultima_poliza,
+               'polizas': 0, 'facturas': 0}
+    inicio = time.perf_counter()
+    while True:
+        polizas, facturas = facturar_tanda(periodo, tanda)
+        if not polizas:
+            break
+        resumen['polizas'] += polizas
+        resumen['facturas'] += facturas
+        if progreso:
+            progreso(resumen['polizas'], resumen['facturas'])
+    CorridaFacturacion.objects.filter(pk=corrida.pk).update(estado='terminada', terminada_en=timezone.now())
+
+    segundos = time.perf_counter() - inicio
+    # Ya facturadas antes o sin prima
+    resumen['omitidas'] = resumen['polizas'] - resumen['facturas']
+    resumen['segundos'] = round(segundos, 2)
+    resumen['facturas_por_segundo'] = round(resumen['facturas'] / segundos) if segundos else None
+    return resumen
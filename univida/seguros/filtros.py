@@ -0,0 +1,172 @@
+# en seguros/filtros.py
+"""
+Filtros y orden desde la URL para las listas, con lista blanca por vista.
+
+Gramática (todo opcional, se combina con AND):
+  ?estado=activa                 igualdad
+  ?estado=activa,pendiente_pago  varios valores (IN)
+  ?agente_id=null                sin valor (IS NULL)
+  ?fecha_vencimiento__gte=2025-01-01&fecha_vencimiento__lt=2025-02-01
+  ?prima_anual__gte=100          rangos: __gt, __gte, __lt, __lte
+  ?q=POL-12                      búsqueda por prefijo en los campos de búsqueda
+  ?ordering=-fecha_vencimiento   solo columnas indexadas (lista 'orden')
+
+Todo se traduce a comparaciones directas sobre columnas (sin funciones ni
+LIKE '%...%') para que la base de datos pueda usar los índices.
+"""
+from datetime import datetime
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+RANGOS = ('gt', 'gte', 'lt', 'lte')
+
+
+class FiltroLista:
+    def __init__(self, exactos=None, rangos=None, orden=None, busqueda=None):
+        # parámetro de la URL -> ruta ORM
+        self.exactos = exactos or {}
+        self.rangos = rangos or {}
+        self.orden = orden or []
+        self.busqueda = busqueda or []
+
+    def aplicar(self, queryset, request):
+        params = request.query_params
+        errores = {}
+        modelo = queryset.model
+
+        for param, ruta in self.exactos.items():
+            if param not in params:
+                continue
+            valores = [v for v in params.get(param).split(',') if v != '']
+            if not valores:
+                continue
+            if valores == ['null']:
+                queryset = queryset.filter(**{f'{ruta}__isnull': True})
+                continue
+            try:
+                valores = [_convertir(modelo, ruta, v) for v in valores]
+            except DjangoValidationError:
+                errores[param] = 'Valor inválido'
+                continue
+            if len(valores) == 1:
+                queryset = queryset.filter(**{ruta: valores[0]})
+            else:
+                queryset = queryset.filter(**{f'{ruta}__in': valores})
+
+        for param, ruta in self.rangos.items():
+            for lookup in RANGOS:
+                clave = f'{param}__{lookup}'
+                if clave not in params:
+                    continue
+                try:
+                    valor = _convertir(modelo, ruta, params.get(clave))
+                except DjangoValidationError:
+                    errores[clave] = 'Valor inválido'
+                    continue
+                queryset = queryset.filter(**{f'{ruta}__{lookup}': valor})
+
+        texto = params.get('q', '').strip()
+        if texto and self.busqueda:
+            condicion = Q()
+            for ruta in self.busqueda:
+                condicion |= Q(**{f'{ruta}__startswith': texto})
+            queryset = queryset.filter(condicion)
+
+        if errores:
+            raise ValidationError(errores)
+
+        if params.get('ordering'):
+            queryset = queryset.order_by(*self.ordenar(request, ()))
+        return queryset
+
+    def ordenar(self, request, por_defecto):
+        """
+        Devuelve la tupla de orden pedida en ?ordering= (validada contra la
+        lista blanca) o el orden por defecto de la vista. Se usa también para
+        construir el PaginacionCursor.
+        """
+        pedido = request.query_params.get('ordering')
+        if not pedido:
+            return tuple(por_defecto)
+
+        campos = [c.strip() for c in pedido.split(',') if c.strip()]
+        invalidos = [c for c in campos if c.lstrip('-') not in self.orden]
+        if invalidos:
+            raise ValidationError({
+                'ordering': f"No se puede ordenar por: {', '.join(invalidos)}. "
+                            f"Permitidos: {', '.join(self.orden)}"
+            })
+        return tuple(campos)
+
+
+def _convertir(modelo, ruta, valor):
+    """Convierte el texto de la URL al tipo de la columna (fecha, decimal, id...)."""
+    campo = None
+    for parte in ruta.split('__'):
+        campo = modelo._meta.get_field(parte)
+        if campo.is_relation:
+            modelo = campo.related_model
+    if campo.is_relation:
+        campo = campo.target_field
+    valor = campo.to_python(valor)
+    if isinstance(valor, datetime) and timezone.is_naive(valor):
+        valor = timezone.make_aware(valor)
+    return valor
+
+
+# --- Listas blancas por vista ---
+
+FILTROS_CLIENTE = FiltroLista(
+    exactos={'agente_id': 'agente_id', 'identificacion': 'identificacion', 'estado_salud': 'estado_salud'},
+    orden=['id'],
+    busqueda=['identificacion'],
+)
+
+FILTROS_POLIZA = FiltroLista(
+    exactos={'estado': 'estado', 'cliente_id': 'cliente_id', 'agente_id': 'agente_id',
+             'numero_poliza': 'numero_poliza'},
+    rangos={'fecha_inicio': 'fecha_inicio', 'fecha_vencimiento': 'fecha_vencimiento',
+            'creado_en': 'creado_en', 'prima_anual': 'prima_anual', 'suma_asegurada': 'suma_asegurada'},
+    orden=['id', 'fecha_vencimiento'],
+    busqueda=['numero_poliza'],
+)
+
+FILTROS_FACTURA = FiltroLista(
+    exactos={'estado': 'estado', 'poliza_id': 'poliza_id', 'cliente_id': 'poliza__cliente_id',
+             'agente_id': 'poliza__agente_id'},
+    rangos={'fecha_emision': 'fecha_emision', 'fecha_vencimiento': 'fecha_vencimiento', 'monto': 'monto'},
+    orden=['id', 'fecha_vencimiento'],
+    busqueda=['numero_factura'],
+)
+
+FILTROS_PAGO = FiltroLista(
+    exactos={'estado': 'estado', 'metodo_pago': 'metodo_pago', 'referencia_pago': 'referencia_pago',
+             'factura_id': 'factura_id', 'poliza_id': 'factura__poliza_id',
+             'cliente_id': 'factura__poliza__cliente_id', 'agente_id': 'factura__poliza__agente_id'},
+    rangos={'fecha_pago': 'fecha_pago', 'monto_pagado': 'monto_pagado'},
+    orden=['id'],
+    busqueda=['referencia_pago'],
+)
+
+FILTROS_SINIESTRO = FiltroLista(
+    exactos={'estado': 'estado', 'tipo_siniestro': 'tipo_siniestro', 'poliza_id': 'poliza_id',
+             'cliente_id': 'poliza__cliente_id', 'agente_id': 'poliza__agente_id'},
+    rangos={'fecha_siniestro': 'fecha_siniestro', 'fecha_reporte': 'fecha_reporte',
+            'monto_reclamado': 'monto_reclamado'},
+    orden=['id', 'fecha_reporte'],
+    busqueda=['numero_siniestro'],
+)
+
+FILTROS_BENEFICIARIO = FiltroLista(
+    exactos={'poliza_id': 'poliza_id'},
+    orden=['id'],
+)
+
+FILTROS_NOTA = FiltroLista(
+    exactos={'poliza_id': 'poliza_id', 'tipo_nota': 'tipo_nota', 'usuario_id': 'usuario_id'},
+    rangos={'fecha_creacion': 'fecha_creacion'},
+    orden=['id'],
+)
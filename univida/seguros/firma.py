@@ -0,0 +1,210 @@
+# en seguros/firma.py
+"""
+Firma digital (certificación PAdES) de los PDF de pólizas con pyHanko.
+
+- La clave y la cadena de certificados se cargan una vez por proceso
+  (firmante()), no en cada documento.
+- El PDF firmado se guarda al lado del PDF sin firmar, con la huella de
+  contenido más la del certificado: si se rota el certificado se vuelve a
+  firmar, si no, se reutiliza.
+- crear_ca_prueba() arma una CA local y un certificado de firma para
+  desarrollo y tests (comando crear_ca_prueba).
+
+Configuración: FIRMA_CLAVE, FIRMA_CERTIFICADO, FIRMA_CADENA (lista de
+certificados intermedios/raíz) y FIRMA_CLAVE_PASSWORD en settings.
+"""
+import hashlib
+from datetime import datetime, timedelta, timezone as tz
+from functools import cached_property, lru_cache
+from io import BytesIO
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ec import ECDSA
+from cryptography.hazmat.primitives.asymmetric.padding import PKCS1v15
+from pyhanko.pdf_utils.incremental_writer import IncrementalPdfFileWriter
+from pyhanko.sign import fields, signers
+from pyhanko_certvalidator.util import get_pyca_cryptography_hash
+
+from . import documentos
+
+CAMPO_FIRMA = 'FirmaUnivida'
+
+
+class ErrorFirma(Exception):
+    pass
+
+
+def configurada():
+    return bool(getattr(settings, 'FIRMA_CLAVE', None) and getattr(settings, 'FIRMA_CERTIFICADO', None))
+
+
+class Firmante(signers.SimpleSigner):
+    """
+    SimpleSigner que deserializa la clave privada una sola vez: pyHanko la
+    vuelve a leer del DER en cada firma y con RSA eso cuesta más que firmar.
+    """
+
+    @cached_property
+    def clave(self):
+        return serialization.load_der_private_key(self.signing_key.dump(), password=None)
+
+    def sign_raw(self, data, digest_algorithm):
+        mecanismo = self.get_signature_mechanism_for_digest(digest_algorithm).signature_algo
+        if mecanismo == 'rsassa_pkcs1v15':
+            return self.clave.sign(data, PKCS1v15(), get_pyca_cryptography_hash(digest_algorithm))
+        if mecanismo == 'ecdsa':
+            return self.clave.sign(data, ECDSA(get_pyca_cryptography_hash(digest_algorithm)))
+        return super().sign_raw(data, digest_algorithm)
+
+    @cached_property
+    def bytes_reservados(self):
+        # Espacio para el CMS: certificados + firma + atributos, con margen.
+        # Fijo, así pyHanko no hace una firma de prueba para estimarlo.
+        certificados = sum(len(c.dump()) for c in self.cert_registry) + len(self.signing_cert.dump())
+        return 2 * certificados + 8192
+
+
+@lru_cache(maxsize=None)
+def firmante():
+    """Firmante con la clave y la cadena de settings (una vez por proceso)."""
+    if not configurada():
+        raise ImproperlyConfigured('Faltan FIRMA_CLAVE / FIRMA_CERTIFICADO para firmar documentos.')
+    password = getattr(settings, 'FIRMA_CLAVE_PASSWORD', None)
+    cargado = signers.SimpleSigner.load(
+        settings.FIRMA_CLAVE, settings.FIRMA_CERTIFICADO,
+        ca_chain_files=tuple(getattr(settings, 'FIRMA_CADENA', ())),
+        key_passphrase=password.encode() if password else None,
+    )
+    if cargado is None:
+        raise ImproperlyConfigured('No se pudo leer la clave o el certificado de firma.')
+    resultado = Firmante(signing_cert=cargado.signing_cert, signing_key=cargado.signing_key,
+                         cert_registry=cargado.cert_registry)
+    resultado.clave  # se paga aquí, al cargar el proceso
+    return resultado
+
+
+@lru_cache(maxsize=None)
+def huella_certificado():
+    return hashlib.sha256(firmante().signing_cert.dump()).hexdigest()[:16]
+
+
+@receiver(setting_changed)
+def olvidar_firmante(setting, **kwargs):
+    if setting.startswith('FIRMA_'):
+        firmante.cache_clear()
+        huella_certificado.cache_clear()
+
+
+def ruta_firmada(huella):
+    return documentos.ruta(huella).with_name(f'{huella}.{huella_certificado()}.firmado.pdf')
+
+
+def firmar(contenido):
+    """Bytes del PDF `contenido` con una firma de certificación de Univida."""
+    metadatos = signers.PdfSignatureMetadata(
+        field_name=CAMPO_FIRMA,
+        certify=True,
+        # Después de certificado solo se permite rellenar formularios y firmar
+        docmdp_permissions=fields.MDPPerm.FILL_FORMS,
+        reason='Certificado de póliza emitido por Seguros Univida',
+        location=getattr(settings, 'FIRMA_LUGAR', 'Bolivia'),
+    )
+    try:
+        escritor = IncrementalPdfFileWriter(BytesIO(contenido))
+        cargado = firmante()
+        return signers.sign_pdf(escritor, metadatos, signer=cargado,
+                                bytes_reserved=cargado.bytes_reservados).getvalue()
+    except ImproperlyConfigured:
+        raise
+    except Exception as e:
+        raise ErrorFirma(f'No se pudo firmar el PDF: {e}') from e
+
+
+def obtener_pdf_firmado(poliza_id):
+    """
+    Como documentos.obtener_pdf() pero firmado. Reutiliza el PDF sin firmar y
+    el firmado si ya están en disco. Lanza Poliza.DoesNotExist, ErrorPdf o ErrorFirma.
+    """
+    documento = documentos.obtener_pdf(poliza_id)
+    destino = ruta_firmada(documento.huella)
+    if destino.exists():
+        return documento._replace(ruta=destino)
+    firmado = firmar(documento.ruta.read_bytes())
+    documentos.guardar_en(destino, firmado)
+    return documento._replace(ruta=destino, nuevo=True)
+
+
+# --- CA de prueba ---
+
+def crear_ca_prueba(directorio, nombre='Seguros Univida (PRUEBA)', dias=365):
+    """
+    Escribe en `directorio` una CA raíz y un certificado de firma emitido por
+    ella (claves RSA sin contraseña). Devuelve los valores para settings.
+    Solo para desarrollo: nadie fuera de este sistema confía en esta CA.
+    """
+    from cryptography import x509
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from cryptography.x509.oid import ExtendedKeyUsageOID, NameOID
+
+    directorio = Path(directorio)
+    directorio.mkdir(parents=True, exist_ok=True)
+    ahora = datetime.now(tz.utc)
+
+    def nombre_x509(cn):
+        return x509.Name([
+            x509.NameAttribute(NameOID.COUNTRY_NAME, 'BO'),
+            x509.NameAttribute(NameOID.ORGANIZATION_NAME, nombre),
+            x509.NameAttribute(NameOID.COMMON_NAME, cn),
+        ])
+
+    def emitir(sujeto, clave_publica, emisor, clave_emisor, es_ca):
+        certificado = (
+            x509.CertificateBuilder()
+            .subject_name(sujeto).issuer_name(emisor)
+            .public_key(clave_publica)
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(ahora - timedelta(minutes=5))
+            .not_valid_after(ahora + timedelta(days=dias))
+            .add_extension(x509.BasicConstraints(ca=es_ca, path_length=None), critical=True)
+            .add_extension(x509.SubjectKeyIdentifier.from_public_key(clave_publica), critical=False)
+            .add_extension(x509.AuthorityKeyIdentifier.from_issuer_public_key(clave_emisor.public_key()),
+                           critical=False)
+        )
+        if es_ca:
+            uso = x509.KeyUsage(digital_signature=True, content_commitment=False, key_encipherment=False,
+                                data_encipherment=False, key_agreement=False, key_cert_sign=True,
+                                crl_sign=True, encipher_only=False, decipher_only=False)
+        else:
+            uso = x509.KeyUsage(digital_signature=True, content_commitment=True, key_encipherment=False,
+                                data_encipherment=False, key_agreement=False, key_cert_sign=False,
+                                crl_sign=False, encipher_only=False, decipher_only=False)
+            certificado = certificado.add_extension(
+                x509.ExtendedKeyUsage([ExtendedKeyUsageOID.EMAIL_PROTECTION]), critical=False)
+        return certificado.add_extension(uso, critical=True).sign(clave_emisor, hashes.SHA256())
+
+    clave_ca = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    ca = emitir(nombre_x509(f'{nombre} CA raíz'), clave_ca.public_key(),
+                nombre_x509(f'{nombre} CA raíz'), clave_ca, es_ca=True)
+    clave = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    certificado = emitir(nombre_x509(f'{nombre} firma de documentos'), clave.public_key(),
+                         ca.subject, clave_ca, es_ca=False)
+
+    ruta_ca = directorio / 'ca.pem'
+    ruta_certificado = directorio / 'firma.pem'
+    ruta_clave = directorio / 'firma-clave.pem'
+    ruta_ca.write_bytes(ca.public_bytes(serialization.Encoding.PEM))
+    ruta_certificado.write_bytes(certificado.public_bytes(serialization.Encoding.PEM))
+    ruta_clave.write_bytes(clave.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()))
+    ruta_clave.chmod(0o600)
+    return {
+        'FIRMA_CLAVE': str(ruta_clave),
+        'FIRMA_CERTIFICADO': str(ruta_certificado),
+        'FIRMA_CADENA': [str(ruta_ca)],
+    }
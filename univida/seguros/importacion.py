@@ -0,0 +1,280 @@
+# en seguros/importacion.py
+"""
+Alta masiva de clientes o agentes desde un archivo CSV o JSONL (comando
+importar_usuarios y POST /api/usuarios/importar/), en vez de un
+CrearClienteSerializer / UsuarioAgenteSerializer por llamada HTTP.
+
+- El archivo se lee en streaming y se trabaja por tandas (TANDA filas).
+- Cada fila se valida con ImportarClienteSerializer/ImportarAgenteSerializer
+  (solo formato). Lo que tiene que ser único (username, identificación,
+  código de agente) se comprueba con una consulta por tanda, y contra las
+  filas anteriores del mismo archivo.
+- El hash de las contraseñas (PBKDF2, lo más caro con diferencia) se hace
+  en un pool de procesos. Mientras el pool hashea una tanda, se guarda la
+  anterior. El pool es para el comando; el endpoint hashea en su propio
+  proceso salvo que IMPORTACION_PROCESOS diga otra cosa. Sin contraseña,
+  la cuenta queda sin contraseña utilizable (se activa con "olvidé mi
+  contraseña") y no cuesta nada.
+- Usuario y Cliente/Agente se insertan con bulk_create, una transacción
+  por tanda. Si algo se coló entre la validación y el INSERT, esa tanda
+  se guarda fila por fila para saber cuál falló.
+
+bulk_create no dispara señales: aquí se llena Cliente.busqueda, se crea
+la EstadisticaAgente de cada agente nuevo y se recalculan los agentes
+que reciben clientes.
+
+Cada fila que no entra va al reporte de errores con su línea y el motivo.
+"""
+import csv
+import io
+import json
+import multiprocessing
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from itertools import islice
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+
+from . import cache_respuestas, estadisticas
+from .busqueda import texto_busqueda
+from .models import Agente, Cliente, EstadisticaAgente, Usuario
+from .serializers import ImportarAgenteSerializer, ImportarClienteSerializer
+
+TANDA = 1000
+TIPOS = ('cliente', 'agente')
+
+ErrorFila = namedtuple('ErrorFila', 'linea username campo mensaje')
+
+CAMPOS_USUARIO = ('first_name', 'last_name', 'email', 'telefono')
+
+
+class ArchivoInvalido(ValueError):
+    pass
+
+
+# --- Lectura ---
+
+def leer(archivo):
+    """(línea, dict) del archivo (binario): JSONL si empieza con '{', si no CSV con cabecera."""
+    inicio = archivo.read(64)
+    archivo.seek(0)
+    texto = io.TextIOWrapper(archivo, encoding='utf-8-sig', errors='replace', newline='')
+    if inicio.lstrip(b'\xef\xbb\xbf \t\r\n').startswith(b'{'):
+        return _leer_jsonl(texto)
+    return _leer_csv(texto)
+
+
+def _leer_jsonl(texto):
+    for numero, linea in enumerate(texto, start=1):
+        if not linea.strip():
+            continue
+        try:
+            datos = json.loads(linea)
+        except ValueError:
+            datos = None
+        yield numero, datos if isinstance(datos, dict) else None
+
+
+def _leer_csv(texto):
+    cabecera = texto.readline()
+    separador = ';' if cabecera.count(';') > cabecera.count(',') else ','
+    nombres = [n.strip().lower() for n in next(csv.reader([cabecera], delimiter=separador), [])]
+    if 'username' not in nombres:
+        raise ArchivoInvalido("El CSV necesita una cabecera con la columna 'username'")
+    for numero, fila in enumerate(csv.reader(texto, delimiter=separador), start=2):
+        if not any(fila):
+            continue
+        # Vacío = no viene: así los opcionales toman su valor por defecto
+        yield numero, {nombre: valor.strip() for nombre, valor in zip(nombres, fila) if nombre and valor.strip()}
+
+
+# --- Importación ---
+
+def _contexto(fork=False):
+    # Como lote_documentos: fork solo desde el comando (sin hilos); desde el servidor, spawn
+    metodos = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('fork' if fork and 'fork' in metodos else 'spawn')
+
+
+class Importacion:
+    def __init__(self, tipo, procesos=None, tanda=TANDA, fork=False):
+        if tipo not in TIPOS:
+            raise ArchivoInvalido(f"Tipo desconocido: {tipo!r} (se importan {', '.join(TIPOS)})")
+        self.tipo = tipo
+        self.procesos = max(1, procesos or os.cpu_count() or 1)
+        self.tanda = tanda
+        self.fork = fork
+        self.serializer = ImportarClienteSerializer if tipo == 'cliente' else ImportarAgenteSerializer
+        self.errores = []
+        self.filas = 0
+        self.creados = 0
+        # Lo visto en el archivo: la segunda vez es un duplicado
+        self.usernames = set()
+        self.claves = set()
+
+    def procesar(self, filas):
+        inicio = time.perf_counter()
+        # Con spawn el hijo arranca sin Django. Se prepara con django.setup a
+        # secas: un inicializador de este módulo lo haría importar modelos antes
+        ejecutor = (ProcessPoolExecutor(self.procesos, mp_context=_contexto(self.fork), initializer=django.setup)
+                    if self.procesos > 1 else nullcontext())
+        with ejecutor as pool:
+            anterior = None
+            while tanda := list(islice(filas, self.tanda)):
+                validas = self.validar(tanda)
+                hashes = self.hashear(pool, validas)
+                if anterior:
+                    self.guardar(*anterior)
+                anterior = (validas, hashes)
+            if anterior:
+                self.guardar(*anterior)
+
+        segundos = time.perf_counter() - inicio
+        return {
+            'tipo': self.tipo,
+            'filas': self.filas,
+            'creados': self.creados,
+            # Filas con errores (una fila puede tener varios)
+            'errores': len({e.linea for e in self.errores}),
+            'procesos': self.procesos,
+            'segundos': round(segundos, 2),
+            'cuentas_por_minuto': round(self.creados / segundos * 60) if segundos else None,
+        }
+
+    def error(self, linea, datos, campo, mensaje):
+        username = datos.get('username', '') if isinstance(datos, dict) else ''
+        self.errores.append(ErrorFila(linea, username, campo, mensaje))
+
+    def validar(self, tanda):
+        """Filas válidas de la tanda como (línea, datos); las demás van a self.errores."""
+        clave = 'identificacion' if self.tipo == 'cliente' else 'codigo_agente'
+        candidatas = []
+        for linea, datos in tanda:
+            self.filas += 1
+            if datos is None:
+                self.error(linea, datos, '', 'Línea ilegible (se espera un objeto JSON por línea)')
+                continue
+            serializer = self.serializer(data=datos)
+            if not serializer.is_valid():
+                for campo, mensajes in serializer.errors.items():
+                    self.error(linea, datos, campo, ' '.join(str(m) for m in mensajes))
+                continue
+            datos = serializer.validated_data
+            if datos['username'] in self.usernames:
+                self.error(linea, datos, 'username', 'Repetido en el archivo')
+            elif datos[clave] in self.claves:
+                self.error(linea, datos, clave, 'Repetido en el archivo')
+            else:
+                self.usernames.add(datos['username'])
+                self.claves.add(datos[clave])
+                candidatas.append((linea, datos))
+        if not candidatas:
+            return []
+
+        # Lo que ya está en la BD: una consulta por campo para toda la tanda
+        usados = set(Usuario.objects.filter(username__in=[d['username'] for _, d in candidatas])
+                     .values_list('username', flat=True))
+        perfil = Cliente if self.tipo == 'cliente' else Agente
+        claves_usadas = set(perfil.objects.filter(**{f'{clave}__in': [d[clave] for _, d in candidatas]})
+                            .values_list(clave, flat=True))
+        agentes = {}
+        if self.tipo == 'cliente':
+            codigos = {d['agente'] for _, d in candidatas if d.get('agente')}
+            agentes = dict(Agente.objects.filter(codigo_agente__in=codigos).values_list('codigo_agente', 'id'))
+
+        validas = []
+        for linea, datos in candidatas:
+            if datos['username'] in usados:
+                self.error(linea, datos, 'username', 'Ya existe un usuario con ese username')
+            elif datos[clave] in claves_usadas:
+                self.error(linea, datos, clave, f'Ya existe un {self.tipo} con ese valor')
+            elif datos.get('agente') and datos['agente'] not in agentes:
+                self.error(linea, datos, 'agente', f"No hay un agente con código {datos['agente']}")
+            else:
+                if datos.get('agente'):
+                    datos['agente_id'] = agentes[datos['agente']]
+                validas.append((linea, datos))
+        return validas
+
+    def hashear(self, pool, validas):
+        """Hashes de las contraseñas de la tanda (futuros si hay pool)."""
+        claves = [datos.get('password') or None for _, datos in validas]
+        if not any(claves):
+            # make_password(None): contraseña inutilizable, no cuesta nada
+            return [make_password(None) for _ in claves]
+        if pool is None:
+            return [make_password(c) for c in claves]
+        por_proceso = -(-len(claves) // self.procesos)
+        return pool.map(make_password, claves, chunksize=max(1, por_proceso // 4))
+
+    def guardar(self, validas, hashes):
+        if not validas:
+            return
+        filas = list(zip(validas, hashes))
+        try:
+            with transaction.atomic():
+                self._insertar(filas)
+            self.creados += len(filas)
+        except IntegrityError:
+            # Alguien creó lo mismo entre la validación y el INSERT: de a una
+            for fila in filas:
+                try:
+                    with transaction.atomic():
+                        self._insertar([fila])
+                    self.creados += 1
+                except IntegrityError as e:
+                    (linea, datos), _ = fila
+                    self.error(linea, datos, '', f'No se pudo guardar: {e}')
+
+    def _insertar(self, filas):
+        rol = 'CLIENTE' if self.tipo == 'cliente' else 'AGENTE'
+        usuarios = Usuario.objects.bulk_create([
+            Usuario(username=datos['username'], password=hash_, rol=rol,
+                    **{campo: datos.get(campo, '') for campo in CAMPOS_USUARIO})
+            for (_, datos), hash_ in filas
+        ])
+        if self.tipo == 'cliente':
+            Cliente.objects.bulk_create([
+                Cliente(usuario=usuario, fecha_nacimiento=datos['fecha_nacimiento'], direccion=datos['direccion'],
+                        identificacion=datos['identificacion'], estado_salud=datos.get('estado_salud', 'Bueno'),
+                        agente_id=datos.get('agente_id'),
+                        busqueda=texto_busqueda(usuario.first_name, usuario.last_name,
+                                                datos['identificacion'], usuario.email))
+                for usuario, ((_, datos), _) in zip(usuarios, filas)
+            ])
+            # Lo que haría cliente_guardado: total_clientes de sus agentes
+            estadisticas.recalcular_agentes(datos.get('agente_id') for (_, datos), _ in filas)
+        else:
+            agentes = Agente.objects.bulk_create([
+                Agente(usuario=usuario, codigo_agente=datos['codigo_agente'],
+                       fecha_contratacion=datos['fecha_contratacion'],
+                       especialidad=datos.get('especialidad', 'Seguros de Vida'),
+                       telefono_oficina=datos.get('telefono_oficina') or None,
+                       direccion_oficina=datos.get('direccion_oficina') or None)
+                for usuario, ((_, datos), _) in zip(usuarios, filas)
+            ])
+            # Lo que haría agente_guardado, y la lista de agentes en cache
+            EstadisticaAgente.objects.bulk_create([EstadisticaAgente(agente=agente) for agente in agentes])
+            cache_respuestas.invalidar('agentes')
+
+
+def importar(archivo, tipo, procesos=None, tanda=TANDA, fork=False):
+    """
+    Importa el archivo (binario). Devuelve (resumen, errores). fork=True
+    solo desde el comando (ver _contexto).
+    """
+    importacion = Importacion(tipo, procesos, tanda, fork)
+    resumen = importacion.procesar(leer(archivo))
+    return resumen, importacion.errores
+
+
+def escribir_reporte(errores, destino):
+    """Reporte de errores en CSV sobre `destino` (archivo de texto)."""
+    escritor = csv.writer(destino)
+    escritor.writerow(ErrorFila._fields)
+    escritor.writerows(errores)
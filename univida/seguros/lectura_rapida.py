@@ -0,0 +1,148 @@
+# en seguros/lectura_rapida.py
+"""
+Lectura rápida (solo lectura) para las listas grandes.
+
+En vez de instanciar un ModelSerializer por fila, "compilamos" el serializer
+una sola vez: sacamos de sus campos la lista de columnas para values_list()
+y una función que arma el dict de cada fila. Las relaciones "a muchos"
+(beneficiarios) se leen en una segunda consulta y se agrupan por id.
+
+La salida es la misma que la del serializer (mismas claves, mismo orden y
+mismo formato de decimales y fechas); los tests de paridad lo comprueban.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+
+
+# Campos cuyo valor crudo de la BD no sale igual en el JSON
+_CON_CONVERSION = (serializers.DecimalField, serializers.DateField, serializers.DateTimeField)
+
+_BLOQUE_IN = 900
+
+
+class Lector:
+    """Serializer compilado: columnas + instrucciones para armar cada fila."""
+
+    def __init__(self, modelo):
+        self.modelo = modelo
+        self.columnas = []
+        self.pasos = []      # (clave, tipo, dato)
+        self.muchos = []     # (clave, lector_hijo, columna_padre, fk_hijo)
+
+    def columna(self, ruta):
+        if ruta not in self.columnas:
+            self.columnas.append(ruta)
+        return self.columnas.index(ruta)
+
+
+def compilar(serializer):
+    """Compila un serializer (clase, instancia o many=True) a un Lector."""
+    if isinstance(serializer, type):
+        serializer = serializer()
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+
+    lector = Lector(serializer.Meta.model)
+    lector.pasos = _compilar_campos(serializer, lector.modelo, '', lector)
+    return lector
+
+
+def leer(queryset, serializer):
+    """Devuelve la lista de dicts que daría serializer(queryset, many=True).data"""
+    return _ejecutar(compilar(serializer), queryset)
+
+
+def _ruta(prefijo, attr):
+    return f'{prefijo}__{attr}' if prefijo else attr
+
+
+def _compilar_campos(serializer, modelo, prefijo, lector):
+    pasos = []
+    for nombre, campo in serializer.fields.items():
+        if campo.write_only:
+            continue
+        if campo.source == '*':
+            raise ValueError(f'Campo no soportado en lectura rápida: {nombre}')
+
+        if isinstance(campo, serializers.ListSerializer):
+            relacion = _relacion(modelo, campo.source_attrs)
+            hijo = compilar(campo.child)
+            if hijo.muchos:
+                raise ValueError(f'Relaciones "a muchos" anidadas no soportadas: {nombre}')
+            padre = lector.columna(_ruta(prefijo, 'pk'))
+            lector.muchos.append((nombre, hijo, padre, relacion.field.name))
+            pasos.append((nombre, 'muchos', len(lector.muchos) - 1))
+
+        elif isinstance(campo, serializers.BaseSerializer):
+            relacion = _relacion(modelo, campo.source_attrs)
+            ruta = _ruta(prefijo, '__'.join(campo.source_attrs))
+            # Si la FK es nula el serializer devuelve None para todo el bloque
+            nulo = lector.columna(ruta) if relacion.null else None
+            sub_pasos = _compilar_campos(campo, relacion.related_model, ruta, lector)
+            pasos.append((nombre, 'bloque', (nulo, sub_pasos)))
+
+        else:
+            indice = lector.columna(_ruta(prefijo, '__'.join(campo.source_attrs)))
+            if isinstance(campo, _CON_CONVERSION):
+                pasos.append((nombre, 'convertir', (indice, campo.to_representation)))
+            else:
+                pasos.append((nombre, 'valor', indice))
+    return pasos
+
+
+def _relacion(modelo, attrs):
+    actual = None
+    for attr in attrs:
+        try:
+            actual = modelo._meta.get_field(attr)
+        except FieldDoesNotExist:
+            raise ValueError(f'{modelo.__name__}.{attr} no es una relación')
+        modelo = actual.related_model
+    return actual
+
+
+def _armar(pasos, fila, hijos):
+    resultado = {}
+    for clave, tipo, dato in pasos:
+        if tipo == 'valor':
+            resultado[clave] = fila[dato]
+        elif tipo == 'convertir':
+            indice, convertir = dato
+            valor = fila[indice]
+            resultado[clave] = None if valor is None else convertir(valor)
+        elif tipo == 'bloque':
+            nulo, sub_pasos = dato
+            if nulo is not None and fila[nulo] is None:
+                resultado[clave] = None
+            else:
+                resultado[clave] = _armar(sub_pasos, fila, hijos)
+        else:
+            resultado[clave] = hijos[dato]
+    return resultado
+
+
+def _ejecutar(lector, queryset):
+    queryset = queryset.select_related(None).prefetch_related(None)
+    filas = list(queryset.values_list(*lector.columnas))
+
+    # Una consulta por cada relación "a muchos", agrupada por el id del padre
+    agrupados = []
+    for _clave, hijo, padre, fk in lector.muchos:
+        ids = sorted({fila[padre] for fila in filas})
+        grupos = {}
+        # En bloques para no pasar el límite de parámetros de SQLite
+        for inicio in range(0, len(ids), _BLOQUE_IN):
+            bloque = ids[inicio:inicio + _BLOQUE_IN]
+            sub_qs = hijo.modelo._default_manager.filter(**{f'{fk}__in': bloque}).order_by(fk, 'pk')
+            for sub_fila in sub_qs.values_list(fk, *hijo.columnas):
+                grupos.setdefault(sub_fila[0], []).append(sub_fila[1:])
+        agrupados.append((hijo, padre, grupos))
+
+    resultado = []
+    for fila in filas:
+        hijos = [
+            [_armar(hijo.pasos, sub_fila, []) for sub_fila in grupos.get(fila[padre], ())]
+            for hijo, padre, grupos in agrupados
+        ]
+        resultado.append(_armar(lector.pasos, fila, hijos))
+    return resultado
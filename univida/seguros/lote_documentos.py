@@ -0,0 +1,119 @@
+# en seguros/lote_documentos.py
+"""
+PDF de muchas pólizas de una vez (cartera de un agente, estados de cuenta
+anuales...) repartidos en un pool de procesos y empaquetados en un ZIP.
+
+Cada proceso prepara Django, la plantilla y las fuentes de xhtml2pdf una
+sola vez (_iniciar_proceso) y después recibe tandas de ids. Los PDF pasan
+por documentos.obtener_pdf(), así que lo que ya estaba en disco no se
+vuelve a renderizar. Con firmar=True cada proceso carga además la clave y
+el certificado una vez (firma.firmante()) y firma lo que genera. El proceso
+principal va metiendo los archivos en el ZIP a medida que llegan las tandas.
+
+Este módulo no importa modelos arriba: con el método 'spawn' los procesos
+lo cargan antes de que Django esté listo.
+"""
+import multiprocessing
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+TANDA = 50
+
+
+def _iniciar_proceso(firmar=False):
+    import django
+    from django.apps import apps
+
+    if not apps.ready:
+        django.setup()
+
+    from io import BytesIO
+    from xhtml2pdf import pisa
+    from . import documentos
+
+    # Plantilla compilada y fuentes de reportlab cargadas antes del primer PDF
+    documentos.version_plantilla()
+    pisa.pisaDocument(BytesIO(b'<p>univida</p>'), BytesIO())
+    if firmar:
+        from . import firma
+        firma.firmante()
+
+
+def _renderizar_tanda(poliza_ids, firmar=False):
+    from . import documentos, firma
+    from .models import Poliza
+
+    obtener = firma.obtener_pdf_firmado if firmar else documentos.obtener_pdf
+    resultados = []
+    for poliza_id in poliza_ids:
+        try:
+            documento = obtener(poliza_id)
+        except (Poliza.DoesNotExist, documentos.ErrorPdf, firma.ErrorFirma) as e:
+            resultados.append((poliza_id, None, None, False, str(e) or e.__class__.__name__))
+        else:
+            resultados.append((poliza_id, str(documento.ruta), documento.nombre, documento.nuevo, None))
+    return resultados
+
+
+def _contexto(fork=False):
+    # fork hereda la plantilla ya cargada, pero solo es seguro desde un proceso
+    # sin hilos (el comando). Desde el servidor, que tiene pools de hilos, spawn
+    metodos = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('fork' if fork and 'fork' in metodos else 'spawn')
+
+
+def generar_lote(poliza_ids, destino, procesos=None, tanda=TANDA, progreso=None, firmar=False, fork=False):
+    """
+    Escribe en `destino` (ruta o archivo abierto en binario) un ZIP con el PDF
+    de cada póliza (firmado si `firmar`). `progreso(hechos, total)` se llama
+    después de cada tanda. Devuelve un resumen con los tiempos. fork=True
+    solo desde el comando (ver _contexto).
+    """
+    from django.db import connections
+
+    if firmar:
+        from . import firma
+        # Sin configuración falla aquí y no en cada póliza de cada proceso
+        firma.firmante()
+
+    poliza_ids = list(poliza_ids)
+    tandas = [poliza_ids[i:i + tanda] for i in range(0, len(poliza_ids), tanda)]
+    procesos = max(1, min(procesos or os.cpu_count() or 1, len(tandas)))
+    resumen = {'total': len(poliza_ids), 'renderizados': 0, 'reutilizados': 0, 'errores': [],
+               'procesos': procesos}
+
+    inicio = time.perf_counter()
+    with zipfile.ZipFile(destino, 'w', zipfile.ZIP_STORED) as archivo_zip:
+        # Los PDF ya vienen comprimidos: ZIP_STORED evita gastar CPU en nada
+        def agregar(resultados):
+            for poliza_id, ruta, nombre, nuevo, error in resultados:
+                if error:
+                    resumen['errores'].append((poliza_id, error))
+                    continue
+                archivo_zip.write(ruta, nombre)
+                resumen['renderizados' if nuevo else 'reutilizados'] += 1
+            if progreso:
+                progreso(resumen['renderizados'] + resumen['reutilizados'] + len(resumen['errores']),
+                         resumen['total'])
+
+        if procesos == 1:
+            for ids in tandas:
+                agregar(_renderizar_tanda(ids, firmar))
+        else:
+            if fork:
+                # Que los hijos no hereden conexiones abiertas del padre
+                connections.close_all()
+            with ProcessPoolExecutor(max_workers=procesos, mp_context=_contexto(fork),
+                                     initializer=_iniciar_proceso, initargs=(firmar,)) as pool:
+                pendientes = [pool.submit(_renderizar_tanda, ids, firmar) for ids in tandas]
+                for futuro in as_completed(pendientes):
+                    agregar(futuro.result())
+
+    segundos = time.perf_counter() - inicio
+    hechos = resumen['renderizados'] + resumen['reutilizados']
+    resumen['segundos'] = round(segundos, 2)
+    resumen['pdfs_por_segundo'] = round(hechos / segundos, 1) if segundos else None
+    resumen['pdfs_por_segundo_nucleo'] = round(hechos / segundos / procesos, 1) if segundos else None
+    return resumen
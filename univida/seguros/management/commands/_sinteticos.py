@@ -0,0 +1,120 @@
+"""
+Cartera sintética para los comandos de benchmark.
+
+Se crea con bulk_create y pensando en usarse dentro de un transaction.atomic()
+que luego se revierte, para no dejar basura en la base de datos.
+"""
+import random
+import uuid
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+
+from seguros.busqueda import texto_busqueda
+from seguros.models import Usuario, Cliente, Poliza, Beneficiario, Agente, Factura, Pago, Siniestro
+
+ESTADOS_POLIZA = ['activa'] * 6 + ['pendiente_pago', 'cotizacion', 'inactiva', 'vencida']
+ESTADOS_FACTURA = ['pagada'] * 3 + ['pendiente', 'vencida']
+TIPOS_SINIESTRO = ['muerte', 'invalidez', 'gastos_medicos', 'hospitalizacion', 'otros']
+NOMBRES = ['Ana', 'José', 'María', 'Luis', 'Carmen', 'Jorge', 'Lucía', 'Andrés', 'Sofía', 'Martín',
+           'Valeria', 'Diego', 'Camila', 'Óscar', 'Rocío', 'Iván', 'Inés', 'Raúl', 'Belén', 'Ramón']
+APELLIDOS = ['Pérez', 'González', 'Rodríguez', 'Fernández', 'López', 'Martínez', 'Sánchez', 'Gómez',
+             'Díaz', 'Álvarez', 'Romero', 'Suárez', 'Quispe', 'Mamani', 'Gutiérrez', 'Vargas',
+             'Castillo', 'Ordóñez', 'Muñoz', 'Chávez']
+
+
+def crear_cartera(polizas, clientes_por_agente=100, semilla=42):
+    """Crea `polizas` pólizas con su cliente, agente, beneficiarios, factura, pago y algún siniestro."""
+    azar = random.Random(semilla)
+    lote = uuid.uuid4().hex[:6]
+    sin_password = make_password(None)
+    hoy = date.today()
+
+    n_agentes = max(1, polizas // clientes_por_agente)
+    usuarios_agente = Usuario.objects.bulk_create([
+        Usuario(username=f'bench-{lote}-ag{i}', password=sin_password, rol='AGENTE',
+                first_name='Agente', last_name=str(i))
+        for i in range(n_agentes)
+    ])
+    agentes = Agente.objects.bulk_create([
+        Agente(usuario=u, codigo_agente=f'B{lote}-{i}', fecha_contratacion=hoy)
+        for i, u in enumerate(usuarios_agente)
+    ])
+
+    usuarios = Usuario.objects.bulk_create([
+        Usuario(username=f'bench-{lote}-cl{i}', password=sin_password, rol='CLIENTE',
+                first_name='Cliente', last_name=str(i), email=f'cl{i}@ejemplo.com')
+        for i in range(polizas)
+    ], batch_size=1000)
+    clientes = Cliente.objects.bulk_create([
+        Cliente(usuario=u, fecha_nacimiento=date(1970 + i % 40, 1 + i % 12, 1), direccion='Calle 1',
+                identificacion=f'B{lote}-{i}', agente=agentes[i % n_agentes],
+                busqueda=texto_busqueda(u.first_name, u.last_name, f'B{lote}-{i}', u.email))
+        for i, u in enumerate(usuarios)
+    ], batch_size=1000)
+
+    lista = []
+    for i, cliente in enumerate(clientes):
+        inicio = hoy - timedelta(days=azar.randint(0, 700))
+        estado = azar.choice(ESTADOS_POLIZA)
+        lista.append(Poliza(
+            cliente=cliente,
+            agente=None if estado == 'cotizacion' else cliente.agente,
+            numero_poliza=f'B{lote}-{i}',
+            suma_asegurada=Decimal(azar.randint(10, 500) * 1000),
+            prima_anual=Decimal('1200.00'),
+            prima_mensual=Decimal('100.00'),
+            fecha_inicio=inicio,
+            fecha_vencimiento=inicio + timedelta(days=365),
+            estado=estado,
+            cobertura='Plan: Vida. Sintético.',
+        ))
+    polizas_creadas = Poliza.objects.bulk_create(lista, batch_size=1000)
+
+    Beneficiario.objects.bulk_create([
+        Beneficiario(poliza=p, nombre_completo=f'Beneficiario {j}', parentesco='hijo', porcentaje=Decimal('50.00'))
+        for p in polizas_creadas for j in range(2)
+    ], batch_size=1000)
+
+    facturas = Factura.objects.bulk_create([
+        Factura(poliza=p, numero_factura=f'B{lote}-{i}', monto=p.prima_anual, fecha_emision=p.fecha_inicio,
+                periodo=p.fecha_inicio.replace(day=1), fecha_vencimiento=p.fecha_inicio + timedelta(days=30),
+                estado=azar.choice(ESTADOS_FACTURA))
+        for i, p in enumerate(polizas_creadas)
+    ], batch_size=1000)
+
+    Pago.objects.bulk_create([
+        Pago(factura=f, monto_pagado=f.monto, metodo_pago='transferencia', referencia_pago=f'B{lote}-{i}',
+             estado='completado' if f.estado == 'pagada' else 'pendiente')
+        for i, f in enumerate(facturas)
+    ], batch_size=1000)
+
+    Siniestro.objects.bulk_create([
+        Siniestro(poliza=p, numero_siniestro=f'B{lote}-{i}', tipo_siniestro=azar.choice(TIPOS_SINIESTRO),
+                  fecha_siniestro=hoy, descripcion='Sintético', monto_reclamado=Decimal('5000.00'))
+        for i, p in enumerate(polizas_creadas) if i % 5 == 0
+    ], batch_size=1000)
+
+    return polizas_creadas
+
+
+def crear_clientes(cantidad, semilla=42, bloque=5000):
+    """Solo usuarios + clientes con nombres variados (para el buscador). Devuelve el prefijo del lote."""
+    azar = random.Random(semilla)
+    lote = uuid.uuid4().hex[:6]
+    sin_password = make_password(None)
+    for desde in range(0, cantidad, bloque):
+        usuarios = Usuario.objects.bulk_create([
+            Usuario(username=f'bench-{lote}-bc{i}', password=sin_password, rol='CLIENTE',
+                    first_name=azar.choice(NOMBRES),
+                    last_name=f'{azar.choice(APELLIDOS)} {azar.choice(APELLIDOS)}')
+            for i in range(desde, min(cantidad, desde + bloque))
+        ])
+        Cliente.objects.bulk_create([
+            Cliente(usuario=u, fecha_nacimiento=date(1980, 1, 1), direccion='Calle 1',
+                    identificacion=f'{lote}{desde + j}',
+                    busqueda=texto_busqueda(u.first_name, u.last_name, f'{lote}{desde + j}'))
+            for j, u in enumerate(usuarios)
+        ])
+    return lote
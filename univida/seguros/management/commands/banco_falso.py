@@ -0,0 +1,61 @@
+import secrets
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from seguros import banco_falso, confirmaciones
+from seguros.models import Pago
+
+
+class Command(BaseCommand):
+    help = ('Banco de mentira: manda en ráfagas (con reintentos y desordenadas) las confirmaciones '
+            'de los pagos pendientes y muestra la latencia de cada tanda aplicada.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pagos', type=int, default=500, help='Pagos pendientes a confirmar.')
+        parser.add_argument('--rafaga', type=int, default=100, help='Callbacks por ráfaga.')
+        parser.add_argument('--reintentos', type=int, default=2, help='Veces que se repite cada callback.')
+        parser.add_argument('--fallidos', type=float, default=0.05, help='Fracción de pagos que el banco rechaza.')
+        parser.add_argument('--url', help='Mandar por HTTP a un servidor levantado (p. ej. '
+                                          'http://localhost:8000/api/pagos/confirmaciones/). '
+                                          'Sin --url se llama a la vista en este proceso.')
+        parser.add_argument('--hilos', type=int, default=8, help='Con --url, envíos simultáneos por ráfaga.')
+        parser.add_argument('--tanda', type=int, default=confirmaciones.TANDA)
+
+    def handle(self, *args, **options):
+        pagos = list(Pago.objects.filter(estado='pendiente').exclude(referencia_pago__isnull=True)
+                     .exclude(referencia_pago='').order_by('id')
+                     .values_list('referencia_pago', 'monto_pagado')[:options['pagos']])
+        if not pagos:
+            raise CommandError('No hay pagos pendientes con referencia.')
+
+        if options['url']:
+            if not settings.BANCO_SECRETO:
+                raise CommandError('Con --url hace falta el mismo BANCO_SECRETO que el servidor.')
+            self.simular(pagos, banco_falso.enviar_http(options['url']), settings.BANCO_SECRETO,
+                         options, hilos=options['hilos'])
+            self.stdout.write('Las tandas las aplica el servidor (ver su log o procesar_confirmaciones).')
+            return
+
+        # En este proceso: se reciben todas las ráfagas y después se aplican por tandas
+        secreto = settings.BANCO_SECRETO or secrets.token_hex(16)
+        with override_settings(BANCO_SECRETO=secreto, CONFIRMACIONES_EN_PROCESO=False,
+                               CONFIRMACIONES_SINCRONO=False):
+            self.simular(pagos, banco_falso.enviar_local(), secreto, options, hilos=1)
+        for resumen in confirmaciones.procesar_pendientes(options['tanda']):
+            self.stdout.write(
+                f"  tanda de {resumen['confirmaciones']}: {resumen['aplicadas']} aplicadas, "
+                f"{resumen['repetidas']} repetidas, {resumen['rechazadas']} rechazadas en "
+                f"{resumen['segundos'] * 1000:.1f} ms"
+            )
+
+    def simular(self, pagos, enviar, secreto, options, hilos):
+        banco = banco_falso.BancoFalso(enviar, secreto)
+        rafagas = banco.rafagas(pagos, options['rafaga'], options['reintentos'], options['fallidos'])
+        self.stdout.write(f'{len(pagos)} pagos, {sum(map(len, rafagas))} callbacks en {len(rafagas)} ráfagas...')
+        resultado = banco.reproducir(rafagas, hilos=hilos)
+        self.stdout.write(self.style.SUCCESS(
+            f"{resultado['enviados']} callbacks en {resultado['segundos']} s "
+            f"({resultado['enviados'] / resultado['segundos']:.0f}/s), respuestas: {resultado['codigos']}"
+        ))
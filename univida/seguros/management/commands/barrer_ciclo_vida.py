@@ -0,0 +1,57 @@
+import json
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from seguros import ciclo_vida
+
+
+class Command(BaseCommand):
+    help = 'Pasa a vencidas las pólizas y facturas cuya fecha de vencimiento ya pasó (correr cada noche).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', help='Fecha de corte AAAA-MM-DD (por defecto, hoy): vence lo anterior.')
+        parser.add_argument('--tanda', type=int, default=ciclo_vida.TANDA, help='Filas por UPDATE.')
+        parser.add_argument('--auditoria',
+                            help="Archivo JSONL con cada cambio ('-' = salida estándar). Sin él, van al log.")
+
+    def handle(self, *args, **options):
+        hoy = None
+        if options['fecha']:
+            try:
+                hoy = date.fromisoformat(options['fecha'])
+            except ValueError:
+                raise CommandError('La fecha va como AAAA-MM-DD')
+
+        auditoria = None
+        if options['auditoria'] == '-':
+            auditoria = self.stdout
+        elif options['auditoria']:
+            auditoria = open(options['auditoria'], 'a', encoding='utf-8')
+        registrar = ciclo_vida.registrar_en_log
+        if auditoria is not None:
+            def registrar(transiciones):
+                for t in transiciones:
+                    auditoria.write(json.dumps(t._asdict()) + '\n')
+
+        # Con la auditoría por la salida estándar, el resumen va por la de errores
+        salida = self.stderr if auditoria is self.stdout else self.stdout
+        try:
+            resumen = ciclo_vida.barrer(hoy, tanda=options['tanda'], registrar=registrar,
+                                        progreso=self.progreso if salida is self.stdout else None)
+        finally:
+            if auditoria is not None and auditoria is not self.stdout:
+                auditoria.close()
+
+        if resumen['filas'] and salida is self.stdout:
+            salida.write('')  # después de la línea de progreso
+        for transicion, filas in resumen['transiciones'].items():
+            salida.write(f'  {transicion}: {filas}')
+        salida.write(self.style.SUCCESS(
+            f"{resumen['filas']} cambios al {resumen['fecha']} en {resumen['segundos']} s "
+            f"({resumen['filas_por_segundo']} filas/s)"
+        ))
+
+    def progreso(self, filas):
+        self.stdout.write(f'  {filas} filas', ending='\r')
+        self.stdout.flush()
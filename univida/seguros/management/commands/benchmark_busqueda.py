@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from seguros import busqueda
+from seguros.models import Cliente
+
+from ._sinteticos import crear_clientes
+
+CONSULTAS = ['perez', 'maria gonzalez', 'rodriguez', 'alvares', 'gonzales mamani', 'ramon quispe', 'luc']
+
+
+class Command(BaseCommand):
+    help = 'Mide el buscador de clientes contra icontains sobre una base sintética.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=100000,
+                            help='Clientes sintéticos a crear (se revierten al terminar). 0 = usar los datos existentes.')
+        parser.add_argument('--repeticiones', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['clientes']:
+                self.stdout.write(f"Creando {options['clientes']} clientes sintéticos...")
+                inicio = time.perf_counter()
+                crear_clientes(options['clientes'])
+                self.stdout.write(f'  listo en {time.perf_counter() - inicio:.1f} s')
+
+            for texto in CONSULTAS:
+                indice, resultados = self.medir(
+                    lambda: list(busqueda.buscar_clientes(Cliente.objects.all(), texto)), options['repeticiones'])
+                # Lo que hacía el admin: LIKE '%texto%' sin índice (sin tolerancia a errores)
+                sin_indice, _ = self.medir(
+                    lambda: list(Cliente.objects.filter(busqueda__icontains=texto)[:20]), options['repeticiones'])
+                primero = resultados[0].busqueda if resultados else '-'
+                self.stdout.write(
+                    f'{texto!r:<20} indice={indice * 1000:7.1f} ms  icontains={sin_indice * 1000:7.1f} ms  '
+                    f'resultados={len(resultados):<3} primero={primero!r}'
+                )
+
+            # Nada de lo creado debe quedar en la base
+            transaction.set_rollback(True)
+
+    def medir(self, funcion, repeticiones):
+        tiempos = []
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            resultado = funcion()
+            tiempos.append(time.perf_counter() - inicio)
+        return min(tiempos), resultado
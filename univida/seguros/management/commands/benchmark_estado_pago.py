@@ -0,0 +1,87 @@
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from seguros import views
+from seguros.condicional import _fechas, condicional
+from seguros.models import Pago, Usuario
+
+from ._sinteticos import crear_cartera
+
+
+# verificar_estado_pago como estaba antes de estado_pagos.py, para comparar
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@condicional(lambda pago_id: _fechas(Pago.objects.filter(id=pago_id), ['actualizado_en']))
+def verificar_estado_pago_antes(request, pago_id):
+    try:
+        pago = Pago.objects.get(id=pago_id)
+        if pago.estado == 'completado':
+            return Response({'status': 'completado'})
+        return Response({'status': 'pendiente'})
+    except Pago.DoesNotExist:
+        return Response({'status': 'error'}, status=404)
+
+
+class Command(BaseCommand):
+    help = 'Consultas a la BD por cada 1000 consultas de estado de pago, antes y después de la cache.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--consultas', type=int, default=1000)
+        parser.add_argument('--pagos', type=int, default=50,
+                            help='Pagos pendientes distintos entre los que se reparten las consultas.')
+        parser.add_argument('--polizas', type=int, default=200,
+                            help='Pólizas sintéticas a crear (se revierten al terminar). 0 = usar los datos existentes.')
+        parser.add_argument('--cadencia', type=float, default=3,
+                            help='Segundos entre consultas de un mismo pago (el frontend consulta cada 3).')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['polizas']:
+                crear_cartera(options['polizas'])
+            pago_ids = list(Pago.objects.filter(estado='pendiente').values_list('id', flat=True)[:options['pagos']])
+            if not pago_ids:
+                self.stderr.write('No hay pagos pendientes para consultar.')
+                return
+            usuario = Usuario.objects.filter(is_superuser=True).first() or Usuario.objects.first()
+
+            caches[settings.CACHE_RESPUESTAS].clear()
+            for nombre, vista in [('antes', verificar_estado_pago_antes), ('cache', views.verificar_estado_pago)]:
+                self.medir(nombre, vista, pago_ids, usuario, options['consultas'], options['cadencia'])
+
+            transaction.set_rollback(True)
+        self.stdout.write('Sin contar la autenticación: JWTConPerfil suma 1 consulta por petición, '
+                          'JWTSinConsulta ninguna.')
+
+    def medir(self, nombre, vista, pago_ids, usuario, total, cadencia):
+        fabrica = APIRequestFactory()
+        # Como el frontend: cada cliente repite el ETag de su respuesta anterior
+        etags = {}
+        # Reloj simulado para las caducidades de la cache: cada vuelta por
+        # todos los pagos pasan `cadencia` segundos, como en el navegador
+        reloj = [time.time()]
+        with CaptureQueriesContext(connection) as ctx, mock.patch('time.time', lambda: reloj[0]):
+            inicio = time.perf_counter()
+            for i in range(total):
+                if i and i % len(pago_ids) == 0:
+                    reloj[0] += cadencia
+                pago_id = pago_ids[i % len(pago_ids)]
+                cabeceras = {'HTTP_IF_NONE_MATCH': etags[pago_id]} if pago_id in etags else {}
+                peticion = fabrica.get(f'/api/pagos/estado/{pago_id}/', **cabeceras)
+                force_authenticate(peticion, usuario)
+                respuesta = vista(peticion, pago_id=pago_id)
+                etags[pago_id] = respuesta.get('ETag')
+            segundos = time.perf_counter() - inicio
+        self.stdout.write(
+            f'{nombre:<6} {total} consultas de estado ({len(pago_ids)} pagos, cada {cadencia:g} s): '
+            f'{len(ctx.captured_queries)} consultas a la BD, {segundos / total * 1e6:.0f} µs cada una'
+        )
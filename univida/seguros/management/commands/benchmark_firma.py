@@ -0,0 +1,88 @@
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from io import BytesIO
+
+from django.core.management.base import BaseCommand
+from django.template.loader import get_template
+from django.test.utils import override_settings
+from xhtml2pdf import pisa
+
+from seguros import firma, lote_documentos
+from seguros.documentos import PLANTILLA
+
+
+def _preparar():
+    # Como en lote_documentos: la clave se carga una vez por proceso
+    firma.firmante()
+
+
+def _firmar_varios(contenido, cantidad):
+    for _ in range(cantidad):
+        firma.firmar(contenido)
+    return cantidad
+
+
+class Command(BaseCommand):
+    help = 'Mide cuántos PDF de póliza por hora puede firmar este servidor.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documentos', type=int, default=200)
+        parser.add_argument('--procesos', type=int, default=os.cpu_count())
+
+    def handle(self, *args, **options):
+        contenido = self.pdf_de_ejemplo()
+        if firma.configurada():
+            self.medir(contenido, options)
+            return
+
+        # Sin certificado configurado se mide con una CA de prueba temporal
+        with tempfile.TemporaryDirectory() as directorio:
+            self.stdout.write('FIRMA_* sin configurar: usando una CA de prueba temporal.')
+            with override_settings(**firma.crear_ca_prueba(directorio)):
+                self.medir(contenido, options)
+
+    def pdf_de_ejemplo(self):
+        contexto = {
+            'poliza': {'numero_poliza': 'POL-BENCH-1', 'estado': 'activa', 'suma_asegurada': '100000.00',
+                       'fecha_inicio': date.today(), 'fecha_vencimiento': date.today()},
+            'cliente': {'identificacion': 'CI-1234567'},
+            'usuario': {'first_name': 'María', 'last_name': 'Quispe Mamani'},
+            'beneficiarios': [{'nombre_completo': f'Beneficiario {i}', 'parentesco': 'hijo', 'porcentaje': 25}
+                              for i in range(4)],
+            'fecha_hoy': date.today(),
+        }
+        html = get_template(PLANTILLA).render(contexto)
+        resultado = BytesIO()
+        pisa.pisaDocument(BytesIO(html.encode('ISO-8859-1')), resultado)
+        return resultado.getvalue()
+
+    def medir(self, contenido, options):
+        inicio = time.perf_counter()
+        firma.firmante()
+        carga = time.perf_counter() - inicio
+
+        inicio = time.perf_counter()
+        firma.firmar(contenido)
+        una = time.perf_counter() - inicio
+
+        total, procesos = options['documentos'], max(1, options['procesos'])
+        por_proceso = [total // procesos + (1 if i < total % procesos else 0) for i in range(procesos)]
+        inicio = time.perf_counter()
+        if procesos == 1:
+            _firmar_varios(contenido, total)
+        else:
+            with ProcessPoolExecutor(max_workers=procesos, mp_context=lote_documentos._contexto(),
+                                     initializer=_preparar) as pool:
+                list(pool.map(_firmar_varios, [contenido] * procesos, por_proceso))
+        segundos = time.perf_counter() - inicio
+
+        por_segundo = total / segundos
+        self.stdout.write(f'PDF de {len(contenido) / 1024:.1f} KB; cargar clave y cadena: {carga * 1000:.1f} ms '
+                          f'(una vez por proceso); una firma: {una * 1000:.1f} ms')
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} firmas con {procesos} procesos en {segundos:.2f} s: {por_segundo:.1f} PDF/s, '
+            f'{por_segundo / procesos:.1f} PDF/s por proceso, ~{por_segundo * 3600:,.0f} PDF/hora'
+        ))
@@ -0,0 +1,116 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+
+from seguros.models import Poliza, Factura, Siniestro, Pago
+
+from ._sinteticos import crear_cartera
+
+# Índices que había antes de la migración 0017: solo los de las FK
+INDICES_ANTERIORES = {
+    Poliza: ['cliente', 'agente'],
+    Factura: ['poliza'],
+    Siniestro: ['poliza'],
+    Pago: ['factura'],
+}
+
+
+class Command(BaseCommand):
+    help = 'Muestra el plan y el tiempo de las consultas calientes con los índices antiguos y con los nuevos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--polizas', type=int, default=20000,
+                            help='Pólizas sintéticas a crear (se revierten al terminar). 0 = usar los datos existentes.')
+        parser.add_argument('--repeticiones', type=int, default=5)
+        parser.add_argument('--sin-planes', action='store_true', help='Solo tiempos, sin el EXPLAIN.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['polizas']:
+                self.stdout.write(f"Creando {options['polizas']} pólizas sintéticas...")
+                crear_cartera(options['polizas'])
+
+            consultas = self.consultas()
+            self.analizar()
+            despues = self.medir(consultas, options['repeticiones'])
+
+            # Volvemos a los índices de antes dentro de la misma transacción
+            self.ejecutar(self.sql_indices())
+            self.analizar()
+            antes = self.medir(consultas, options['repeticiones'])
+
+            for nombre, _ in consultas:
+                plan_antes, t_antes = antes[nombre]
+                plan_despues, t_despues = despues[nombre]
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f'{nombre}: antes={t_antes * 1000:.2f} ms  después={t_despues * 1000:.2f} ms  '
+                    f'x{t_antes / t_despues if t_despues else 0:.1f}'
+                ))
+                if not options['sin_planes']:
+                    self.stdout.write(f'  antes:   {plan_antes}')
+                    self.stdout.write(f'  después: {plan_despues}')
+
+            # Nada de lo creado (datos ni índices) debe quedar en la base
+            transaction.set_rollback(True)
+
+    def consultas(self):
+        poliza = Poliza.objects.filter(estado='activa', agente__isnull=False).order_by('id').first()
+        if poliza is None:
+            raise SystemExit('No hay pólizas activas con agente; usa --polizas.')
+        factura = Factura.objects.filter(poliza=poliza).first()
+        hoy = date.today()
+        return [
+            ('polizas activas del agente', lambda: Poliza.objects.filter(
+                agente_id=poliza.agente_id, estado='activa').order_by('-creado_en')[:5]),
+            ('polizas del cliente por estado', lambda: Poliza.objects.filter(
+                cliente_id=poliza.cliente_id, estado='activa')),
+            ('cotizaciones huérfanas', lambda: Poliza.objects.filter(
+                estado='cotizacion', agente__isnull=True).order_by('-id')[:50]),
+            ('polizas por vencer del agente', lambda: Poliza.objects.filter(
+                agente_id=poliza.agente_id, fecha_vencimiento__range=[hoy, hoy + timedelta(days=30)])),
+            ('facturas pendientes de la póliza', lambda: Factura.objects.filter(
+                poliza_id=poliza.id, estado='pendiente').order_by('fecha_vencimiento')),
+            ('lista de facturas', lambda: Factura.objects.order_by('fecha_vencimiento')[:50]),
+            ('siniestros de la póliza', lambda: Siniestro.objects.filter(
+                poliza_id=poliza.id).order_by('-fecha_reporte')),
+            ('lista de siniestros', lambda: Siniestro.objects.order_by('-fecha_reporte')[:50]),
+            ('pagos completados de la factura', lambda: Pago.objects.filter(
+                factura_id=factura.id if factura else 0, estado='completado')),
+        ]
+
+    def medir(self, consultas, repeticiones):
+        resultados = {}
+        for nombre, queryset in consultas:
+            tiempos = []
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                list(queryset())
+                tiempos.append(time.perf_counter() - inicio)
+            plan = ' | '.join(linea.strip() for linea in queryset().explain().splitlines())
+            resultados[nombre] = (plan, min(tiempos))
+        return resultados
+
+    def sql_indices(self):
+        # El editor se usa solo para generar el SQL: en SQLite no se puede abrir dentro de atomic()
+        editor = connection.schema_editor()
+        editor.deferred_sql = []
+        sentencias = []
+        for modelo, campos in INDICES_ANTERIORES.items():
+            for indice in modelo._meta.indexes:
+                sentencias.append(indice.remove_sql(modelo, editor))
+            for campo in campos:
+                indice = models.Index(fields=[campo], name=f'bench_{modelo._meta.model_name}_{campo}')
+                sentencias.append(indice.create_sql(modelo, editor))
+        return [str(s) for s in sentencias]
+
+    def ejecutar(self, sentencias):
+        with connection.cursor() as cursor:
+            for sql in sentencias:
+                cursor.execute(sql)
+
+    def analizar(self):
+        # Estadísticas frescas para que el planificador vea los datos sintéticos
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
@@ -0,0 +1,60 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from seguros import lectura_rapida
+from seguros.consultas import precargar
+from seguros.models import Poliza, Factura, Siniestro
+from seguros.serializers import PolizaSerializer, FacturaSerializer, SiniestroSerializer
+
+from ._sinteticos import crear_cartera
+
+
+class Command(BaseCommand):
+    help = 'Compara los serializers DRF contra la lectura rápida con values() en las listas grandes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--polizas', type=int, default=2000,
+                            help='Pólizas sintéticas a crear (se revierten al terminar). 0 = usar los datos existentes.')
+        parser.add_argument('--repeticiones', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['polizas']:
+                self.stdout.write(f"Creando {options['polizas']} pólizas sintéticas...")
+                crear_cartera(options['polizas'])
+
+            for modelo, serializer_class in [(Poliza, PolizaSerializer), (Factura, FacturaSerializer),
+                                             (Siniestro, SiniestroSerializer)]:
+                self.medir(modelo.objects.order_by('-id'), serializer_class, options['repeticiones'])
+
+            # Nada de lo creado debe quedar en la base
+            transaction.set_rollback(True)
+
+    def medir(self, queryset, serializer_class, repeticiones):
+        def drf():
+            return serializer_class(precargar(queryset, serializer_class), many=True).data
+
+        def rapida():
+            return lectura_rapida.leer(queryset, serializer_class())
+
+        resultados = {}
+        for nombre, funcion in [('drf', drf), ('rapida', rapida)]:
+            tiempos = []
+            for _ in range(repeticiones):
+                with CaptureQueriesContext(connection) as ctx:
+                    inicio = time.perf_counter()
+                    filas = len(funcion())
+                    tiempos.append(time.perf_counter() - inicio)
+            resultados[nombre] = (min(tiempos), len(ctx.captured_queries), filas)
+
+        drf_t, drf_q, filas = resultados['drf']
+        rap_t, rap_q, _ = resultados['rapida']
+        self.stdout.write(
+            f'{serializer_class.__name__:<22} filas={filas:<7} '
+            f'drf={drf_t * 1000:8.1f} ms ({drf_q} consultas)  '
+            f'rapida={rap_t * 1000:8.1f} ms ({rap_q} consultas)  '
+            f'x{drf_t / rap_t if rap_t else 0:.1f}'
+        )
@@ -0,0 +1,39 @@
+import xml.etree.ElementTree as ET
+
+from django.core.management.base import BaseCommand, CommandError
+
+from seguros import conciliacion
+
+
+class Command(BaseCommand):
+    help = 'Concilia un extracto bancario (CSV o camt.053) contra los pagos pendientes y las facturas abiertas.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Extracto del banco (.csv o .xml camt).')
+        parser.add_argument('--reporte', help='Dónde escribir el CSV de diferencias (por defecto <archivo>.diferencias.csv).')
+        parser.add_argument('--tanda', type=int, default=conciliacion.TANDA,
+                            help='Coincidencias que se aplican juntas.')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                resumen, diferencias = conciliacion.conciliar(archivo, options['tanda'], progreso=self.progreso)
+        except (conciliacion.ExtractoInvalido, ET.ParseError) as e:
+            raise CommandError(str(e))
+        self.stdout.write('')
+
+        reporte = options['reporte'] or f"{options['archivo']}.diferencias.csv"
+        with open(reporte, 'w', newline='', encoding='utf-8') as destino:
+            conciliacion.escribir_reporte(diferencias, destino)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{resumen['lineas']} líneas en {resumen['segundos']} s ({resumen['lineas_por_segundo']}/s): "
+            f"{resumen['conciliadas']} conciliadas, {len(diferencias)} diferencias"
+        ))
+        for motivo, cantidad in sorted(resumen['diferencias'].items()):
+            self.stdout.write(f'  {motivo}: {cantidad}')
+        self.stdout.write(f'Reporte de diferencias: {reporte}')
+
+    def progreso(self, lineas, conciliadas):
+        self.stdout.write(f'  {lineas} líneas leídas, {conciliadas} conciliadas', ending='\r')
+        self.stdout.flush()
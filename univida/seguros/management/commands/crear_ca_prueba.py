@@ -0,0 +1,22 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from seguros import firma
+
+
+class Command(BaseCommand):
+    help = 'Crea una CA local y un certificado de firma de PRUEBA para firmar los PDF en desarrollo.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--directorio', default=os.path.join(settings.BASE_DIR, 'certs-prueba'))
+        parser.add_argument('--dias', type=int, default=365, help='Validez de los certificados.')
+
+    def handle(self, *args, **options):
+        valores = firma.crear_ca_prueba(options['directorio'], dias=options['dias'])
+        self.stdout.write(self.style.SUCCESS(f"CA de prueba creada en {options['directorio']}"))
+        self.stdout.write('Variables de entorno para usarla:')
+        self.stdout.write(f"  FIRMA_CLAVE={valores['FIRMA_CLAVE']}")
+        self.stdout.write(f"  FIRMA_CERTIFICADO={valores['FIRMA_CERTIFICADO']}")
+        self.stdout.write(f"  FIRMA_CADENA={','.join(valores['FIRMA_CADENA'])}")
@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from seguros import facturacion
+
+
+class Command(BaseCommand):
+    help = 'Emite las facturas del mes de todas las pólizas activas (se puede repetir o reanudar).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--periodo', help='Mes a facturar, AAAA-MM (por defecto, el actual).')
+        parser.add_argument('--tanda', type=int, default=facturacion.TANDA,
+                            help='Pólizas por bloque (una transacción y un bulk_create por bloque).')
+        parser.add_argument('--desde-cero', action='store_true',
+                            help='Revisar otra vez todas las pólizas, no solo desde donde quedó la corrida.')
+
+    def handle(self, *args, **options):
+        periodo = None
+        if options['periodo']:
+            try:
+                periodo = datetime.strptime(options['periodo'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError('El periodo va como AAAA-MM, p. ej. 2026-10')
+
+        resumen = facturacion.facturar_periodo(periodo, tanda=options['tanda'],
+                                               desde_cero=options['desde_cero'], progreso=self.progreso)
+        if resumen['polizas']:
+            self.stdout.write('')  # después de la línea de progreso
+        if resumen['reanudada_desde']:
+            self.stdout.write(f"Reanudada desde la póliza {resumen['reanudada_desde']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{resumen['periodo']}: {resumen['facturas']} facturas nuevas de {resumen['polizas']} pólizas "
+            f"({resumen['omitidas']} ya facturadas o sin prima) en {resumen['segundos']} s"
+        ))
+        self.stdout.write(f"  {resumen['facturas_por_segundo']} facturas/s")
+
+    def progreso(self, polizas, facturas):
+        self.stdout.write(f'  {polizas} pólizas, {facturas} facturas', ending='\r')
+        self.stdout.flush()
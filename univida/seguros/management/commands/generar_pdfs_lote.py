@@ -0,0 +1,50 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from seguros import lote_documentos
+from seguros.models import Poliza
+
+
+class Command(BaseCommand):
+    help = 'Genera el PDF de muchas pólizas en paralelo y los empaqueta en un ZIP.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--estado', default='activa', help="Estado de las pólizas ('todas' = sin filtro).")
+        parser.add_argument('--agente', type=int, help='Solo las pólizas de este agente.')
+        parser.add_argument('--procesos', type=int, default=os.cpu_count(),
+                            help='Procesos del pool (por defecto, uno por núcleo).')
+        parser.add_argument('--tanda', type=int, default=lote_documentos.TANDA,
+                            help='Pólizas que recibe cada proceso por vez.')
+        parser.add_argument('--salida', help='Archivo ZIP de salida.')
+        parser.add_argument('--firmar', action='store_true', help='Firmar digitalmente cada PDF (ver FIRMA_* en settings).')
+
+    def handle(self, *args, **options):
+        polizas = Poliza.objects.order_by('id')
+        if options['estado'] != 'todas':
+            polizas = polizas.filter(estado=options['estado'])
+        if options['agente']:
+            polizas = polizas.filter(agente_id=options['agente'])
+        ids = list(polizas.values_list('id', flat=True))
+        if not ids:
+            raise CommandError('No hay pólizas que coincidan con el filtro.')
+
+        salida = options['salida'] or f'polizas-{timezone.localtime():%Y%m%d-%H%M%S}.zip'
+        self.stdout.write(f"Generando {len(ids)} PDF con {options['procesos']} procesos en {salida}...")
+        resumen = lote_documentos.generar_lote(ids, salida, procesos=options['procesos'],
+                                               tanda=options['tanda'], progreso=self.progreso,
+                                               firmar=options['firmar'], fork=True)
+
+        for poliza_id, error in resumen['errores']:
+            self.stderr.write(f'  póliza {poliza_id}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f"{resumen['renderizados']} renderizados, {resumen['reutilizados']} reutilizados del disco, "
+            f"{len(resumen['errores'])} errores en {resumen['segundos']} s"
+        ))
+        self.stdout.write(f"  {resumen['pdfs_por_segundo']} PDF/s en total, "
+                          f"{resumen['pdfs_por_segundo_nucleo']} PDF/s por proceso ({resumen['procesos']} procesos)")
+
+    def progreso(self, hechos, total):
+        self.stdout.write(f'  {hechos}/{total}', ending='\r' if hechos < total else '\n')
+        self.stdout.flush()
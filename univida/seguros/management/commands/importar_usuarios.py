@@ -0,0 +1,43 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from seguros import importacion
+
+
+class Command(BaseCommand):
+    help = 'Da de alta muchos clientes o agentes de una vez desde un CSV o JSONL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='CSV con cabecera o JSONL (un objeto por línea).')
+        parser.add_argument('--tipo', choices=importacion.TIPOS, default='cliente')
+        parser.add_argument('--procesos', type=int, default=os.cpu_count(),
+                            help='Procesos que hashean las contraseñas (por defecto, uno por núcleo).')
+        parser.add_argument('--tanda', type=int, default=importacion.TANDA,
+                            help='Filas por bulk_create (una transacción por tanda).')
+        parser.add_argument('--reporte', help='CSV donde dejar los errores por fila.')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['archivo'], 'rb') as archivo:
+                resumen, errores = importacion.importar(archivo, options['tipo'], procesos=options['procesos'],
+                                                        tanda=options['tanda'], fork=True)
+        except OSError as e:
+            raise CommandError(f'No se pudo abrir el archivo: {e}')
+        except importacion.ArchivoInvalido as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{resumen['creados']} {resumen['tipo']}s creados de {resumen['filas']} filas, "
+            f"{resumen['errores']} con errores, en {resumen['segundos']} s"
+        ))
+        self.stdout.write(f"  {resumen['cuentas_por_minuto']} cuentas/min con {resumen['procesos']} procesos")
+        if options['reporte']:
+            with open(options['reporte'], 'w', newline='', encoding='utf-8') as destino:
+                importacion.escribir_reporte(errores, destino)
+            self.stdout.write(f"  Errores en {options['reporte']}")
+        else:
+            for error in errores[:20]:
+                self.stderr.write(f'  línea {error.linea} ({error.username}): {error.campo} {error.mensaje}')
+            if len(errores) > 20:
+                self.stderr.write(f'  ... y {len(errores) - 20} más (usar --reporte)')
@@ -0,0 +1,41 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from seguros import confirmaciones
+
+
+class Command(BaseCommand):
+    help = 'Aplica por tandas las confirmaciones de pago recibidas del banco.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tanda', type=int, default=getattr(settings, 'CONFIRMACIONES_TANDA',
+                                                                 confirmaciones.TANDA))
+        parser.add_argument('--continuo', action='store_true',
+                            help='No terminar: seguir esperando confirmaciones nuevas (worker).')
+        parser.add_argument('--espera', type=float, default=1.0,
+                            help='Con --continuo, segundos entre vueltas cuando no hay nada.')
+
+    def handle(self, *args, **options):
+        while True:
+            resumenes = confirmaciones.procesar_pendientes(options['tanda'])
+            for resumen in resumenes:
+                self.mostrar(resumen)
+            if not options['continuo']:
+                break
+            close_old_connections()
+            time.sleep(options['espera'])
+
+        if not options['continuo'] and not resumenes:
+            self.stdout.write('No había confirmaciones pendientes.')
+
+    def mostrar(self, resumen):
+        por_segundo = resumen['confirmaciones'] / resumen['segundos'] if resumen['segundos'] else 0
+        self.stdout.write(
+            f"tanda de {resumen['confirmaciones']}: {resumen['aplicadas']} aplicadas, "
+            f"{resumen['repetidas']} repetidas, {resumen['rechazadas']} rechazadas, "
+            f"{resumen['polizas_activadas']} pólizas activadas | {resumen['segundos'] * 1000:.1f} ms "
+            f"({por_segundo:.0f}/s), la más vieja esperó {resumen['espera_max']} s"
+        )
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from seguros import estadisticas
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye desde cero las estadísticas del panel de los agentes (backfill o tras updates masivos).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--agente', type=int, action='append', dest='agentes',
+                            help='ID del agente a recalcular (se puede repetir). Por defecto, todos.')
+
+    def handle(self, *args, **options):
+        if options['agentes']:
+            for agente_id in options['agentes']:
+                if estadisticas.recalcular_agente(agente_id) is None:
+                    self.stderr.write(f'El agente {agente_id} no existe.')
+            total = len(options['agentes'])
+        else:
+            total = estadisticas.recalcular_todos()
+        self.stdout.write(self.style.SUCCESS(f'Estadísticas recalculadas para {total} agente(s).'))
@@ -0,0 +1,37 @@
+# en seguros/middleware.py
+"""
+WhiteNoiseMiddleware que también funciona en modo async.
+
+El de whitenoise es solo síncrono: con él en MIDDLEWARE, Django corre toda
+la cadena en un hilo bajo ASGI y las vistas async (estado del pago en vivo)
+terminan ocupando un hilo por conexión abierta. Esta versión hace lo mismo
+pero deja pasar el request a la siguiente capa sin salir del event loop.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class WhiteNoiseAsync(WhiteNoiseMiddleware):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        self.es_async = iscoroutinefunction(get_response)
+        if self.es_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.es_async:
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            # Solo con DEBUG: mira el disco en cada request
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
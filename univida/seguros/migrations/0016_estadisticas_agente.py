@@ -0,0 +1,46 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seguros', '0015_cliente_agente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadisticaAgente',
+            fields=[
+                ('agente', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='estadisticas', serialize=False, to='seguros.agente')),
+                ('total_clientes', models.IntegerField(default=0)),
+                ('polizas_activas', models.IntegerField(default=0)),
+                ('ultimas_ventas', models.JSONField(blank=True, default=list)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Estadística de Agente',
+                'verbose_name_plural': 'Estadísticas de Agentes',
+                'db_table': 'univida_estadistica_agente',
+            },
+        ),
+        migrations.CreateModel(
+            name='EstadisticaAgenteMes',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('anio', models.IntegerField()),
+                ('mes', models.IntegerField()),
+                ('ventas_monto', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('polizas_vendidas', models.IntegerField(default=0)),
+                ('agente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='estadisticas_mes', to='seguros.agente')),
+            ],
+            options={
+                'verbose_name': 'Estadística Mensual de Agente',
+                'verbose_name_plural': 'Estadísticas Mensuales de Agentes',
+                'db_table': 'univida_estadistica_agente_mes',
+                'unique_together': {('agente', 'anio', 'mes')},
+            },
+        ),
+    ]
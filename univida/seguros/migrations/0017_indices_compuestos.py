@@ -0,0 +1,80 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seguros', '0016_estadisticas_agente'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='factura',
+            index=models.Index(fields=['poliza', 'estado', 'fecha_vencimiento'], name='factura_poliza_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='factura',
+            index=models.Index(fields=['fecha_vencimiento'], name='factura_vence_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pago',
+            index=models.Index(fields=['factura', 'estado'], name='pago_factura_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='poliza',
+            index=models.Index(fields=['agente', 'estado', '-creado_en'], name='poliza_agente_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='poliza',
+            index=models.Index(fields=['agente', 'fecha_vencimiento'], name='poliza_agente_vence_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='poliza',
+            index=models.Index(fields=['cliente', 'estado'], name='poliza_cliente_estado_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='poliza',
+            index=models.Index(fields=['fecha_vencimiento'], name='poliza_vence_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='poliza',
+            index=models.Index(condition=models.Q(('agente__isnull', True), ('estado', 'cotizacion')), fields=['-id'], name='poliza_cotizacion_huerfana_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='siniestro',
+            index=models.Index(fields=['poliza', '-fecha_reporte'], name='siniestro_poliza_reporte_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='siniestro',
+            index=models.Index(fields=['-fecha_reporte'], name='siniestro_reporte_idx'),
+        ),
+        # Los índices simples de las FK se quitan al final, cuando ya existen los compuestos que los cubren
+        migrations.AlterField(
+            model_name='factura',
+            name='poliza',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='facturas', to='seguros.poliza'),
+        ),
+        migrations.AlterField(
+            model_name='pago',
+            name='factura',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='pagos', to='seguros.factura'),
+        ),
+        migrations.AlterField(
+            model_name='poliza',
+            name='agente',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='polizas', to='seguros.agente'),
+        ),
+        migrations.AlterField(
+            model_name='poliza',
+            name='cliente',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='seguros.cliente'),
+        ),
+        migrations.AlterField(
+            model_name='siniestro',
+            name='poliza',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='siniestros', to='seguros.poliza'),
+        ),
+    ]
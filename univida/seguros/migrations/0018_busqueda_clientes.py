@@ -0,0 +1,44 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:12
+
+from django.db import migrations, models
+
+from seguros.busqueda import borrar_indice, preparar_indice, texto_busqueda
+
+
+def llenar_busqueda(apps, schema_editor):
+    Cliente = apps.get_model('seguros', 'Cliente')
+    lote = []
+    for cliente in Cliente.objects.select_related('usuario').iterator(chunk_size=2000):
+        usuario = cliente.usuario
+        cliente.busqueda = texto_busqueda(usuario.first_name, usuario.last_name,
+                                          cliente.identificacion, usuario.email)
+        lote.append(cliente)
+        if len(lote) >= 2000:
+            Cliente.objects.bulk_update(lote, ['busqueda'])
+            lote = []
+    Cliente.objects.bulk_update(lote, ['busqueda'])
+
+
+def crear_indice(apps, schema_editor):
+    preparar_indice(schema_editor.connection)
+
+
+def quitar_indice(apps, schema_editor):
+    borrar_indice(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seguros', '0017_indices_compuestos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='busqueda',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(llenar_busqueda, migrations.RunPython.noop),
+        migrations.RunPython(crear_indice, quitar_indice),
+    ]
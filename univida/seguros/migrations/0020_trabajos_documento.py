@@ -0,0 +1,34 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:24
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seguros', '0019_actualizado_en'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoDocumento',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('listo', 'Listo'), ('error', 'Error')], default='pendiente', max_length=20)),
+                ('huella', models.CharField(blank=True, max_length=64)),
+                ('error', models.TextField(blank=True)),
+                ('creado_en', models.DateTimeField(auto_now_add=True)),
+                ('terminado_en', models.DateTimeField(blank=True, null=True)),
+                ('poliza', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trabajos_documento', to='seguros.poliza')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Documento',
+                'verbose_name_plural': 'Trabajos de Documentos',
+                'db_table': 'univida_trabajo_documento',
+            },
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seguros', '0020_trabajos_documento'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConfirmacionPago',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('referencia', models.CharField(max_length=100, unique=True)),
+                ('estado_banco', models.CharField(choices=[('completado', 'Completado'), ('fallido', 'Fallido')], max_length=20)),
+                ('monto', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('aplicada', 'Aplicada'), ('repetida', 'Repetida'), ('rechazada', 'Rechazada')], default='pendiente', max_length=20)),
+                ('detalle', models.CharField(blank=True, max_length=255)),
+                ('recibida_en', models.DateTimeField(auto_now_add=True)),
+                ('aplicada_en', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Confirmación de Pago',
+                'verbose_name_plural': 'Confirmaciones de Pago',
+                'db_table': 'univida_confirmacion_pago',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='pago',
+            index=models.Index(fields=['referencia_pago'], name='pago_referencia_idx'),
+        ),
+        migrations.AddField(
+            model_name='confirmacionpago',
+            name='pago',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='confirmaciones', to='seguros.pago'),
+        ),
+        migrations.AddIndex(
+            model_name='confirmacionpago',
+            index=models.Index(fields=['estado', 'id'], name='confirmacion_estado_idx'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seguros', '0021_confirmaciones_pago'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorridaFacturacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.DateField(unique=True)),
+                ('estado', models.CharField(choices=[('en_curso', 'En curso'), ('terminada', 'Terminada')], default='en_curso', max_length=20)),
+                ('ultima_poliza', models.BigIntegerField(default=0)),
+                ('polizas', models.PositiveIntegerField(default=0)),
+                ('facturas', models.PositiveIntegerField(default=0)),
+                ('iniciada_en', models.DateTimeField(auto_now_add=True)),
+                ('actualizada_en', models.DateTimeField(auto_now=True)),
+                ('terminada_en', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Corrida de Facturación',
+                'verbose_name_plural': 'Corridas de Facturación',
+                'db_table': 'univida_corrida_facturacion',
+            },
+        ),
+        migrations.AddField(
+            model_name='factura',
+            name='periodo',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='factura',
+            constraint=models.UniqueConstraint(fields=('poliza', 'periodo'), name='factura_poliza_periodo_uniq'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seguros', '0022_facturacion_mensual'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SecuenciaDocumento',
+            fields=[
+                ('tipo', models.CharField(max_length=30, primary_key=True, serialize=False)),
+                ('siguiente', models.BigIntegerField()),
+                ('reserva', models.CharField(blank=True, max_length=32)),
+            ],
+            options={
+                'verbose_name': 'Secuencia de Documento',
+                'verbose_name_plural': 'Secuencias de Documentos',
+                'db_table': 'univida_secuencia_documento',
+            },
+        ),
+    ]
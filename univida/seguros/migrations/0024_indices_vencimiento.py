@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('seguros', '0023_secuencias_documento'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='factura',
+            index=models.Index(fields=['estado', 'fecha_vencimiento'], name='factura_estado_vence_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='poliza',
+            index=models.Index(fields=['estado', 'fecha_vencimiento'], name='poliza_estado_vence_idx'),
+        ),
+    ]
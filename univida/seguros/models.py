@@ -1,12 +1,17 @@
 # en seguros/models.py - VERSIÓN CORREGIDA
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 
+from .busqueda import texto_cliente
+
 # Modelo de Usuario personalizado (evita conflicto con auth.User)
 class Usuario(AbstractUser):
     telefono = models.CharField(max_length=20, blank=True, null=True)
     identificacion = models.CharField(max_length=20, unique=True, blank=True, null=True)
     fecha_registro = models.DateTimeField(auto_now_add=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
     ROL_CHOICES = [
         ('ADMIN', 'Administrador'),
         ('AGENTE', 'Agente'),
@@ -41,8 +46,36 @@ class Cliente(models.Model):
     )
     # ------------------------------------
 
+    # Nombre, identificación y email sin tildes para el buscador (ver busqueda.py)
+    busqueda = models.TextField(blank=True, default='', editable=False)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
     def __str__(self):
         return f"{self.usuario.get_full_name()}"
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        cliente = super().from_db(db, field_names, values)
+        # Lo que había en la BD: save() solo rehace busqueda si esto cambia
+        cliente._origen_busqueda = cliente._claves_busqueda()
+        return cliente
+
+    def _claves_busqueda(self):
+        # De __dict__ para no cargar un campo diferido solo para compararlo
+        return self.__dict__.get('identificacion'), self.__dict__.get('usuario_id')
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        # Los cambios de nombre o email del usuario los lleva la señal de Usuario
+        rehacer = (self._state.adding or self._claves_busqueda() != getattr(self, '_origen_busqueda', None)) and (
+            update_fields is None or {'identificacion', 'usuario', 'usuario_id'} & set(update_fields))
+        if rehacer:
+            self.busqueda = texto_cliente(self)
+        if update_fields is not None:
+            extra = {'actualizado_en', 'busqueda'} if rehacer else {'actualizado_en'}
+            kwargs['update_fields'] = {*update_fields, *extra}
+        super().save(*args, **kwargs)
+        self._origen_busqueda = self._claves_busqueda()
     
     class Meta:
         db_table = 'univida_cliente'
@@ -58,13 +91,15 @@ class Poliza(models.Model):
         ('rechazada', 'Rechazada'),
     ]
     
-    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE)
+    # Sin índice propio: lo cubren los índices compuestos de Meta
+    cliente = models.ForeignKey(Cliente, on_delete=models.CASCADE, db_index=False)
     agente = models.ForeignKey(
         'Agente', 
         on_delete=models.SET_NULL,
         null=True,
         blank=True,
-        related_name='polizas'
+        related_name='polizas',
+        db_index=False
     )
     numero_poliza = models.CharField(max_length=50, unique=True)
     suma_asegurada = models.DecimalField(max_digits=12, decimal_places=2)
@@ -75,6 +110,8 @@ class Poliza(models.Model):
     estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='cotizacion')
     cobertura = models.TextField(blank=True, null=True)
     creado_en = models.DateTimeField(auto_now_add=True)
+    # También se toca al cambiar sus beneficiarios (ver signals.py)
+    actualizado_en = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"Póliza {self.numero_poliza} - {self.cliente}"
@@ -87,6 +124,19 @@ class Poliza(models.Model):
     
     class Meta:
         db_table = 'univida_poliza'
+        indexes = [
+            # Dashboard del agente: sus activas y las últimas ventas
+            models.Index(fields=['agente', 'estado', '-creado_en'], name='poliza_agente_estado_idx'),
+            # Pólizas por vencer del agente
+            models.Index(fields=['agente', 'fecha_vencimiento'], name='poliza_agente_vence_idx'),
+            models.Index(fields=['cliente', 'estado'], name='poliza_cliente_estado_idx'),
+            models.Index(fields=['fecha_vencimiento'], name='poliza_vence_idx'),
+            # Barrido de vencimientos: solo las de ese estado ya vencidas (ver ciclo_vida.py)
+            models.Index(fields=['estado', 'fecha_vencimiento'], name='poliza_estado_vence_idx'),
+            # Solicitudes huérfanas que ven todos los agentes (índice parcial, muy pequeño)
+            models.Index(fields=['-id'], name='poliza_cotizacion_huerfana_idx',
+                         condition=models.Q(estado='cotizacion', agente__isnull=True)),
+        ]
 
 # Aireyu
 # en seguros/models.py
@@ -99,17 +149,32 @@ class Factura(models.Model):
         ('cancelada', 'Cancelada'),
     ]
     
-    poliza = models.ForeignKey(Poliza, on_delete=models.CASCADE, related_name='facturas')
+    poliza = models.ForeignKey(Poliza, on_delete=models.CASCADE, related_name='facturas', db_index=False)
     numero_factura = models.CharField(max_length=50, unique=True)
     monto = models.DecimalField(max_digits=12, decimal_places=2)
     fecha_emision = models.DateField()
     fecha_vencimiento = models.DateField()
     estado = models.CharField(max_length=20, choices=ESTADO_FACTURA, default='pendiente')
     concepto = models.CharField(max_length=255, default='Prima de seguro')
+    # Mes que cobra (día 1) si la emitió la facturación mensual; null en las demás
+    periodo = models.DateField(null=True, blank=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"Factura {self.numero_factura}"
 
+    class Meta:
+        constraints = [
+            # Una factura por póliza y mes: repetir la facturación no duplica nada
+            models.UniqueConstraint(fields=['poliza', 'periodo'], name='factura_poliza_periodo_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['poliza', 'estado', 'fecha_vencimiento'], name='factura_poliza_estado_idx'),
+            # Orden por defecto de la lista de facturas
+            models.Index(fields=['fecha_vencimiento'], name='factura_vence_idx'),
+            models.Index(fields=['estado', 'fecha_vencimiento'], name='factura_estado_vence_idx'),
+        ]
+
 # en seguros/models.py
 
 class Pago(models.Model):
@@ -127,7 +192,7 @@ class Pago(models.Model):
         ('cheque', 'Cheque'),
     ]
     
-    factura = models.ForeignKey(Factura, on_delete=models.CASCADE, related_name='pagos')
+    factura = models.ForeignKey(Factura, on_delete=models.CASCADE, related_name='pagos', db_index=False)
     monto_pagado = models.DecimalField(max_digits=12, decimal_places=2)
     fecha_pago = models.DateTimeField(auto_now_add=True)
     metodo_pago = models.CharField(max_length=20, choices=METODO_PAGO)
@@ -137,6 +202,7 @@ class Pago(models.Model):
     estado = models.CharField(max_length=20, choices=ESTADO_PAGO, default='completado')
 
     descripcion = models.TextField(blank=True, null=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"Pago {self.id} - {self.factura.numero_factura}"
@@ -145,6 +211,11 @@ class Pago(models.Model):
         db_table = 'univida_pago'
         verbose_name = 'Pago'
         verbose_name_plural = 'Pagos'
+        indexes = [
+            models.Index(fields=['factura', 'estado'], name='pago_factura_estado_idx'),
+            # Las confirmaciones del banco y el QR buscan el pago por su referencia
+            models.Index(fields=['referencia_pago'], name='pago_referencia_idx'),
+        ]
 
 # en seguros/models.py
 class Beneficiario(models.Model):
@@ -181,6 +252,7 @@ class Agente(models.Model):
     )
     telefono_oficina = models.CharField(max_length=20, blank=True, null=True)
     direccion_oficina = models.TextField(blank=True, null=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"Agente {self.codigo_agente} - {self.usuario.get_full_name()}"
@@ -209,7 +281,7 @@ class Siniestro(models.Model):
         ('otros', 'Otros'),
     ]
     
-    poliza = models.ForeignKey(Poliza, on_delete=models.CASCADE, related_name='siniestros')
+    poliza = models.ForeignKey(Poliza, on_delete=models.CASCADE, related_name='siniestros', db_index=False)
     numero_siniestro = models.CharField(max_length=50, unique=True)
     tipo_siniestro = models.CharField(max_length=20, choices=TIPO_SINIESTRO)
     fecha_siniestro = models.DateField()
@@ -221,6 +293,7 @@ class Siniestro(models.Model):
     documentos_adjuntos = models.TextField(blank=True, null=True)
     resolucion = models.TextField(blank=True, null=True)
     fecha_resolucion = models.DateField(null=True, blank=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
     
     def __str__(self):
         return f"Siniestro {self.numero_siniestro} - {self.poliza.numero_poliza}"
@@ -229,6 +302,11 @@ class Siniestro(models.Model):
         db_table = 'univida_siniestro'
         verbose_name = 'Siniestro'
         verbose_name_plural = 'Siniestros'
+        indexes = [
+            models.Index(fields=['poliza', '-fecha_reporte'], name='siniestro_poliza_reporte_idx'),
+            # Orden por defecto de la lista de siniestros
+            models.Index(fields=['-fecha_reporte'], name='siniestro_reporte_idx'),
+        ]
 
 class NotaPoliza(models.Model):
     TIPO_NOTA = [
@@ -252,4 +330,143 @@ class NotaPoliza(models.Model):
     class Meta:
         db_table = 'univida_nota_poliza'
         verbose_name = 'Nota de Póliza'
-        verbose_name_plural = 'Notas de Póliza'
\ No newline at end of file
+        verbose_name_plural = 'Notas de Póliza'
+
+# Estadísticas del panel del agente, mantenidas al guardar Cliente/Poliza
+# (ver seguros/estadisticas.py). Se reconstruyen con el comando
+# recalcular_estadisticas_agentes.
+class EstadisticaAgente(models.Model):
+    agente = models.OneToOneField(Agente, on_delete=models.CASCADE, primary_key=True, related_name='estadisticas')
+    total_clientes = models.IntegerField(default=0)
+    polizas_activas = models.IntegerField(default=0)
+    ultimas_ventas = models.JSONField(default=list, blank=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Estadísticas {self.agente.codigo_agente}"
+
+    class Meta:
+        db_table = 'univida_estadistica_agente'
+        verbose_name = 'Estadística de Agente'
+        verbose_name_plural = 'Estadísticas de Agentes'
+
+class EstadisticaAgenteMes(models.Model):
+    agente = models.ForeignKey(Agente, on_delete=models.CASCADE, related_name='estadisticas_mes')
+    anio = models.IntegerField()
+    mes = models.IntegerField()
+    ventas_monto = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    polizas_vendidas = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.agente.codigo_agente} {self.anio}-{self.mes:02d}"
+
+    class Meta:
+        db_table = 'univida_estadistica_agente_mes'
+        unique_together = ('agente', 'anio', 'mes')
+        verbose_name = 'Estadística Mensual de Agente'
+        verbose_name_plural = 'Estadísticas Mensuales de Agentes'
+
+# PDF pedido en segundo plano (ver seguros/documentos.py). El archivo queda
+# en DOCUMENTOS_ROOT con el nombre de su huella; aquí solo va el estado.
+class TrabajoDocumento(models.Model):
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('procesando', 'Procesando'),
+        ('listo', 'Listo'),
+        ('error', 'Error'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    poliza = models.ForeignKey(Poliza, on_delete=models.CASCADE, related_name='trabajos_documento')
+    usuario = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, blank=True)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    huella = models.CharField(max_length=64, blank=True)
+    error = models.TextField(blank=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    terminado_en = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"PDF {self.poliza_id} ({self.estado})"
+
+    class Meta:
+        db_table = 'univida_trabajo_documento'
+        verbose_name = 'Trabajo de Documento'
+        verbose_name_plural = 'Trabajos de Documentos'
+
+
+# Confirmación de pago que manda el banco (ver seguros/confirmaciones.py). La
+# referencia es única: los reintentos del banco no crean filas nuevas.
+class ConfirmacionPago(models.Model):
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('aplicada', 'Aplicada'),
+        ('repetida', 'Repetida'),
+        ('rechazada', 'Rechazada'),
+    ]
+    ESTADOS_BANCO = [
+        ('completado', 'Completado'),
+        ('fallido', 'Fallido'),
+    ]
+
+    referencia = models.CharField(max_length=100, unique=True)
+    estado_banco = models.CharField(max_length=20, choices=ESTADOS_BANCO)
+    monto = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    detalle = models.CharField(max_length=255, blank=True)
+    pago = models.ForeignKey(Pago, on_delete=models.SET_NULL, null=True, blank=True, related_name='confirmaciones')
+    recibida_en = models.DateTimeField(auto_now_add=True)
+    aplicada_en = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Confirmación {self.referencia} ({self.estado})"
+
+    class Meta:
+        db_table = 'univida_confirmacion_pago'
+        verbose_name = 'Confirmación de Pago'
+        verbose_name_plural = 'Confirmaciones de Pago'
+        indexes = [
+            # El worker toma las pendientes por orden de llegada
+            models.Index(fields=['estado', 'id'], name='confirmacion_estado_idx'),
+        ]
+
+
+# Facturación mensual de un periodo (ver seguros/facturacion.py). Guarda hasta
+# qué póliza llegó: si se corta, la siguiente corrida sigue desde ahí.
+class CorridaFacturacion(models.Model):
+    ESTADOS = [
+        ('en_curso', 'En curso'),
+        ('terminada', 'Terminada'),
+    ]
+
+    periodo = models.DateField(unique=True)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='en_curso')
+    ultima_poliza = models.BigIntegerField(default=0)
+    polizas = models.PositiveIntegerField(default=0)
+    facturas = models.PositiveIntegerField(default=0)
+    iniciada_en = models.DateTimeField(auto_now_add=True)
+    actualizada_en = models.DateTimeField(auto_now=True)
+    terminada_en = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Facturación {self.periodo:%Y-%m} ({self.estado})"
+
+    class Meta:
+        db_table = 'univida_corrida_facturacion'
+        verbose_name = 'Corrida de Facturación'
+        verbose_name_plural = 'Corridas de Facturación'
+
+
+# Contador de la numeración de documentos donde no hay secuencias nativas
+# (ver seguros/numeracion.py). `reserva` identifica el último bloque tomado.
+class SecuenciaDocumento(models.Model):
+    tipo = models.CharField(max_length=30, primary_key=True)
+    siguiente = models.BigIntegerField()
+    reserva = models.CharField(max_length=32, blank=True)
+
+    def __str__(self):
+        return f"Numeración {self.tipo} ({self.siguiente})"
+
+    class Meta:
+        db_table = 'univida_secuencia_documento'
+        verbose_name = 'Secuencia de Documento'
+        verbose_name_plural = 'Secuencias de Documentos'
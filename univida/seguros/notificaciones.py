@@ -0,0 +1,172 @@
+# en seguros/notificaciones.py
+"""
+Avisos en vivo para quien espera el estado de un pago (SSE y long-poll en
+eventos_estado_pago / esperar_estado_pago), en vez de preguntar cada 3 segundos.
+
+- Notificador: en memoria del proceso. Cada conexión abierta se suscribe
+  a un canal ('pago:<id>') y se despierta cuando alguien publica en él.
+  Se puede publicar desde cualquier hilo (las vistas síncronas corren en
+  hilos aparte cuando se sirve por ASGI).
+- NotificadorCache: además deja el aviso en una cache compartida
+  (CACHE_AVISOS: en disco, Redis, memcached...) y cada suscripción la mira
+  cada NOTIFICADOR_INTERVALO segundos. Es el de por defecto con más de un
+  worker. Sirve cuando el webhook del banco cae en un worker y el
+  cliente está esperando en otro. Es una lectura de cache, no de la BD.
+
+El backend se elige con NOTIFICADOR_BACKEND (ruta a la clase). Otro backend
+(pub/sub de Redis, LISTEN/NOTIFY de Postgres...) solo tiene que heredar de
+Notificador y llamar a _despertar() cuando le llega un aviso de afuera.
+"""
+import asyncio
+import itertools
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+
+def canal_pago(pago_id):
+    return f'pago:{pago_id}'
+
+
+class Suscripcion:
+    """Mensajes de un canal para una conexión. Se usa con `with`."""
+
+    def __init__(self, notificador, canal):
+        self.notificador = notificador
+        self.canal = canal
+        self.loop = asyncio.get_running_loop()
+        self.cola = asyncio.Queue()
+
+    def __enter__(self):
+        self.notificador._agregar(self)
+        return self
+
+    def __exit__(self, *exc):
+        self.notificador._quitar(self)
+
+    def entregar(self, mensaje):
+        # Puede llamarse desde otro hilo: la cola solo se toca desde su loop
+        try:
+            self.loop.call_soon_threadsafe(self.cola.put_nowait, mensaje)
+        except RuntimeError:
+            pass  # el loop ya se cerró: la conexión se fue
+
+    async def recibir(self, timeout):
+        """El siguiente mensaje, o None si pasan `timeout` segundos."""
+        try:
+            return await asyncio.wait_for(self.cola.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Notificador:
+    def __init__(self):
+        self._candado = threading.Lock()
+        self._suscripciones = {}
+
+    def suscribir(self, canal):
+        return Suscripcion(self, canal)
+
+    def publicar(self, canal, mensaje):
+        self._despertar(canal, mensaje)
+
+    def esperando(self, canal=None):
+        with self._candado:
+            if canal is not None:
+                return len(self._suscripciones.get(canal, ()))
+            return sum(len(s) for s in self._suscripciones.values())
+
+    def _agregar(self, suscripcion):
+        with self._candado:
+            self._suscripciones.setdefault(suscripcion.canal, set()).add(suscripcion)
+
+    def _quitar(self, suscripcion):
+        with self._candado:
+            suscripciones = self._suscripciones.get(suscripcion.canal)
+            if suscripciones is not None:
+                suscripciones.discard(suscripcion)
+                if not suscripciones:
+                    del self._suscripciones[suscripcion.canal]
+
+    def _despertar(self, canal, mensaje):
+        with self._candado:
+            suscripciones = list(self._suscripciones.get(canal, ()))
+        for suscripcion in suscripciones:
+            suscripcion.entregar(mensaje)
+
+
+class SuscripcionCache(Suscripcion):
+    def __enter__(self):
+        # Lo que ya estaba en la cache no es nuevo para esta conexión
+        self.visto = self.notificador._leer(self.canal)
+        return super().__enter__()
+
+    async def recibir(self, timeout):
+        # Los avisos locales llegan con su número, igual que los de la cache:
+        # el mismo aviso no se entrega dos veces
+        limite = time.monotonic() + timeout
+        while True:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                return None
+            try:
+                numero, mensaje = await asyncio.wait_for(
+                    self.cola.get(), min(restante, self.notificador.intervalo))
+            except asyncio.TimeoutError:
+                aviso = await self.notificador._aleer(self.canal)
+                if aviso is None or aviso == self.visto:
+                    continue
+                numero, mensaje = aviso
+            if (numero, mensaje) == self.visto:
+                continue
+            self.visto = (numero, mensaje)
+            return mensaje
+
+
+class NotificadorCache(Notificador):
+    DURACION = 10 * 60
+
+    def __init__(self):
+        super().__init__()
+        self.intervalo = getattr(settings, 'NOTIFICADOR_INTERVALO', 1.0)
+        self._numeros = itertools.count()
+
+    def _cache(self):
+        return caches[getattr(settings, 'CACHE_AVISOS', 'default')]
+
+    def _clave(self, canal):
+        return f'aviso:{canal}'
+
+    def _leer(self, canal):
+        return self._cache().get(self._clave(canal))
+
+    async def _aleer(self, canal):
+        return await self._cache().aget(self._clave(canal))
+
+    def suscribir(self, canal):
+        return SuscripcionCache(self, canal)
+
+    def publicar(self, canal, mensaje):
+        # El número distingue dos avisos iguales seguidos, también entre workers
+        aviso = (f'{time.time_ns()}-{next(self._numeros)}', mensaje)
+        self._cache().set(self._clave(canal), aviso, self.DURACION)
+        self._despertar(canal, aviso)
+
+
+@lru_cache(maxsize=None)
+def notificador():
+    """El notificador del proceso (uno solo: las suscripciones viven en él)."""
+    ruta = getattr(settings, 'NOTIFICADOR_BACKEND', 'seguros.notificaciones.Notificador')
+    return import_string(ruta)()
+
+
+@receiver(setting_changed)
+def olvidar_notificador(setting, **kwargs):
+    if setting.startswith('NOTIFICADOR_'):
+        notificador.cache_clear()
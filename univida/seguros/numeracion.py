@@ -0,0 +1,136 @@
+# en seguros/numeracion.py
+"""
+Números de documento (pólizas, facturas, siniestros, solicitudes) sin
+choques, en vez de random.randint(10000, 99999): con 90 mil valores
+posibles y columnas únicas, los INSERT empezaban a fallar al crecer.
+
+- Cada worker (cada hilo, que es lo que tiene su propia conexión) reserva
+  un bloque de NUMERACION_BLOQUE números de una vez y los va entregando
+  desde memoria: en el caso normal no hay ninguna consulta por número.
+- En PostgreSQL el bloque sale de una secuencia nativa por tipo
+  (nextval no se deshace con un ROLLBACK, así que nunca se repite).
+- En las demás bases (SQLite) sale de la tabla SecuenciaDocumento. Ahí la
+  reserva sí se deshace si se deshace la transacción que la hizo, y otro
+  worker podría tomar el mismo bloque: por eso un bloque reservado dentro
+  de una transacción es provisional hasta el commit, y mientras lo es se
+  comprueba en la tabla (con `reserva`) antes de seguir usándolo.
+
+El formato de cada tipo se configura en NUMERACION (settings) con
+{numero}, {anio} y {mes}. Los números empiezan en INICIO: tienen más
+cifras que los viejos al azar, así que tampoco chocan con ellos.
+"""
+import threading
+import uuid
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import SecuenciaDocumento
+
+INICIO = 100000
+BLOQUE = 50
+FORMATOS = {
+    'poliza': 'POL-{numero}',
+    'factura': 'FAC-{numero}',
+    'siniestro': 'SIN-{numero}',
+    'solicitud': 'SOL-{numero}',
+}
+
+
+class TipoDesconocido(ValueError):
+    pass
+
+
+def formatos():
+    return {**FORMATOS, **getattr(settings, 'NUMERACION', {})}
+
+
+def siguiente(tipo):
+    """Número nuevo para un documento de `tipo`, ya con su formato (p. ej. 'POL-100023')."""
+    formato = formatos().get(tipo)
+    if formato is None:
+        raise TipoDesconocido(f'No hay numeración para {tipo!r} (ver NUMERACION en settings)')
+    hoy = timezone.localdate()
+    return formato.format(numero=_numero(tipo), anio=hoy.year, mes=hoy.month)
+
+
+# --- Bloques por worker ---
+
+_local = threading.local()
+
+
+class _Bloque:
+    def __init__(self, numeros, reserva=None):
+        self.numeros = iter(numeros)
+        # Con reserva: provisional hasta que confirme la transacción que lo tomó
+        self.reserva = reserva
+
+    def confirmar(self):
+        self.reserva = None
+
+
+def _bloques():
+    if not hasattr(_local, 'bloques'):
+        _local.bloques = {}
+    return _local.bloques
+
+
+def _numero(tipo):
+    bloques = _bloques()
+    bloque = bloques.get(tipo)
+    if bloque is not None and bloque.reserva is not None and not _sigue_reservado(tipo, bloque.reserva):
+        # La transacción que lo reservó se deshizo: esos números pueden ser de otro
+        bloque = None
+    numero = next(bloque.numeros, None) if bloque is not None else None
+    if numero is None:
+        bloque = bloques[tipo] = _reservar(tipo, getattr(settings, 'NUMERACION_BLOQUE', BLOQUE))
+        numero = next(bloque.numeros)
+    return numero
+
+
+def _sigue_reservado(tipo, reserva):
+    return SecuenciaDocumento.objects.filter(tipo=tipo, reserva=reserva).exists()
+
+
+def _reservar(tipo, cantidad):
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            # Sin rango contiguo garantizado si hay otros pidiendo a la vez, pero sin repetidos
+            cursor.execute('SELECT nextval(%s) FROM generate_series(1, %s)', [_secuencia(tipo), cantidad])
+            return _Bloque([fila[0] for fila in cursor.fetchall()])
+
+    reserva = uuid.uuid4().hex
+    with transaction.atomic():
+        # Primero el UPDATE: en SQLite toma el bloqueo de escritura antes de leer
+        if not _avanzar(tipo, cantidad, reserva):
+            SecuenciaDocumento.objects.bulk_create([SecuenciaDocumento(tipo=tipo, siguiente=INICIO)],
+                                                   ignore_conflicts=True)
+            _avanzar(tipo, cantidad, reserva)
+        fin = SecuenciaDocumento.objects.values_list('siguiente', flat=True).get(tipo=tipo)
+    if not connection.in_atomic_block:
+        return _Bloque(range(fin - cantidad, fin))
+    bloque = _Bloque(range(fin - cantidad, fin), reserva)
+    transaction.on_commit(bloque.confirmar)
+    return bloque
+
+
+def _avanzar(tipo, cantidad, reserva):
+    return SecuenciaDocumento.objects.filter(tipo=tipo).update(
+        siguiente=F('siguiente') + cantidad, reserva=reserva)
+
+
+# --- Secuencias nativas (las crea post_migrate) ---
+
+def _secuencia(tipo):
+    return f'univida_numero_{tipo}'
+
+
+def preparar_secuencias(conexion):
+    """Una secuencia por tipo de NUMERACION, en PostgreSQL. En las demás bases no hace nada."""
+    if conexion.vendor != 'postgresql':
+        return
+    with conexion.cursor() as cursor:
+        for tipo in formatos():
+            cursor.execute(f'CREATE SEQUENCE IF NOT EXISTS {_secuencia(tipo)} START WITH {INICIO}')
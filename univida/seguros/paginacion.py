@@ -0,0 +1,121 @@
+# en seguros/paginacion.py
+"""
+Paginación por cursor (keyset) para las listas.
+
+Es opcional: si la petición no trae ?cursor= ni ?page_size= la vista sigue
+devolviendo la lista completa como antes. Cuando se pide, en vez de OFFSET
+filtramos por "después de la última fila vista" usando el orden de la vista
+más el id como desempate, así cada página cuesta lo mismo aunque la tabla
+tenga cientos de miles de filas.
+"""
+import base64
+import json
+from datetime import date, datetime
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class PaginacionCursor(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def __init__(self, ordering=('-id',)):
+        # Siempre terminamos en 'id' para que el cursor sea único y estable
+        campos = list(ordering)
+        if campos[-1].lstrip('-') != 'id':
+            campos.append('-id' if campos[-1].startswith('-') else 'id')
+        self.ordering = campos
+        self.page_size = getattr(settings, 'PAGINACION_PAGE_SIZE', 50)
+        self.max_page_size = getattr(settings, 'PAGINACION_MAX_PAGE_SIZE', 500)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = request.query_params
+        if self.cursor_query_param not in params and self.page_size_query_param not in params:
+            return None
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+
+        cursor = params.get(self.cursor_query_param)
+        if cursor:
+            queryset = queryset.filter(self._despues_de(self.decode_cursor(cursor)))
+
+        # Pedimos una fila de más: si llega, hay otra página (sin COUNT)
+        filas = list(queryset[:self.page_size + 1])
+        self.has_more = len(filas) > self.page_size
+        self.page = filas[:self.page_size]
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except (TypeError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_next_cursor(self):
+        if not self.has_more or not self.page:
+            return None
+        ultima = self.page[-1]
+        valores = [_a_json(getattr(ultima, campo.lstrip('-'))) for campo in self.ordering]
+        return self.encode_cursor(valores)
+
+    def get_next_link(self):
+        cursor = self.get_next_cursor()
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'cursor': self.get_next_cursor(),
+            'has_more': self.has_more,
+            'results': data,
+        })
+
+    def encode_cursor(self, valores):
+        crudo = json.dumps(valores, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(crudo).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            relleno = '=' * (-len(cursor) % 4)
+            valores = json.loads(base64.urlsafe_b64decode(cursor + relleno))
+        except (TypeError, ValueError):
+            raise NotFound('Cursor inválido')
+        if not isinstance(valores, list) or len(valores) != len(self.ordering):
+            raise NotFound('Cursor inválido')
+        return valores
+
+    def _despues_de(self, valores):
+        """
+        Construye (a > x) OR (a = x AND b > y) OR ... respetando la dirección
+        de cada campo del orden.
+        """
+        condicion = Q()
+        iguales = {}
+        for campo, valor in zip(self.ordering, valores):
+            nombre = campo.lstrip('-')
+            lookup = 'lt' if campo.startswith('-') else 'gt'
+            condicion |= Q(**iguales, **{f'{nombre}__{lookup}': valor})
+            iguales[nombre] = valor
+        return condicion
+
+
+def _a_json(valor):
+    # isoformat conserva los microsegundos, que el desempate necesita
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if valor is None or isinstance(valor, (int, float, str, bool)):
+        return valor
+    return str(valor)
@@ -2,26 +2,93 @@ from rest_framework import serializers
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 from rest_framework_simplejwt.views import TokenObtainPairView
 from .models import Usuario, Cliente, Poliza, Beneficiario, Agente, Pago, Factura, Siniestro, NotaPoliza
-
-
-class UsuarioSerializer(serializers.ModelSerializer):
+from .autenticacion import CLAIM_SESION, marca_sesion
+
+
+def opciones_de_campos(request):
+    """
+    Lee ?fields= y ?expand= de la URL y los devuelve como kwargs para los
+    serializers de lectura. Ej: ?fields=id,monto_pagado,factura_info.numero_factura
+    o ?expand=factura_info (los bloques anidados que no se nombran se omiten).
+    """
+    opciones = {}
+    for param in ('fields', 'expand'):
+        valor = request.query_params.get(param)
+        if valor is not None:
+            opciones[param] = [c.strip() for c in valor.split(',') if c.strip()]
+    return opciones
+
+
+def _separar(rutas):
+    """['a', 'b.c', 'b.d'] -> {'a': [], 'b': ['c', 'd']}"""
+    arbol = {}
+    for ruta in rutas:
+        cabeza, _, resto = ruta.partition('.')
+        hijos = arbol.setdefault(cabeza, [])
+        if resto:
+            hijos.append(resto)
+    return arbol
+
+
+class CamposDinamicosMixin:
+    """
+    Permite recortar un serializer al instanciarlo:
+      fields=[...]  -> solo esos campos (con 'anidado.campo' para bajar de nivel)
+      expand=[...]  -> solo se incluyen los bloques anidados nombrados
+    Sin estos kwargs el serializer se comporta igual que siempre.
+    """
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        expand = kwargs.pop('expand', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None or expand is not None:
+            _podar(self, fields, expand)
+
+
+def _podar(serializer, fields, expand):
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+
+    arbol_fields = _separar(fields) if fields is not None else None
+    arbol_expand = _separar(expand) if expand is not None else None
+
+    for nombre in list(serializer.fields):
+        campo = serializer.fields[nombre]
+        es_anidado = isinstance(campo, serializers.BaseSerializer)
+
+        if arbol_fields is not None and nombre not in arbol_fields:
+            serializer.fields.pop(nombre)
+            continue
+        if es_anidado and arbol_expand is not None and nombre not in arbol_expand:
+            serializer.fields.pop(nombre)
+            continue
+
+        if es_anidado:
+            # 'factura_info' a secas deja el bloque entero; 'factura_info.x' lo recorta
+            sub_fields = arbol_fields[nombre] if arbol_fields and arbol_fields[nombre] else None
+            sub_expand = arbol_expand.get(nombre, []) if arbol_expand is not None else None
+            if sub_fields is not None or sub_expand is not None:
+                _podar(campo, sub_fields, sub_expand)
+
+
+class UsuarioSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Usuario
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'telefono', 'is_active', 'rol']
 
-class ClienteSerializer(serializers.ModelSerializer):
+class ClienteSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     usuario_info = UsuarioSerializer(source='usuario', read_only=True)
     
     class Meta:
         model = Cliente
         fields = ['id', 'usuario_info', 'fecha_nacimiento', 'direccion', 'identificacion', 'estado_salud']
 
-class BeneficiarioSerializer(serializers.ModelSerializer):
+class BeneficiarioSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     class Meta:
         model = Beneficiario
         fields = ['id', 'nombre_completo', 'parentesco', 'porcentaje', 'fecha_nacimiento']
 
-class InfoAgenteSerializer(serializers.ModelSerializer):
+class InfoAgenteSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     first_name = serializers.CharField(source='usuario.first_name')
     last_name = serializers.CharField(source='usuario.last_name')
     email = serializers.EmailField(source='usuario.email')
@@ -32,7 +99,7 @@ class InfoAgenteSerializer(serializers.ModelSerializer):
         fields = ['first_name', 'last_name', 'email', 'telefono']
 
 
-class PolizaSerializer(serializers.ModelSerializer):
+class PolizaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     cliente_info = ClienteSerializer(source='cliente', read_only=True)
     beneficiarios = BeneficiarioSerializer(many=True, read_only=True)
 
@@ -131,7 +198,7 @@ class AgenteProfileSerializer(serializers.ModelSerializer):
         exclude = ('usuario',)
 
 # En seguros/serializers.py - CORREGIR AgenteSerializer
-class AgenteSerializer(serializers.ModelSerializer):
+class AgenteSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     # Para mostrar campos del Usuario relacionado
     username = serializers.CharField(source='usuario.username', read_only=True)
     email = serializers.EmailField(source='usuario.email', read_only=True)
@@ -169,7 +236,7 @@ class UsuarioAgenteSerializer(serializers.ModelSerializer):
         validated_data['rol'] = 'AGENTE'
         return super().update(instance, validated_data)
 #PARA FACTURAS Y PAGOS
-class FacturaSerializer(serializers.ModelSerializer):
+class FacturaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     # Incluimos info básica de la póliza para mostrarla en el frontend
     poliza_info = PolizaSerializer(source='poliza', read_only=True)
     poliza_numero = serializers.CharField(source='poliza.numero_poliza', read_only=True)
@@ -186,7 +253,7 @@ class CrearFacturaSerializer(serializers.ModelSerializer):
 
 # en seguros/serializers.py
 
-class PagoSerializer(serializers.ModelSerializer):
+class PagoSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     # Esto trae los datos anidados de la factura (y la póliza/cliente dentro de ella)
     factura_info = FacturaSerializer(source='factura', read_only=True)
     
@@ -209,7 +276,7 @@ class CrearPagoSerializer(serializers.ModelSerializer):
         fields = ['factura', 'monto_pagado', 'metodo_pago', 'referencia_pago', 'descripcion']
 
 
-class SiniestroSerializer(serializers.ModelSerializer):
+class SiniestroSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     poliza_info = PolizaSerializer(source='poliza', read_only=True)
     
     class Meta:
@@ -260,7 +327,7 @@ class ActualizarSiniestroSerializer(serializers.ModelSerializer):
             
         return data
 
-class NotaPolizaSerializer(serializers.ModelSerializer):
+class NotaPolizaSerializer(CamposDinamicosMixin, serializers.ModelSerializer):
     poliza_info = PolizaSerializer(source='poliza', read_only=True)
     usuario_info = UsuarioSerializer(source='usuario', read_only=True)
     
@@ -286,6 +353,13 @@ class MyTokenObtainPairSerializer(TokenObtainPairSerializer):
         token['last_name'] = user.last_name
         token['email'] = user.email
         token['rol'] = user.rol
+        # Para JWTSinConsulta (seguros/autenticacion.py): el perfil y el momento del login
+        token['is_staff'] = user.is_staff
+        agente = getattr(user, 'agente', None)
+        cliente = getattr(user, 'cliente', None)
+        token['agente_id'] = agente.id if agente else None
+        token['cliente_id'] = cliente.id if cliente else None
+        token[CLAIM_SESION] = marca_sesion()
 
         return token
 
@@ -328,6 +402,34 @@ class CrearClienteSerializer(serializers.ModelSerializer):
         
         return cliente
 
+# Filas de la importación masiva (ver importacion.py). Solo validan el formato:
+# lo que tiene que ser único se comprueba por tandas, no con una consulta por fila.
+class ImportarUsuarioSerializer(serializers.Serializer):
+    username = serializers.CharField(max_length=150, validators=[Usuario.username_validator])
+    password = serializers.CharField(required=False, allow_blank=True)
+    first_name = serializers.CharField(required=False, allow_blank=True, max_length=150)
+    last_name = serializers.CharField(required=False, allow_blank=True, max_length=150)
+    email = serializers.EmailField(required=False, allow_blank=True)
+    telefono = serializers.CharField(required=False, allow_blank=True, max_length=20)
+
+
+class ImportarClienteSerializer(ImportarUsuarioSerializer):
+    fecha_nacimiento = serializers.DateField()
+    direccion = serializers.CharField()
+    identificacion = serializers.CharField(max_length=20)
+    estado_salud = serializers.CharField(required=False, max_length=100)
+    # Código del agente que lo atiende (opcional)
+    agente = serializers.CharField(required=False, allow_blank=True, max_length=20)
+
+
+class ImportarAgenteSerializer(ImportarUsuarioSerializer):
+    codigo_agente = serializers.CharField(max_length=20)
+    fecha_contratacion = serializers.DateField()
+    especialidad = serializers.CharField(required=False, max_length=100)
+    telefono_oficina = serializers.CharField(required=False, allow_blank=True, max_length=20)
+    direccion_oficina = serializers.CharField(required=False, allow_blank=True)
+
+
 class EditarClienteSerializer(serializers.ModelSerializer):
     first_name = serializers.CharField(source='usuario.first_name', required=False)
     last_name = serializers.CharField(source='usuario.last_name', required=False)
@@ -0,0 +1,198 @@
+# en seguros/signals.py
+from django.db import connections, transaction
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import autenticacion, busqueda, cache_respuestas, estadisticas, estado_pagos, numeracion
+from .models import (
+    Agente, Beneficiario, Cliente, Factura, Pago, Poliza, Siniestro, EstadisticaAgente, Usuario
+)
+
+
+# --- Estadísticas del agente ---
+# Guardamos la huella al cargar el objeto para saber qué cambió al guardarlo.
+
+@receiver(post_init, sender=Poliza)
+def poliza_cargada(sender, instance, **kwargs):
+    instance._huella_estadisticas = estadisticas.huella_poliza(instance)
+
+
+@receiver(post_save, sender=Poliza)
+def poliza_guardada(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    anterior = None if created else instance._huella_estadisticas
+    actual = estadisticas.huella_poliza(instance)
+    estadisticas.poliza_cambiada(anterior, actual)
+    instance._huella_estadisticas = actual
+
+
+@receiver(post_delete, sender=Poliza)
+def poliza_borrada(sender, instance, **kwargs):
+    estadisticas.poliza_cambiada(estadisticas.huella_poliza(instance), None)
+
+
+@receiver(post_init, sender=Cliente)
+def cliente_cargado(sender, instance, **kwargs):
+    instance._agente_estadisticas = estadisticas.huella_cliente(instance)
+
+
+@receiver(post_save, sender=Cliente)
+def cliente_guardado(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    anterior = None if created else instance._agente_estadisticas
+    actual = estadisticas.huella_cliente(instance)
+    estadisticas.cliente_cambiado(anterior, actual)
+    instance._agente_estadisticas = actual
+
+
+@receiver(post_delete, sender=Cliente)
+def cliente_borrado(sender, instance, **kwargs):
+    estadisticas.cliente_cambiado(estadisticas.huella_cliente(instance), None)
+
+
+@receiver(post_save, sender=Agente)
+def agente_guardado(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        EstadisticaAgente.objects.get_or_create(agente=instance)
+
+
+# --- Buscador de clientes ---
+
+@receiver(post_save, sender=Usuario)
+def usuario_guardado(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # El nombre y el email viven en Usuario; Cliente.save() no se entera si cambian
+    if created or raw:
+        return
+    if update_fields is not None and not {'first_name', 'last_name', 'email'} & set(update_fields):
+        return
+    for cliente_id, identificacion in Cliente.objects.filter(usuario=instance).values_list('id', 'identificacion'):
+        Cliente.objects.filter(id=cliente_id).update(busqueda=busqueda.texto_busqueda(
+            instance.first_name, instance.last_name, identificacion, instance.email))
+
+
+def preparar_busqueda(sender, using, **kwargs):
+    """post_migrate: asegura el índice del buscador (en SQLite los triggers se pierden al rehacer la tabla)."""
+    conexion = connections[using]
+    with conexion.cursor() as cursor:
+        if 'univida_cliente' not in conexion.introspection.table_names(cursor):
+            return
+        columnas = [c.name for c in conexion.introspection.get_table_description(cursor, 'univida_cliente')]
+    if 'busqueda' in columnas:
+        busqueda.preparar_indice(conexion)
+
+
+def preparar_numeracion(sender, using, **kwargs):
+    """post_migrate: secuencias nativas de los números de documento (también las de tipos nuevos en NUMERACION)."""
+    numeracion.preparar_secuencias(connections[using])
+
+
+# --- Cache de respuestas ---
+# Cada cambio da versión nueva a las etiquetas del objeto (ver cache_respuestas.py)
+
+@receiver(post_save, sender=Poliza)
+@receiver(post_delete, sender=Poliza)
+@receiver(post_save, sender=Beneficiario)
+@receiver(post_delete, sender=Beneficiario)
+@receiver(post_save, sender=Factura)
+@receiver(post_delete, sender=Factura)
+@receiver(post_save, sender=Pago)
+@receiver(post_delete, sender=Pago)
+@receiver(post_save, sender=Siniestro)
+@receiver(post_delete, sender=Siniestro)
+@receiver(post_save, sender=Agente)
+@receiver(post_delete, sender=Agente)
+@receiver(post_save, sender=Cliente)
+@receiver(post_delete, sender=Cliente)
+def invalidar_cache(sender, instance, raw=False, **kwargs):
+    if not raw:
+        cache_respuestas.invalidar(*cache_respuestas.etiquetas_de(instance))
+
+
+@receiver(post_save, sender=Usuario)
+def invalidar_cache_usuario(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # El login solo toca last_login: no cambia nada de lo que se muestra
+    if created or raw or (update_fields is not None and set(update_fields) <= {'last_login'}):
+        return
+    # Nombre, email y teléfono se muestran dentro del cliente y del agente
+    etiquetas = [f'usuario:{instance.pk}']
+    etiquetas += [f'cliente:{pk}' for pk in Cliente.objects.filter(usuario=instance).values_list('id', flat=True)]
+    agentes = [f'agente:{pk}' for pk in Agente.objects.filter(usuario=instance).values_list('id', flat=True)]
+    if agentes:
+        etiquetas += agentes + ['agentes']
+    cache_respuestas.invalidar(*etiquetas)
+
+
+# --- Fechas de modificación (ETag / Last-Modified) ---
+
+@receiver(post_save, sender=Beneficiario)
+@receiver(post_delete, sender=Beneficiario)
+def tocar_poliza(sender, instance, raw=False, **kwargs):
+    # Los beneficiarios se muestran dentro de la póliza: cuentan como cambio de ella
+    if not raw:
+        Poliza.objects.filter(id=instance.poliza_id).update(actualizado_en=timezone.now())
+
+
+# --- Sesiones JWT (JWTSinConsulta) ---
+# El token trae rol, is_active implícito y el perfil: si cambian, las sesiones
+# abiertas dejan de valer (ver autenticacion.revocar)
+
+def _huella_sesion(usuario):
+    return tuple(usuario.__dict__.get(c) for c in ('is_active', 'rol', 'is_staff', 'password'))
+
+
+@receiver(post_init, sender=Usuario)
+def usuario_cargado(sender, instance, **kwargs):
+    instance._huella_sesion = _huella_sesion(instance)
+
+
+@receiver(post_save, sender=Usuario)
+def revocar_si_cambia(sender, instance, created, raw=False, **kwargs):
+    if created or raw:
+        return
+    if _huella_sesion(instance) != instance._huella_sesion:
+        autenticacion.revocar(instance.pk)
+    instance._huella_sesion = _huella_sesion(instance)
+
+
+@receiver(post_delete, sender=Usuario)
+def revocar_usuario_borrado(sender, instance, **kwargs):
+    autenticacion.revocar(instance.pk)
+
+
+@receiver(post_save, sender=Agente)
+@receiver(post_save, sender=Cliente)
+@receiver(post_delete, sender=Agente)
+@receiver(post_delete, sender=Cliente)
+def revocar_si_cambia_perfil(sender, instance, raw=False, created=True, **kwargs):
+    # Solo altas y bajas (post_delete no trae `created`): agente_id / cliente_id
+    # del token dejan de ser ciertos
+    if not raw and created:
+        autenticacion.revocar(instance.usuario_id)
+
+
+# --- Estado del pago en vivo (SSE / long-poll) ---
+
+@receiver(post_init, sender=Pago)
+def pago_cargado(sender, instance, **kwargs):
+    instance._estado_aviso = instance.__dict__.get('estado')
+
+
+@receiver(post_save, sender=Pago)
+def avisar_estado_pago(sender, instance, created, raw=False, **kwargs):
+    # iniciar_pago_qr, lista_pagos, simular_pago_exitoso, el webhook del banco
+    # o el admin: todos pasan por aquí
+    if raw or (not created and instance.estado == instance._estado_aviso):
+        return
+    pago_id, estado = instance.pk, instance.estado
+    # Después del commit: el que lee la cache o se despierta tiene que ver el pago ya guardado
+    transaction.on_commit(lambda: estado_pagos.cambiado(pago_id, estado, nuevo=created))
+    instance._estado_aviso = estado
+
+
+@receiver(post_delete, sender=Pago)
+def olvidar_estado_pago(sender, instance, **kwargs):
+    pago_id = instance.pk
+    transaction.on_commit(lambda: estado_pagos.olvidar(pago_id))
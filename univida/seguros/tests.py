@@ -1,3 +1,1435 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import tempfile
+import time
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+from pyhanko.keys import load_cert_from_pemder
+from pyhanko.pdf_utils.reader import PdfFileReader
+from pyhanko.sign.validation import validate_pdf_signature
+from pyhanko_certvalidator import ValidationContext
+
+from . import (
+    ciclo_vida, conciliacion, confirmaciones, documentos, estadisticas, estado_pagos, facturacion, firma, importacion,
+    lectura_rapida, lote_documentos, notificaciones, numeracion
+)
+from .banco_falso import BancoFalso, enviar_local
+from .autenticacion import ANONIMO, JWTSinConsulta, perfil_de
+from .consultas import precargar
+from .models import Usuario, Cliente, Poliza, Beneficiario, Agente, Factura, Pago, Siniestro, NotaPoliza
+from .models import ConfirmacionPago, CorridaFacturacion, EstadisticaAgente, EstadisticaAgenteMes, TrabajoDocumento
+from .serializers import MyTokenObtainPairSerializer, PolizaSerializer, FacturaSerializer, SiniestroSerializer, PagoSerializer
+
+
+def crear_datos(cantidad, agente=None):
+    """Crea `cantidad` pólizas completas (cliente, beneficiarios, factura, pago, siniestro, nota)."""
+    if agente is None:
+        usuario_agente = Usuario.objects.create_user(username=f'agente{Agente.objects.count()}', rol='AGENTE')
+        agente = Agente.objects.create(usuario=usuario_agente, codigo_agente=f'AG-{usuario_agente.id}', fecha_contratacion=date(2024, 1, 1))
+
+    inicio = Poliza.objects.count()
+    for i in range(inicio, inicio + cantidad):
+        usuario = Usuario.objects.create_user(username=f'cliente{i}', first_name='Ana', last_name=f'Pérez {i}')
+        cliente = Cliente.objects.create(usuario=usuario, fecha_nacimiento=date(1990, 1, 1), direccion='Calle 1', identificacion=f'CI-{i}', agente=agente)
+        poliza = Poliza.objects.create(
+            cliente=cliente, agente=agente, numero_poliza=f'POL-{i}', suma_asegurada=Decimal('10000.00'),
+            prima_anual=Decimal('1200.00'), fecha_inicio=date.today(), fecha_vencimiento=date.today() + timedelta(days=365),
+            estado='activa', cobertura='Plan: Vida. Emitido por Agente.'
+        )
+        Beneficiario.objects.create(poliza=poliza, nombre_completo='Hijo', parentesco='hijo', porcentaje=Decimal('60.00'))
+        Beneficiario.objects.create(poliza=poliza, nombre_completo='Hija', parentesco='hija', porcentaje=Decimal('40.00'))
+        factura = Factura.objects.create(
+            poliza=poliza, numero_factura=f'FAC-{i}', monto=Decimal('1200.00'), periodo=date.today().replace(day=1),
+            fecha_emision=date.today(), fecha_vencimiento=date.today() + timedelta(days=30)
+        )
+        Pago.objects.create(factura=factura, monto_pagado=Decimal('1200.00'), metodo_pago='efectivo', referencia_pago=f'REF-{i}')
+        Siniestro.objects.create(
+            poliza=poliza, numero_siniestro=f'SIN-{i}', tipo_siniestro='otros', fecha_siniestro=date.today(),
+            descripcion='Prueba', monto_reclamado=Decimal('500.00')
+        )
+        NotaPoliza.objects.create(poliza=poliza, usuario=agente.usuario, titulo='Nota', contenido='Contenido')
+    return agente
+
+
+class PrecargaListasTests(TestCase):
+    """Las listas deben hacer el mismo número de consultas sin importar cuántas filas devuelvan."""
+
+    URLS = ['/api/clientes/', '/api/polizas/', '/api/facturas/', '/api/pagos/',
+            '/api/siniestros/', '/api/notas-poliza/', '/api/beneficiarios/']
+
+    def setUp(self):
+        self.admin = Usuario.objects.create_user(username='admin', rol='ADMIN', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def contar_consultas(self, url):
+        # Usuario recién leído para que no arrastre cachés de la petición anterior
+        self.client.force_authenticate(Usuario.objects.get(pk=self.admin.pk))
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_consultas_constantes(self):
+        agente = crear_datos(2)
+        pocas = {url: self.contar_consultas(url) for url in self.URLS}
+
+        crear_datos(6, agente=agente)
+        for url in self.URLS:
+            with self.subTest(url=url):
+                self.assertEqual(self.contar_consultas(url), pocas[url])
+
+
+class PaginacionCursorTests(TestCase):
+    def setUp(self):
+        admin = Usuario.objects.create_user(username='admin', rol='ADMIN', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        crear_datos(7)
+
+    def recorrer(self, url, page_size):
+        ids, paginas = [], 0
+        response = self.client.get(url, {'page_size': page_size})
+        while True:
+            paginas += 1
+            ids += [fila['id'] for fila in response.data['results']]
+            if not response.data['has_more']:
+                return ids, paginas
+            response = self.client.get(url, {'page_size': page_size, 'cursor': response.data['cursor']})
+
+    def test_sin_parametros_devuelve_lista_completa(self):
+        response = self.client.get('/api/polizas/')
+        self.assertIsInstance(response.data, list)
+        self.assertEqual(len(response.data), 7)
+
+    def test_recorre_todas_las_filas_en_orden(self):
+        for url in ['/api/polizas/', '/api/facturas/', '/api/siniestros/', '/api/clientes/']:
+            with self.subTest(url=url):
+                completa = [fila['id'] for fila in self.client.get(url).data]
+                ids, paginas = self.recorrer(url, 3)
+                self.assertEqual(sorted(ids), sorted(completa))
+                self.assertEqual(len(ids), len(set(ids)))
+                self.assertEqual(paginas, 3)
+
+    def test_empates_en_fecha_usan_id(self):
+        # Todas las facturas vencen el mismo día: el id desempata
+        ids, _ = self.recorrer('/api/facturas/', 2)
+        self.assertEqual(ids, sorted(ids))
+
+    def test_cursor_invalido(self):
+        response = self.client.get('/api/polizas/', {'cursor': 'no-es-un-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class CamposDinamicosTests(TestCase):
+    def setUp(self):
+        admin = Usuario.objects.create_user(username='admin', rol='ADMIN', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        crear_datos(3)
+
+    def test_fields_recorta_anidados(self):
+        response = self.client.get('/api/pagos/', {'fields': 'id,monto_pagado,factura_info.numero_factura'})
+        fila = response.data[0]
+        self.assertEqual(set(fila), {'id', 'monto_pagado', 'factura_info'})
+        self.assertEqual(set(fila['factura_info']), {'numero_factura'})
+
+    def test_expand_omite_bloques_no_pedidos(self):
+        response = self.client.get('/api/polizas/', {'expand': ''})
+        fila = response.data[0]
+        self.assertNotIn('beneficiarios', fila)
+        self.assertNotIn('cliente_info', fila)
+        self.assertIn('numero_poliza', fila)
+
+    def test_sin_relaciones_no_hay_joins_ni_prefetch(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get('/api/pagos/', {'fields': 'id,monto_pagado,estado'})
+        sql = ' '.join(q['sql'] for q in ctx.captured_queries)
+        self.assertNotIn('JOIN "univida_poliza"', sql)
+        self.assertNotIn('univida_beneficiario', sql)
+
+
+class LecturaRapidaParidadTests(TestCase):
+    """La lectura rápida debe producir exactamente el mismo JSON que los serializers."""
+
+    def setUp(self):
+        crear_datos(4)
+        # Casos borde: póliza sin agente, sin beneficiarios, siniestro aprobado con nulos
+        huerfana = Poliza.objects.first()
+        huerfana.agente = None
+        huerfana.save()
+        huerfana.beneficiarios.all().delete()
+        Siniestro.objects.filter(poliza=huerfana).update(estado='aprobado', monto_aprobado=Decimal('123.4'), fecha_resolucion=date.today())
+        Beneficiario.objects.filter(nombre_completo='Hijo').update(fecha_nacimiento=date(2010, 5, 6))
+
+    def comparar(self, modelo, serializer_class, **opciones):
+        queryset = modelo.objects.order_by('id')
+        esperado = serializer_class(precargar(queryset, serializer_class(**opciones)), many=True, **opciones).data
+        obtenido = lectura_rapida.leer(queryset, serializer_class(**opciones))
+        self.assertEqual(JSONRenderer().render(obtenido), JSONRenderer().render(esperado))
+
+    def test_paridad_completa(self):
+        for modelo, serializer_class in [(Poliza, PolizaSerializer), (Factura, FacturaSerializer),
+                                         (Siniestro, SiniestroSerializer), (Pago, PagoSerializer)]:
+            with self.subTest(serializer=serializer_class.__name__):
+                self.comparar(modelo, serializer_class)
+
+    def test_paridad_con_campos_dinamicos(self):
+        self.comparar(Factura, FacturaSerializer, fields=['id', 'monto', 'poliza_info.numero_poliza', 'poliza_info.beneficiarios'])
+        self.comparar(Poliza, PolizaSerializer, expand=['agente_info'])
+        self.comparar(Siniestro, SiniestroSerializer, expand=[])
+
+    def test_consultas(self):
+        # Una consulta principal y una para los beneficiarios
+        with self.assertNumQueries(2):
+            lectura_rapida.leer(Factura.objects.all(), FacturaSerializer())
+        with self.assertNumQueries(1):
+            lectura_rapida.leer(Siniestro.objects.all(), SiniestroSerializer(expand=[]))
+
+
+class FiltrosListaTests(TestCase):
+    def setUp(self):
+        admin = Usuario.objects.create_user(username='admin', rol='ADMIN', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+        self.agente = crear_datos(5)
+        polizas = list(Poliza.objects.order_by('id'))
+        polizas[0].estado = 'cotizacion'
+        polizas[0].agente = None
+        polizas[0].save()
+        polizas[1].estado = 'pendiente_pago'
+        polizas[1].fecha_vencimiento = date(2030, 1, 1)
+        polizas[1].save()
+        self.polizas = polizas
+
+    def ids(self, url, params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [fila['id'] for fila in response.data]
+
+    def test_estado_varios_valores_y_nulos(self):
+        self.assertEqual(sorted(self.ids('/api/polizas/', {'estado': 'cotizacion,pendiente_pago'})),
+                         [self.polizas[0].id, self.polizas[1].id])
+        self.assertEqual(self.ids('/api/polizas/', {'agente_id': 'null'}), [self.polizas[0].id])
+
+    def test_rangos_y_orden(self):
+        self.assertEqual(self.ids('/api/polizas/', {'fecha_vencimiento__gte': '2029-12-31'}), [self.polizas[1].id])
+        ids = self.ids('/api/polizas/', {'ordering': '-fecha_vencimiento'})
+        self.assertEqual(ids[0], self.polizas[1].id)
+
+    def test_filtro_por_relacion(self):
+        poliza = self.polizas[2]
+        ids = self.ids('/api/facturas/', {'cliente_id': poliza.cliente_id})
+        self.assertEqual(ids, list(poliza.facturas.values_list('id', flat=True)))
+        pagos = list(Pago.objects.filter(factura__poliza=poliza).values_list('id', flat=True))
+        self.assertEqual(self.ids('/api/pagos/', {'poliza_id': poliza.id}), pagos)
+        self.assertEqual(self.ids('/api/pagos/', {'cliente_id': poliza.cliente_id}), pagos)
+        # La primera quedó sin agente
+        self.assertEqual(len(self.ids('/api/pagos/', {'agente_id': self.agente.id})), 4)
+
+    def test_orden_fuera_de_lista_blanca(self):
+        response = self.client.get('/api/polizas/', {'ordering': 'cobertura'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_valor_invalido(self):
+        response = self.client.get('/api/facturas/', {'monto__gte': 'mucho'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('monto__gte', response.data)
+
+
+class AdminDashboardStatsTests(TestCase):
+    def setUp(self):
+        self.admin = Usuario.objects.create_user(username='admin', rol='ADMIN', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_totales(self):
+        crear_datos(6)
+        Poliza.objects.filter(id=Poliza.objects.first().id).update(estado='cotizacion')
+        Siniestro.objects.filter(id=Siniestro.objects.first().id).update(estado='aprobado', monto_aprobado=Decimal('100.00'))
+
+        with self.assertNumQueries(7):
+            response = self.client.get('/api/admin/dashboard-stats/')
+        data = response.data
+        self.assertEqual(data['total_polizas'], 6)
+        self.assertEqual(data['total_clientes'], 6)
+        self.assertEqual(data['total_agentes'], 1)
+        self.assertEqual(data['polizas_activas'], 5)
+        self.assertEqual(data['polizas_cotizacion'], 1)
+        self.assertEqual(data['polizas_por_estado'], {'cotizacion': 1, 'activa': 5})
+        self.assertEqual(data['total_primas'], Decimal('7200.00'))
+        self.assertEqual(data['siniestros_pendientes'], 5)
+        self.assertEqual(data['total_aprobado'], Decimal('100.00'))
+        self.assertEqual(len(data['ultimas_polizas']), 5)
+        self.assertEqual(data['ultimas_polizas'][0]['id'], Poliza.objects.order_by('-id').first().id)
+
+    def test_solo_admin(self):
+        self.client.force_authenticate(Usuario.objects.create_user(username='cli'))
+        self.assertEqual(self.client.get('/api/admin/dashboard-stats/').status_code, 403)
+
+
+class EstadisticasAgenteTests(TestCase):
+    def comparar_con_recalculo(self, agente):
+        incremental = EstadisticaAgente.objects.get(agente=agente)
+        meses = list(EstadisticaAgenteMes.objects.filter(agente=agente)
+                     .values_list('anio', 'mes', 'ventas_monto', 'polizas_vendidas').order_by('anio', 'mes'))
+        estadisticas.recalcular_agente(agente.id)
+        completo = EstadisticaAgente.objects.get(agente=agente)
+        self.assertEqual(
+            (incremental.total_clientes, incremental.polizas_activas, incremental.ultimas_ventas),
+            (completo.total_clientes, completo.polizas_activas, completo.ultimas_ventas),
+        )
+        # En incremental pueden quedar meses a cero; el recálculo no los crea
+        self.assertEqual([m for m in meses if m[3]],
+                         list(EstadisticaAgenteMes.objects.filter(agente=agente)
+                              .values_list('anio', 'mes', 'ventas_monto', 'polizas_vendidas').order_by('anio', 'mes')))
+
+    def test_incremental_igual_a_recalculo(self):
+        agente = crear_datos(4)
+        otro = crear_datos(1)
+        self.assertEqual(EstadisticaAgente.objects.get(agente=agente).polizas_activas, 4)
+
+        poliza = Poliza.objects.filter(agente=agente).first()
+        poliza.estado = 'inactiva'
+        poliza.save()
+        poliza = Poliza.objects.filter(agente=agente, estado='activa').first()
+        poliza.prima_anual = Decimal('3000.00')
+        poliza.save()
+        cliente = Cliente.objects.filter(agente=agente).last()
+        cliente.agente = otro
+        cliente.save()
+        Poliza.objects.filter(agente=agente, estado='activa').last().delete()
+
+        self.comparar_con_recalculo(agente)
+        self.comparar_con_recalculo(otro)
+        estadistica = EstadisticaAgente.objects.get(agente=agente)
+        self.assertEqual((estadistica.total_clientes, estadistica.polizas_activas), (3, 2))
+        hoy = timezone.localdate()
+        mes = EstadisticaAgenteMes.objects.get(agente=agente, anio=hoy.year, mes=hoy.month)
+        self.assertEqual(mes.ventas_monto, Decimal('4200.00'))
+
+    def test_recalculo_de_varios_agentes_igual_al_de_uno(self):
+        agentes = [crear_datos(7), crear_datos(2), crear_datos(1)]
+        Poliza.objects.filter(id__in=Poliza.objects.filter(agente=agentes[0]).values('id')[:2]).update(estado='vencida')
+        Poliza.objects.filter(agente=agentes[1]).update(estado='inactiva')
+        EstadisticaAgente.objects.filter(agente=agentes[2]).delete()
+
+        def leer():
+            return [(e.agente_id, e.total_clientes, e.polizas_activas, e.ultimas_ventas) for e in
+                    EstadisticaAgente.objects.order_by('agente_id')], list(
+                EstadisticaAgenteMes.objects.order_by('agente_id', 'anio', 'mes')
+                .values_list('agente_id', 'anio', 'mes', 'ventas_monto', 'polizas_vendidas'))
+
+        with self.assertNumQueries(8):
+            self.assertEqual(estadisticas.recalcular_agentes([a.id for a in agentes] + [None]), 3)
+        en_bloque = leer()
+        for agente in agentes:
+            estadisticas.recalcular_agente(agente.id)
+        self.assertEqual(en_bloque, leer())
+        self.assertEqual([fila[2] for fila in en_bloque[0]], [5, 0, 1])
+
+    def test_dashboard_lee_la_tabla(self):
+        agente = crear_datos(3)
+        client = APIClient()
+        # Como llega con JWTConPerfil: el perfil viene en la consulta de autenticación
+        client.force_authenticate(Usuario.objects.select_related('agente', 'cliente').get(pk=agente.usuario_id))
+        # estadística por PK + solicitudes pendientes + pólizas por vencer
+        with self.assertNumQueries(3):
+            response = client.get('/api/agente/dashboard-stats/')
+        self.assertEqual(response.data['total_clientes'], 3)
+        self.assertEqual(response.data['polizas_activas'], 3)
+        self.assertEqual(response.data['ventas_mes'], Decimal('3600.00'))
+        self.assertEqual(len(response.data['ultimas_ventas']), 3)
+        self.assertEqual(response.json()['ultimas_ventas'][0]['monto'], 1200)
+
+    def test_dashboard_sin_fila_la_reconstruye(self):
+        agente = crear_datos(2)
+        EstadisticaAgente.objects.all().delete()
+        client = APIClient()
+        client.force_authenticate(agente.usuario)
+        self.assertEqual(client.get('/api/agente/dashboard-stats/').data['polizas_activas'], 2)
+        client.force_authenticate(Usuario.objects.create_user(username='cli'))
+        self.assertEqual(client.get('/api/agente/dashboard-stats/').status_code, 403)
+
+
+class BuscarClientesTests(TestCase):
+    def setUp(self):
+        self.agente = crear_datos(0)
+        for i, (nombre, apellido) in enumerate([('José', 'Pérez Álvarez'), ('María', 'González'),
+                                                ('Luis', 'Quispe Mamani'), ('Lucía', 'Pereira')]):
+            usuario = Usuario.objects.create_user(username=f'busca{i}', first_name=nombre, last_name=apellido)
+            Cliente.objects.create(usuario=usuario, fecha_nacimiento=date(1990, 1, 1), direccion='Calle 1',
+                                   identificacion=f'CI-77{i}', agente=self.agente)
+        self.admin = Usuario.objects.create_user(username='admin', rol='ADMIN', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def nombres(self, q):
+        response = self.client.get('/api/clientes/buscar/', {'q': q})
+        self.assertEqual(response.status_code, 200)
+        return [c['usuario_info']['last_name'] for c in response.data]
+
+    def test_columna_normalizada(self):
+        cliente = Cliente.objects.get(identificacion='CI-770')
+        self.assertEqual(cliente.busqueda, 'jose perez alvarez ci-770')
+        cliente.usuario.last_name = 'Núñez'
+        cliente.usuario.save()
+        self.assertEqual(Cliente.objects.get(id=cliente.id).busqueda, 'jose nunez ci-770')
+
+    def test_prefijo_tildes_y_errores(self):
+        self.assertEqual(self.nombres('alvarez')[0], 'Pérez Álvarez')
+        self.assertEqual(self.nombres('GONZÁLEZ'), ['González'])
+        self.assertEqual(self.nombres('gonzales'), ['González'])  # error de tipeo
+        self.assertEqual(self.nombres('quispe mamami'), ['Quispe Mamani'])
+        self.assertEqual(self.nombres('ci-772')[0], 'Quispe Mamani')
+        self.assertEqual(self.nombres('zzzz'), [])
+
+    def test_borrado_sale_del_indice(self):
+        Cliente.objects.get(identificacion='CI-771').delete()
+        self.assertEqual(self.nombres('gonzalez'), [])
+
+    def test_agente_solo_sus_clientes(self):
+        otro = crear_datos(1)
+        self.client.force_authenticate(otro.usuario)
+        self.assertEqual(self.nombres('gonzalez'), [])
+        self.client.force_authenticate(Usuario.objects.create_user(username='cli', rol='CLIENTE'))
+        self.assertEqual(self.client.get('/api/clientes/buscar/', {'q': 'ana'}).status_code, 403)
+
+    def test_agente_encuentra_los_suyos_entre_muchos_de_otros(self):
+        otro = crear_datos(0)
+        for i in range(4):
+            usuario = Usuario.objects.create_user(username=f'condori{i}', first_name='Ana', last_name='Condori')
+            Cliente.objects.create(usuario=usuario, fecha_nacimiento=date(1990, 1, 1), direccion='Calle 1',
+                                   identificacion=f'CI-88{i}', agente=otro)
+        usuario = Usuario.objects.create_user(username='condori-mio', first_name='Rosa', last_name='Condori')
+        Cliente.objects.create(usuario=usuario, fecha_nacimiento=date(1990, 1, 1), direccion='Calle 1',
+                               identificacion='CI-889', agente=self.agente)
+        self.client.force_authenticate(self.agente.usuario)
+        # Menos candidatos que clientes del otro agente con el mismo apellido
+        with mock.patch('seguros.busqueda.CANDIDATOS', 2):
+            self.assertEqual(self.nombres('condori'), ['Condori'])
+            self.assertEqual(self.nombres('condory'), ['Condori'])
+
+    def test_save_solo_rehace_la_busqueda_si_cambia_la_identificacion(self):
+        cliente = Cliente.objects.get(identificacion='CI-770')
+        cliente.direccion = 'Calle 2'
+        # Solo el UPDATE: no carga el usuario
+        with self.assertNumQueries(1):
+            cliente.save()
+        cliente.identificacion = 'CI-999'
+        cliente.save(update_fields=['identificacion'])
+        self.assertEqual(Cliente.objects.get(id=cliente.id).busqueda, 'jose perez alvarez ci-999')
+
+
+class CacheRespuestasTests(TestCase):
+    def setUp(self):
+        caches['respuestas'].clear()
+        self.agente = crear_datos(2)
+        self.poliza = Poliza.objects.first()
+        self.admin = Usuario.objects.create_user(username='admin', rol='ADMIN', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_detalle_poliza_hit_y_invalidacion(self):
+        url = f'/api/polizas/{self.poliza.id}/'
+        primera = self.client.get(url).data
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).data, primera)
+
+        # Cambia la póliza: se invalida
+        self.poliza.estado = 'vencida'
+        self.poliza.save()
+        self.assertEqual(self.client.get(url).data['estado'], 'vencida')
+
+        # Cambia el nombre del cliente (vive en Usuario): también
+        usuario = self.poliza.cliente.usuario
+        usuario.first_name = 'Beatriz'
+        usuario.save()
+        self.assertEqual(self.client.get(url).data['cliente_info']['usuario_info']['first_name'], 'Beatriz')
+
+        # Otra póliza no toca esta entrada
+        otra = Poliza.objects.exclude(id=self.poliza.id).first()
+        otra.estado = 'vencida'
+        otra.save()
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+    def test_fields_y_usuario_separan_la_clave(self):
+        url = f'/api/polizas/{self.poliza.id}/'
+        self.client.get(url)
+        self.assertEqual(set(self.client.get(url, {'fields': 'id,estado'}).data), {'id', 'estado'})
+        self.client.force_authenticate(self.agente.usuario)
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(url)
+        self.assertGreater(len(ctx.captured_queries), 0)
+
+    def test_perfiles_y_contadores(self):
+        self.client.delete('/api/admin/cache-stats/')
+        self.client.force_authenticate(self.agente.usuario)
+        self.client.get('/api/agente/me/')
+        self.client.get('/api/agente/me/')
+        self.agente.especialidad = 'Vida'
+        self.agente.save()
+        self.assertEqual(self.client.get('/api/agente/me/').data['especialidad'], 'Vida')
+
+        self.client.force_authenticate(self.admin)
+        self.client.get('/api/agentes/')
+        otro_admin = Usuario.objects.create_user(username='admin2', rol='ADMIN', is_staff=True)
+        self.client.force_authenticate(otro_admin)
+        with self.assertNumQueries(0):
+            self.client.get('/api/agentes/')  # misma entrada para todo el rol
+
+        stats = self.client.get('/api/admin/cache-stats/').data
+        self.assertEqual(stats['mi_perfil_agente'], {'hits': 1, 'misses': 2, 'ratio': 0.333})
+        self.assertEqual(stats['lista_agentes']['hits'], 1)
+
+
+class GetCondicionalTests(TestCase):
+    def setUp(self):
+        caches['respuestas'].clear()
+        crear_datos(1)
+        self.poliza = Poliza.objects.get()
+        self.admin = Usuario.objects.create_user(username='admin', rol='ADMIN', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_cliente_304_con_una_consulta(self):
+        url = f'/api/clientes/{self.poliza.cliente_id}/'
+        respuesta = self.client.get(url)
+        etag = respuesta['ETag']
+        self.assertEqual(respuesta['Cache-Control'], 'private, no-cache')
+
+        # Solo la consulta de los validadores: ni el cliente ni el serializer
+        with self.assertNumQueries(1):
+            respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertEqual(respuesta['ETag'], etag)
+
+        usuario = self.poliza.cliente.usuario
+        usuario.telefono = '70000000'
+        usuario.save()
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+
+    def test_siniestro_if_modified_since(self):
+        siniestro = Siniestro.objects.get()
+        url = f'/api/siniestros/{siniestro.id}/'
+        ultima = self.client.get(url)['Last-Modified']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=ultima).status_code, 304)
+        # ?fields= cambia el cuerpo, así que cambia el ETag
+        self.assertNotEqual(self.client.get(url)['ETag'], self.client.get(url, {'fields': 'id'})['ETag'])
+
+    def test_poliza_beneficiarios_y_cache(self):
+        url = f'/api/polizas/{self.poliza.id}/'
+        etag = self.client.get(url)['ETag']
+        # Con la respuesta en cache el 304 sale sin tocar la BD
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.poliza.beneficiarios.first().delete()
+        respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.data['beneficiarios']), 1)
+
+    def test_estado_pago(self):
+        pago = Pago.objects.get()
+        pago.estado = 'pendiente'
+        pago.save()
+        url = f'/api/pagos/estado/{pago.id}/'
+        etag = self.client.get(url)['ETag']
+        # El estado sale de la cache: ni el 304 ni el 200 tocan la BD
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+            self.assertEqual(self.client.get(url).data['status'], 'pendiente')
+        with self.captureOnCommitCallbacks(execute=True):
+            pago.estado = 'completado'
+            pago.save()
+        with self.assertNumQueries(0):
+            respuesta = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.data['status'], 'completado')
+        self.assertEqual(self.client.get('/api/pagos/estado/999/').status_code, 404)
+
+
+class PerfilPeticionTests(TestCase):
+    def setUp(self):
+        caches['respuestas'].clear()
+        self.agente = crear_datos(2)
+        self.otro = crear_datos(1)
+        self.client = APIClient()
+
+    def test_jwt_trae_el_perfil_con_el_usuario(self):
+        cliente = Cliente.objects.filter(agente=self.agente).first()
+        token = RefreshToken.for_user(cliente.usuario).access_token
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        # Una sola consulta: usuario + cliente + agente con JOIN, y el serializer no pide más
+        with self.assertNumQueries(1):
+            respuesta = self.client.get('/api/cliente/me/')
+        self.assertEqual(respuesta.status_code, 200)
+
+    def test_perfil_de_calcula_una_vez(self):
+        peticion = APIRequestFactory().get('/')
+        peticion.user = self.agente.usuario
+        with self.assertNumQueries(1):
+            perfil = perfil_de(peticion)
+            self.assertIs(perfil_de(peticion), perfil)
+        self.assertTrue(perfil.es_agente)
+        self.assertFalse(perfil.es_cliente)
+        self.assertEqual(perfil.agente_id, self.agente.id)
+        self.assertIs(perfil_de(APIRequestFactory().get('/')), ANONIMO)
+
+    def test_cada_uno_ve_lo_suyo(self):
+        def filas(respuesta):
+            datos = respuesta.data
+            return datos['results'] if isinstance(datos, dict) else datos
+
+        mias = set(Poliza.objects.filter(agente=self.agente).values_list('id', flat=True))
+        self.client.force_authenticate(self.agente.usuario)
+        self.assertEqual({f['poliza'] for f in filas(self.client.get('/api/facturas/'))}, mias)
+        siniestros = set(Siniestro.objects.filter(poliza__in=mias).values_list('id', flat=True))
+        self.assertEqual({s['id'] for s in filas(self.client.get('/api/siniestros/'))}, siniestros)
+        self.assertEqual(len(filas(self.client.get('/api/clientes/'))), 2)
+
+        cliente = Cliente.objects.filter(agente=self.otro).get()
+        self.client.force_authenticate(cliente.usuario)
+        self.assertEqual(len(filas(self.client.get('/api/pagos/'))), 1)
+        siniestro = Siniestro.objects.get(poliza__cliente=cliente)
+        self.assertEqual([s['id'] for s in filas(self.client.get('/api/siniestros/'))], [siniestro.id])
+
+
+class JWTSinConsultaTests(TestCase):
+    def setUp(self):
+        caches['respuestas'].clear()
+        caches['revocaciones'].clear()
+        self.agente = crear_datos(1)
+        self.cliente = Cliente.objects.get()
+        self.admin = Usuario.objects.create_user(username='admin', rol='ADMIN', is_staff=True)
+
+    def autenticar(self, token):
+        peticion = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return JWTSinConsulta().authenticate(peticion)
+
+    def test_usuario_y_perfil_salen_del_token(self):
+        refresh = MyTokenObtainPairSerializer.get_token(self.agente.usuario)
+        with self.assertNumQueries(0):
+            usuario, token = self.autenticar(refresh.access_token)
+            peticion = APIRequestFactory().get('/')
+            peticion.user = usuario
+            perfil = perfil_de(peticion)
+        self.assertEqual((usuario.pk, usuario.rol), (self.agente.usuario_id, 'AGENTE'))
+        self.assertEqual((perfil.agente_id, perfil.cliente_id), (self.agente.id, None))
+        # El objeto se carga solo si una vista lo pide
+        self.assertEqual(perfil.agente.codigo_agente, self.agente.codigo_agente)
+
+    def test_token_viejo_carga_el_usuario(self):
+        token = RefreshToken.for_user(self.agente.usuario).access_token
+        with self.assertNumQueries(1):
+            usuario, _ = self.autenticar(token)
+        self.assertIsInstance(usuario, Usuario)
+
+    def test_desactivar_revoca_tambien_los_renovados(self):
+        refresh = MyTokenObtainPairSerializer.get_token(self.cliente.usuario)
+        self.autenticar(refresh.access_token)
+
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        client.patch(f'/api/clientes/{self.cliente.id}/toggle-estado/', {'is_active': False}, format='json')
+        with self.assertRaises(AuthenticationFailed):
+            self.autenticar(refresh.access_token)
+        with self.assertRaises(AuthenticationFailed):
+            self.autenticar(RefreshToken(str(refresh)).access_token)
+
+        # Al reactivarlo, un login nuevo vale
+        client.patch(f'/api/clientes/{self.cliente.id}/toggle-estado/', {'is_active': True}, format='json')
+        usuario, _ = self.autenticar(MyTokenObtainPairSerializer.get_token(self.cliente.usuario).access_token)
+        self.assertEqual(usuario.cliente_id, self.cliente.id)
+
+    def test_eliminar_agente_y_cambios_que_no_revocan(self):
+        token = MyTokenObtainPairSerializer.get_token(self.agente.usuario).access_token
+        usuario = Usuario.objects.get(pk=self.agente.usuario_id)
+        usuario.telefono = '70000000'
+        usuario.save()
+        self.autenticar(token)
+
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        client.delete(f'/api/agentes/{self.agente.id}/eliminar/')
+        with self.assertRaises(AuthenticationFailed):
+            self.autenticar(token)
+
+
+@override_settings(DOCUMENTOS_SINCRONO=True)
+class DocumentosPdfTests(TestCase):
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directorio.cleanup)
+        ajuste = override_settings(DOCUMENTOS_ROOT=self.directorio.name)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+        crear_datos(1)
+        self.poliza = Poliza.objects.get()
+        self.admin = Usuario.objects.create_user(username='admin', rol='ADMIN', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_segunda_descarga_no_renderiza(self):
+        url = f'/api/polizas/{self.poliza.id}/pdf/'
+        respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        contenido = b''.join(respuesta.streaming_content)
+        self.assertTrue(contenido.startswith(b'%PDF'))
+        self.assertEqual(respuesta['Content-Disposition'], f'attachment; filename="Poliza_{self.poliza.numero_poliza}.pdf"')
+
+        with mock.patch('seguros.documentos.renderizar') as renderizar:
+            respuesta = self.client.get(url)
+            self.assertEqual(b''.join(respuesta.streaming_content), contenido)
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=respuesta['ETag']).status_code, 304)
+            renderizar.assert_not_called()
+
+        # Cambia un beneficiario: otra huella, otro archivo
+        beneficiario = self.poliza.beneficiarios.first()
+        beneficiario.nombre_completo = 'Otro Nombre'
+        beneficiario.save()
+        self.assertNotEqual(self.client.get(url)['ETag'], respuesta['ETag'])
+
+    def test_range(self):
+        url = f'/api/polizas/{self.poliza.id}/pdf/'
+        completo = b''.join(self.client.get(url).streaming_content)
+        respuesta = self.client.get(url, HTTP_RANGE='bytes=0-3')
+        self.assertEqual(respuesta.status_code, 206)
+        self.assertEqual(respuesta.content, b'%PDF')
+        self.assertEqual(respuesta['Content-Range'], f'bytes 0-3/{len(completo)}')
+        self.assertEqual(self.client.get(url, HTTP_RANGE='bytes=-5').content, completo[-5:])
+        self.assertEqual(self.client.get(url, HTTP_RANGE=f'bytes={len(completo)}-').status_code, 416)
+
+    def test_trabajo_estado_y_descarga(self):
+        # En segundo plano: el request solo crea el trabajo y lo deja para después del commit
+        with override_settings(DOCUMENTOS_SINCRONO=False), self.captureOnCommitCallbacks() as pendientes:
+            respuesta = self.client.post(f'/api/polizas/{self.poliza.id}/pdf/trabajo/')
+        self.assertEqual((respuesta.status_code, respuesta.data['estado']), (202, 'pendiente'))
+        self.assertEqual(len(pendientes), 1)
+
+        respuesta = self.client.post(f'/api/polizas/{self.poliza.id}/pdf/trabajo/')
+        trabajo = TrabajoDocumento.objects.get(id=respuesta.data['id'])
+        self.assertEqual(trabajo.estado, 'listo')
+
+        estado = self.client.get(f'/api/documentos/trabajos/{trabajo.id}/').data
+        self.assertEqual(estado['estado'], 'listo')
+        descarga = self.client.get(estado['descarga'])
+        self.assertTrue(b''.join(descarga.streaming_content).startswith(b'%PDF'))
+
+        # Ya está en disco: el siguiente trabajo nace listo
+        self.assertEqual(self.client.post(f'/api/polizas/{self.poliza.id}/pdf/trabajo/').status_code, 200)
+
+        # Otro usuario no ve el trabajo ajeno
+        self.client.force_authenticate(self.poliza.cliente.usuario)
+        self.assertEqual(self.client.get(f'/api/documentos/trabajos/{trabajo.id}/').status_code, 404)
+        self.assertEqual(self.client.post('/api/polizas/999/pdf/trabajo/').status_code, 404)
+
+    def test_lote_zip(self):
+        crear_datos(2)
+        ids = list(Poliza.objects.values_list('id', flat=True))
+        avance = []
+        salida = os.path.join(self.directorio.name, 'lote.zip')
+        # En los tests la BD es de esta conexión: el lote corre en el mismo proceso
+        resumen = lote_documentos.generar_lote(ids + [999], salida, procesos=1, tanda=2,
+                                               progreso=lambda hechos, total: avance.append(hechos))
+        self.assertEqual((resumen['renderizados'], resumen['reutilizados']), (3, 0))
+        self.assertEqual([poliza_id for poliza_id, _ in resumen['errores']], [999])
+        self.assertEqual(avance, [2, 4])
+        with zipfile.ZipFile(salida) as archivo_zip:
+            nombres = archivo_zip.namelist()
+            self.assertTrue(archivo_zip.read(nombres[0]).startswith(b'%PDF'))
+        self.assertEqual(sorted(nombres), sorted(f'Poliza_{p.numero_poliza}.pdf' for p in Poliza.objects.all()))
+
+        salida_comando = StringIO()
+        call_command('generar_pdfs_lote', procesos=1, salida=salida, stdout=salida_comando)
+        self.assertIn('0 renderizados, 3 reutilizados', salida_comando.getvalue())
+
+    def test_lote_desde_el_admin_con_tope(self):
+        crear_datos(2)
+        self.admin.is_superuser = True
+        self.admin.save()
+        client = Client()
+        client.force_login(self.admin)
+        datos = {'action': 'descargar_pdfs', '_selected_action': list(Poliza.objects.values_list('id', flat=True))}
+        respuesta = client.post('/admin/seguros/poliza/', datos)
+        self.assertEqual(respuesta['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(BytesIO(b''.join(respuesta.streaming_content))) as archivo_zip:
+            self.assertEqual(len(archivo_zip.namelist()), 3)
+
+        with mock.patch('seguros.admin.PolizaAdmin.maximo_pdfs', 2):
+            respuesta = client.post('/admin/seguros/poliza/', datos, follow=True)
+        self.assertIn('hasta 2 pólizas', respuesta.content.decode())
+
+
+@override_settings(DOCUMENTOS_SINCRONO=True)
+class FirmaPdfTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.certificados = tempfile.TemporaryDirectory()
+        cls.ajustes = firma.crear_ca_prueba(cls.certificados.name)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.certificados.cleanup()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directorio.cleanup)
+        ajuste = override_settings(DOCUMENTOS_ROOT=self.directorio.name, **self.ajustes)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+        crear_datos(2)
+        self.client = APIClient()
+        self.client.force_authenticate(Usuario.objects.create_user(username='admin', rol='ADMIN', is_staff=True))
+
+    def validar(self, contenido):
+        raiz = load_cert_from_pemder(self.ajustes['FIRMA_CADENA'][0])
+        lector = PdfFileReader(BytesIO(contenido))
+        self.assertEqual(len(lector.embedded_signatures), 1)
+        # Firma de certificación: solo se permite rellenar formularios
+        self.assertIsNotNone(lector.embedded_signatures[0].docmdp_level)
+        return validate_pdf_signature(lector.embedded_signatures[0], ValidationContext(trust_roots=[raiz]))
+
+    def test_pdf_firmado_valido_y_reutilizado(self):
+        poliza = Poliza.objects.first()
+        url = f'/api/polizas/{poliza.id}/pdf/'
+        contenido = b''.join(self.client.get(url, {'firmado': '1'}).streaming_content)
+        estado = self.validar(contenido)
+        self.assertTrue(estado.intact and estado.valid and estado.trusted)
+
+        # Queda al lado del PDF sin firmar y la segunda vez no se vuelve a firmar
+        documento = firma.obtener_pdf_firmado(poliza.id)
+        self.assertFalse(documento.nuevo)
+        self.assertEqual(documento.ruta.parent, documentos.obtener_pdf(poliza.id).ruta.parent)
+        with mock.patch('seguros.firma.firmar') as firmar:
+            self.client.get(url, {'firmado': '1'})
+            firmar.assert_not_called()
+
+    def test_lote_firmado_y_sin_configurar(self):
+        salida = os.path.join(self.directorio.name, 'lote.zip')
+        resumen = lote_documentos.generar_lote(Poliza.objects.values_list('id', flat=True), salida,
+                                               procesos=1, firmar=True)
+        self.assertEqual(resumen['renderizados'], 2)
+        with zipfile.ZipFile(salida) as archivo_zip:
+            for nombre in archivo_zip.namelist():
+                self.assertTrue(self.validar(archivo_zip.read(nombre)).intact)
+
+        with override_settings(FIRMA_CLAVE=None):
+            respuesta = self.client.get(f'/api/polizas/{Poliza.objects.first().id}/pdf/', {'firmado': '1'})
+            self.assertEqual(respuesta.status_code, 503)
+
+
+class QrPagoTests(TestCase):
+    def setUp(self):
+        caches['respuestas'].clear()
+        crear_datos(1)
+        self.client = APIClient()
+        self.client.force_authenticate(Cliente.objects.get().usuario)
+
+    def test_json_con_url_e_imagen_en_cache(self):
+        respuesta = self.client.post('/api/pagos/iniciar-qr/', {'factura_id': Factura.objects.get().id}, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotIn('base64', respuesta.data['qr_image'])
+        self.assertLess(len(JSONRenderer().render(respuesta.data)), 600)
+
+        # La imagen no necesita token: la pide un <img>
+        anonimo = APIClient()
+        imagen = anonimo.get(respuesta.data['qr_image'])
+        self.assertEqual(imagen['Content-Type'], 'image/svg+xml')
+        self.assertTrue(imagen.content.startswith(b'<svg'))
+        with self.assertNumQueries(0):
+            self.assertEqual(anonimo.get(respuesta.data['qr_image']).content, imagen.content)
+
+        png = anonimo.get(respuesta.data['qr_png'])
+        self.assertTrue(png.content.startswith(b'\x89PNG'))
+        self.assertEqual(anonimo.get('/api/pagos/qr/QR-NOEXISTE.svg').status_code, 404)
+        self.assertEqual(anonimo.get(f"/api/pagos/qr/{respuesta.data['referencia']}.gif").status_code, 404)
+
+
+class EstadoPagoEnVivoTests(TestCase):
+    def setUp(self):
+        caches['respuestas'].clear()
+        crear_datos(1)
+        self.pago = Pago.objects.get()
+        Pago.objects.filter(id=self.pago.id).update(estado='pendiente')
+        self.token = str(RefreshToken.for_user(Cliente.objects.get().usuario).access_token)
+        self.cabeceras = {'Authorization': f'Bearer {self.token}'}
+
+    def completar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            APIClient().get(f'/api/pagos/simular-exito/{self.pago.id}/')
+
+    async def completar_cuando_esperen(self):
+        canal = notificaciones.canal_pago(self.pago.id)
+        while not notificaciones.notificador().esperando(canal):
+            await asyncio.sleep(0.01)
+        await sync_to_async(self.completar)()
+
+    def test_aviso_solo_al_cambiar_estado_y_despues_del_commit(self):
+        with mock.patch.object(notificaciones.Notificador, 'publicar') as publicar:
+            pago = Pago.objects.get()
+            with self.captureOnCommitCallbacks(execute=True):
+                pago.estado = 'completado'
+                pago.save()
+                publicar.assert_not_called()
+            publicar.assert_called_once_with(f'pago:{pago.id}', 'completado')
+
+            with self.captureOnCommitCallbacks(execute=True):
+                pago.descripcion = 'Otra cosa'
+                pago.save()
+            self.assertEqual(publicar.call_count, 1)
+
+    def test_cache_de_estado(self):
+        cliente = APIClient()
+        cliente.force_authenticate(Cliente.objects.get().usuario)
+        with self.captureOnCommitCallbacks(execute=True):
+            pago_id = cliente.post('/api/pagos/iniciar-qr/', {'factura_id': Factura.objects.get().id},
+                                   format='json').data['pago_id']
+        url = f'/api/pagos/estado/{pago_id}/'
+        with self.assertNumQueries(0):
+            self.assertEqual(cliente.get(url).data, {'status': 'pendiente', 'en_vivo': False})
+
+        # Sin la entrada va a la BD una vez y la deja en la cache
+        estado_pagos.olvidar(pago_id)
+        with self.assertNumQueries(1):
+            cliente.get(url)
+        with self.assertNumQueries(0):
+            cliente.get(url)
+
+        # Una lectura vieja de la BD no pisa lo que escribió la señal
+        with self.captureOnCommitCallbacks(execute=True):
+            cliente.get(f'/api/pagos/simular-exito/{pago_id}/')
+        caches['respuestas'].add(f'pago:estado:{pago_id}', 'pendiente')
+        self.assertEqual(cliente.get(url).data['status'], 'completado')
+
+        # Un pago cargado a mano por lista_pagos también queda en la cache
+        with self.captureOnCommitCallbacks(execute=True):
+            creado = cliente.post('/api/pagos/', {'factura': Factura.objects.get().id, 'monto_pagado': '10.00',
+                                                  'metodo_pago': 'efectivo'}, format='json')
+        self.assertEqual(creado.status_code, 201, creado.data)
+        nuevo = Pago.objects.latest('id')
+        self.assertEqual(caches['respuestas'].get(f'pago:estado:{nuevo.id}'), nuevo.estado)
+
+    async def test_long_poll_despierta_al_completar(self):
+        url = f'/api/pagos/estado/{self.pago.id}/esperar/'
+        tarea = asyncio.create_task(self.completar_cuando_esperen())
+        inicio = time.monotonic()
+        respuesta = await self.async_client.get(url, {'espera': 10}, headers=self.cabeceras)
+        await tarea
+        self.assertEqual(respuesta.json(), {'status': 'completado'})
+        self.assertLess(time.monotonic() - inicio, 5)
+        self.assertEqual(notificaciones.notificador().esperando(), 0)
+
+        # Si ya no está en el estado conocido responde sin esperar
+        respuesta = await self.async_client.get(url, headers=self.cabeceras)
+        self.assertEqual(respuesta.json(), {'status': 'completado'})
+
+    async def test_long_poll_sin_cambios_y_errores(self):
+        url = f'/api/pagos/estado/{self.pago.id}/esperar/'
+        respuesta = await self.async_client.get(url, {'espera': 0.05}, headers=self.cabeceras)
+        self.assertEqual(respuesta.json(), {'status': 'pendiente'})
+        self.assertEqual((await self.async_client.get(url)).status_code, 401)
+        self.assertEqual((await self.async_client.get(url, {'token': 'basura'})).status_code, 401)
+        respuesta = await self.async_client.get('/api/pagos/estado/999999/esperar/', headers=self.cabeceras)
+        self.assertEqual(respuesta.status_code, 404)
+
+    async def test_eventos_sse(self):
+        respuesta = await self.async_client.get(f'/api/pagos/estado/{self.pago.id}/eventos/',
+                                                {'token': self.token})
+        self.assertEqual(respuesta['Content-Type'], 'text/event-stream')
+        eventos = aiter(respuesta.streaming_content)
+        self.assertIn(b'data: {"status": "pendiente"}', await anext(eventos))
+
+        tarea = asyncio.create_task(self.completar_cuando_esperen())
+        self.assertEqual(await anext(eventos), b'data: {"status": "completado"}\n\n')
+        await tarea
+        # Completado: el stream termina
+        with self.assertRaises(StopAsyncIteration):
+            await anext(eventos)
+
+    async def test_en_vivo_solo_por_asgi(self):
+        respuesta = await self.async_client.get(f'/api/pagos/estado/{self.pago.id}/', headers=self.cabeceras)
+        self.assertEqual(respuesta.json(), {'status': 'pendiente', 'en_vivo': True})
+
+    def test_por_wsgi_responden_sin_esperar(self):
+        # Por WSGI el stream se mandaría entero al final: un evento y se corta
+        respuesta = self.client.get(f'/api/pagos/estado/{self.pago.id}/eventos/', {'token': self.token})
+        self.assertEqual(respuesta['Content-Type'], 'text/event-stream')
+        self.assertEqual(respuesta.content, b'retry: 3000\ndata: {"status": "pendiente"}\n\n')
+
+        inicio = time.monotonic()
+        respuesta = self.client.get(f'/api/pagos/estado/{self.pago.id}/esperar/', headers=self.cabeceras)
+        self.assertEqual(respuesta.json(), {'status': 'pendiente'})
+        self.assertLess(time.monotonic() - inicio, 1)
+
+    @override_settings(NOTIFICADOR_BACKEND='seguros.notificaciones.NotificadorCache', NOTIFICADOR_INTERVALO=0.02)
+    async def test_notificador_cache_entre_workers(self):
+        # Dos instancias = dos workers que solo comparten la cache
+        aqui, otro_worker = notificaciones.notificador(), notificaciones.NotificadorCache()
+        with aqui.suscribir('pago:1') as suscripcion:
+            self.assertIsNone(await suscripcion.recibir(0.05))
+            await sync_to_async(otro_worker.publicar)('pago:1', 'completado')
+            self.assertEqual(await suscripcion.recibir(1), 'completado')
+            # El mismo aviso no se entrega dos veces
+            self.assertIsNone(await suscripcion.recibir(0.1))
+            aqui.publicar('pago:1', 'reembolsado')
+            self.assertEqual(await suscripcion.recibir(1), 'reembolsado')
+            self.assertIsNone(await suscripcion.recibir(0.1))
+
+
+@override_settings(BANCO_SECRETO='secreto-de-prueba', CONFIRMACIONES_EN_PROCESO=False)
+class ConfirmacionesPagoTests(TestCase):
+    def setUp(self):
+        caches['respuestas'].clear()
+        self.agente = crear_datos(3)
+        Poliza.objects.update(estado='pendiente_pago')
+        Pago.objects.update(estado='pendiente')
+        estadisticas.recalcular_agente(self.agente.id)
+        self.pagos = list(Pago.objects.order_by('id'))
+        self.banco = BancoFalso(enviar_local(), 'secreto-de-prueba')
+
+    def enviar(self, datos, firma=None):
+        cuerpo = json.dumps(datos).encode()
+        return APIClient().post('/api/pagos/confirmaciones/', cuerpo, content_type='application/json',
+                                headers={'X-Firma-Banco': firma or confirmaciones.firmar(cuerpo)})
+
+    def test_rafagas_con_reintentos_se_aplican_una_vez(self):
+        primero, segundo, tercero = self.pagos
+        pagos = [(primero.referencia_pago, primero.monto_pagado), (segundo.referencia_pago, None),
+                 (tercero.referencia_pago, Decimal('1.00')), ('QR-NOEXISTE', None)]
+        rafagas = self.banco.rafagas(pagos, por_rafaga=5, reintentos=2)
+        self.assertEqual(self.banco.reproducir(rafagas)['codigos'], {202: 12})
+        self.assertEqual(ConfirmacionPago.objects.count(), 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resumenes = confirmaciones.procesar_pendientes(tanda=3)
+        self.assertEqual([r['confirmaciones'] for r in resumenes], [3, 1])
+        self.assertEqual(sum(r['aplicadas'] for r in resumenes), 2)
+        self.assertEqual(sum(r['rechazadas'] for r in resumenes), 2)
+
+        self.assertEqual(
+            sorted(Pago.objects.values_list('estado', 'factura__estado', 'factura__poliza__estado')),
+            [('completado', 'pagada', 'activa')] * 2 + [('pendiente', 'pendiente', 'pendiente_pago')])
+        self.assertEqual(ConfirmacionPago.objects.get(referencia=tercero.referencia_pago).estado, 'rechazada')
+        self.assertEqual(EstadisticaAgente.objects.get(agente=self.agente).polizas_activas, 2)
+        self.assertEqual(estado_pagos.estado(primero.id), 'completado')
+
+        # Otra vez lo mismo: nada nuevo que guardar ni aplicar
+        self.assertEqual(self.banco.reproducir(rafagas)['codigos'], {202: 12})
+        self.assertEqual(ConfirmacionPago.objects.count(), 4)
+        self.assertEqual(confirmaciones.procesar_pendientes(), [])
+
+    def test_confirmacion_repetida_de_un_pago_ya_completado(self):
+        pago = self.pagos[0]
+        Pago.objects.filter(id=pago.id).update(estado='completado')
+        self.enviar({'confirmaciones': [{'referencia': pago.referencia_pago, 'monto': '1200'},
+                                        {'referencia': pago.referencia_pago, 'monto': '1200'}]})
+        resumen = confirmaciones.procesar_tanda()
+        self.assertEqual((resumen['aplicadas'], resumen['repetidas']), (0, 1))
+        self.assertEqual(Poliza.objects.filter(estado='activa').count(), 0)
+
+    def test_qr_entra_como_confirmacion(self):
+        pago = self.pagos[0]
+        # El webhook ya la recibió: escanear el QR no la duplica y se aplica una vez
+        self.enviar({'referencia': pago.referencia_pago})
+        for _ in range(2):
+            with self.captureOnCommitCallbacks(execute=True):
+                respuesta = APIClient().get(f'/api/pagos/simular-exito/{pago.id}/')
+            self.assertContains(respuesta, 'Pago Exitoso')
+        confirmacion = ConfirmacionPago.objects.get()
+        self.assertEqual((confirmacion.estado, confirmacion.pago_id), ('aplicada', pago.id))
+        self.assertEqual(Poliza.objects.filter(estado='activa').count(), 1)
+        self.assertEqual(EstadisticaAgente.objects.get(agente=self.agente).polizas_activas, 1)
+
+        # Con el monto cambiado después de emitir el QR no se aplica
+        otro = self.pagos[1]
+        ConfirmacionPago.objects.create(referencia=otro.referencia_pago, estado_banco='completado',
+                                        monto=Decimal('1.00'))
+        respuesta = APIClient().get(f'/api/pagos/simular-exito/{otro.id}/')
+        self.assertContains(respuesta, 'No se pudo confirmar')
+        self.assertEqual(Pago.objects.get(id=otro.id).estado, 'pendiente')
+
+    @override_settings(CONFIRMACIONES_SINCRONO=True)
+    def test_sincrono_y_aviso(self):
+        pago = self.pagos[0]
+        with mock.patch.object(notificaciones.Notificador, 'publicar') as publicar:
+            with self.captureOnCommitCallbacks(execute=True):
+                respuesta = self.enviar({'referencia': pago.referencia_pago, 'estado': 'fallido'})
+        self.assertEqual(respuesta.data, {'recibidas': 1, 'nuevas': 1, 'repetidas': 0})
+        publicar.assert_called_once_with(f'pago:{pago.id}', 'fallido')
+        pago.refresh_from_db()
+        self.assertEqual(pago.estado, 'fallido')
+
+    def test_firma_y_formato(self):
+        self.assertEqual(self.enviar({'referencia': 'X'}, firma='0' * 64).status_code, 403)
+        self.assertEqual(self.enviar({'referencia': ''}).status_code, 400)
+        self.assertEqual(self.enviar({'referencia': 'X', 'estado': 'quizas'}).status_code, 400)
+        self.assertEqual(self.enviar({'confirmaciones': []}).status_code, 400)
+        self.assertEqual(ConfirmacionPago.objects.count(), 0)
+        with self.settings(BANCO_SECRETO=None):
+            self.assertEqual(APIClient().post('/api/pagos/confirmaciones/', {}, format='json').status_code, 503)
+
+
+EXTRACTO_CSV = '''fecha;referencia;importe;glosa
+01/10/2026;REF-0;1.200,00;Prima octubre
+01/10/2026;REF-0;1.200,00;Prima octubre
+01/10/2026;REF-1;1.100,00;Prima octubre
+02/10/2026;TRX-77;1200.00;Pago factura fac-2
+02/10/2026;REF-999;50,00;Otra cosa
+02/10/2026;REF-3;abc;Monto roto
+'''
+
+EXTRACTO_CAMT = '''<?xml version="1.0" encoding="UTF-8"?>
+<Document xmlns="urn:iso:std:iso:20022:tech:xsd:camt.053.001.02"><BkToCstmrStmt><Stmt>
+<Ntry><Amt Ccy="BOB">1200.00</Amt><CdtDbtInd>CRDT</CdtDbtInd>
+<NtryDtls><TxDtls><Refs><EndToEndId>REF-3</EndToEndId></Refs></TxDtls></NtryDtls></Ntry>
+<Ntry><Amt Ccy="BOB">1200.00</Amt><CdtDbtInd>DBIT</CdtDbtInd>
+<NtryDtls><TxDtls><Refs><EndToEndId>REF-1</EndToEndId></Refs></TxDtls></NtryDtls></Ntry>
+</Stmt></BkToCstmrStmt></Document>
+'''
+
+
+class ConciliacionExtractoTests(TestCase):
+    def setUp(self):
+        caches['respuestas'].clear()
+        self.agente = crear_datos(4)
+        Poliza.objects.update(estado='pendiente_pago')
+        Pago.objects.update(estado='pendiente')
+        estadisticas.recalcular_agente(self.agente.id)
+        self.client = APIClient()
+
+    def conciliar(self, texto, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return conciliacion.conciliar(BytesIO(texto.encode()), **kwargs)
+
+    def test_concilia_por_referencia_y_por_factura(self):
+        resumen, diferencias = self.conciliar(EXTRACTO_CSV, tanda=1)
+        self.assertEqual((resumen['lineas'], resumen['conciliadas']), (6, 2))
+        self.assertEqual(sorted((d.linea, d.motivo) for d in diferencias), [
+            (3, 'duplicada'), (4, 'monto_distinto'), (6, 'sin_coincidencia'), (7, 'invalida')])
+
+        self.assertEqual(Pago.objects.get(referencia_pago='REF-0').estado, 'completado')
+        nuevo = Pago.objects.get(referencia_pago='TRX-77')
+        self.assertEqual((nuevo.estado, nuevo.factura.numero_factura), ('completado', 'FAC-2'))
+        self.assertEqual(
+            sorted(Factura.objects.values_list('numero_factura', 'estado', 'poliza__estado')),
+            [('FAC-0', 'pagada', 'activa'), ('FAC-1', 'pendiente', 'pendiente_pago'),
+             ('FAC-2', 'pagada', 'activa'), ('FAC-3', 'pendiente', 'pendiente_pago')])
+        self.assertEqual(EstadisticaAgente.objects.get(agente=self.agente).polizas_activas, 2)
+
+        # El mismo extracto otra vez no aplica nada
+        resumen, diferencias = self.conciliar(EXTRACTO_CSV)
+        self.assertEqual(resumen['conciliadas'], 0)
+        self.assertEqual(resumen['diferencias']['ya_conciliada'], 3)
+        self.assertEqual(Pago.objects.filter(estado='completado').count(), 2)
+
+    def test_camt_solo_abonos(self):
+        resumen, diferencias = self.conciliar(EXTRACTO_CAMT)
+        self.assertEqual((resumen['lineas'], resumen['conciliadas'], diferencias), (1, 1, []))
+        self.assertEqual(Pago.objects.get(referencia_pago='REF-3').estado, 'completado')
+        self.assertEqual(Pago.objects.get(referencia_pago='REF-1').estado, 'pendiente')
+
+    def test_extracto_sin_columnas(self):
+        with self.assertRaises(conciliacion.ExtractoInvalido):
+            self.conciliar('fecha;nombre\n01/10/2026;Ana\n')
+
+    def test_endpoint(self):
+        url = '/api/pagos/conciliacion/'
+        self.client.force_authenticate(Cliente.objects.first().usuario)
+        self.assertEqual(self.client.post(url, {}, format='multipart').status_code, 403)
+
+        self.client.force_authenticate(self.agente.usuario)
+        self.assertEqual(self.client.post(url, {}, format='multipart').status_code, 400)
+        archivo = BytesIO(EXTRACTO_CSV.encode())
+        archivo.name = 'extracto.csv'
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.post(url + '?reporte=csv', {'archivo': archivo}, format='multipart')
+        self.assertEqual(respuesta.status_code, 200)
+        filas = respuesta.content.decode().splitlines()
+        self.assertEqual(filas[0], 'linea,referencia,monto,motivo,detalle')
+        self.assertEqual(len(filas), 5)
+
+        archivo = BytesIO(b'<Document><Ntry>')
+        archivo.name = 'extracto.xml'
+        self.assertEqual(self.client.post(url, {'archivo': archivo}, format='multipart').status_code, 400)
+        archivo = BytesIO(EXTRACTO_CSV.encode())
+        archivo.name = 'extracto.csv'
+        respuesta = self.client.post(url, {'archivo': archivo}, format='multipart')
+        self.assertEqual(respuesta.data['resumen']['diferencias']['ya_conciliada'], 3)
+
+    def test_agente_solo_concilia_lo_suyo(self):
+        otro = crear_datos(0)
+        Poliza.objects.filter(numero_poliza='POL-0').update(agente=otro)
+        self.client.force_authenticate(otro.usuario)
+        archivo = BytesIO(EXTRACTO_CSV.encode())
+        archivo.name = 'extracto.csv'
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = self.client.post('/api/pagos/conciliacion/', {'archivo': archivo}, format='multipart')
+        # Solo REF-0 es de sus pólizas; el pago por FAC-2 es de otro agente
+        self.assertEqual(respuesta.data['resumen']['conciliadas'], 1)
+        self.assertEqual(Pago.objects.get(referencia_pago='REF-0').estado, 'completado')
+        self.assertFalse(Pago.objects.filter(referencia_pago='TRX-77').exists())
+
+
+class FacturacionMensualTests(TestCase):
+    def setUp(self):
+        crear_datos(3)
+        self.polizas = list(Poliza.objects.order_by('id'))
+        Poliza.objects.filter(id=self.polizas[1].id).update(prima_mensual=0)
+        Poliza.objects.filter(id=self.polizas[2].id).update(estado='inactiva')
+        # El mes de emisión ya lo cubre la factura de la prima anual: se factura el siguiente
+        self.periodo = (date.today().replace(day=1) + timedelta(days=32)).replace(day=1)
+
+    def test_factura_el_mes_una_sola_vez(self):
+        resumen = facturacion.facturar_periodo(self.periodo, tanda=1)
+        self.assertEqual((resumen['polizas'], resumen['facturas'], resumen['omitidas']), (2, 2, 0))
+        facturas = Factura.objects.filter(periodo=self.periodo).order_by('poliza_id')
+        self.assertEqual(
+            [(f.poliza_id, f.monto, f.estado) for f in facturas],
+            [(self.polizas[0].id, Decimal('100.00'), 'pendiente'), (self.polizas[1].id, Decimal('100.00'), 'pendiente')])
+        self.assertEqual(facturas[0].numero_factura, f'FAC-{self.periodo:%Y%m}-{self.polizas[0].id:07d}')
+        corrida = CorridaFacturacion.objects.get(periodo=self.periodo)
+        self.assertEqual((corrida.estado, corrida.facturas, corrida.ultima_poliza),
+                         ('terminada', 2, self.polizas[1].id))
+
+        # Otra vez, y revisando todo desde cero: nada nuevo
+        self.assertEqual(facturacion.facturar_periodo(self.periodo)['facturas'], 0)
+        resumen = facturacion.facturar_periodo(self.periodo, desde_cero=True)
+        self.assertEqual((resumen['polizas'], resumen['facturas']), (2, 0))
+        self.assertEqual(Factura.objects.filter(periodo=self.periodo).count(), 2)
+
+    def test_sigue_donde_quedo(self):
+        original = Factura.objects.bulk_create
+        llamadas = []
+
+        def cortar_en_la_segunda(*args, **kwargs):
+            llamadas.append(1)
+            if len(llamadas) == 2:
+                raise RuntimeError('se cortó')
+            return original(*args, **kwargs)
+
+        with mock.patch.object(Factura.objects, 'bulk_create', side_effect=cortar_en_la_segunda):
+            with self.assertRaises(RuntimeError):
+                facturacion.facturar_periodo(self.periodo, tanda=1)
+        corrida = CorridaFacturacion.objects.get(periodo=self.periodo)
+        self.assertEqual((corrida.estado, corrida.ultima_poliza, corrida.facturas), ('en_curso', self.polizas[0].id, 1))
+        self.assertEqual(Factura.objects.filter(periodo=self.periodo).count(), 1)
+
+        resumen = facturacion.facturar_periodo(self.periodo, tanda=1)
+        self.assertEqual((resumen['reanudada_desde'], resumen['polizas'], resumen['facturas']),
+                         (self.polizas[0].id, 1, 1))
+        self.assertEqual(CorridaFacturacion.objects.get(periodo=self.periodo).facturas, 2)
+
+    def test_comando(self):
+        salida = StringIO()
+        call_command('facturar_mes', periodo=f'{self.periodo:%Y-%m}', stdout=salida)
+        self.assertIn('2 facturas nuevas de 2 pólizas', salida.getvalue())
+
+    def test_el_mes_de_emision_no_se_vuelve_a_facturar(self):
+        agente = self.polizas[0].agente
+        cliente = APIClient()
+        cliente.force_authenticate(agente.usuario)
+        for pago_inmediato in (True, False):
+            respuesta = cliente.post('/api/polizas/', {
+                'cliente': self.polizas[0].cliente_id, 'suma_asegurada': '5000.00', 'prima_anual': '600.00',
+                'fecha_inicio': date.today(), 'fecha_vencimiento': date.today() + timedelta(days=365),
+                'beneficiarios': [], 'pago_inmediato': pago_inmediato,
+            }, format='json')
+            self.assertEqual(respuesta.status_code, 201, respuesta.data)
+        nuevas = Poliza.objects.filter(id__gt=self.polizas[-1].id)
+        Poliza.objects.filter(id__in=nuevas).update(estado='activa')
+        self.assertEqual(Factura.objects.filter(poliza__in=nuevas, periodo=date.today().replace(day=1)).count(), 2)
+
+        # Emitidas este mes, con la factura de emisión con o sin periodo (las de antes)
+        Factura.objects.filter(poliza=self.polizas[0]).update(periodo=None)
+        resumen = facturacion.facturar_periodo(date.today())
+        self.assertEqual((resumen['polizas'], resumen['facturas']), (4, 0))
+
+
+@override_settings(NUMERACION_BLOQUE=5)
+class NumeracionTests(TestCase):
+    def setUp(self):
+        numeracion._local.__dict__.clear()
+
+    def test_numeros_seguidos_y_sin_consultas_dentro_del_bloque(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(numeracion.siguiente('poliza'), 'POL-100000')
+        with self.assertNumQueries(0):
+            numeros = [numeracion.siguiente('poliza') for _ in range(4)]
+        self.assertEqual(numeros, ['POL-100001', 'POL-100002', 'POL-100003', 'POL-100004'])
+        # Se acabó el bloque: otra reserva
+        self.assertEqual(numeracion.siguiente('poliza'), 'POL-100005')
+        self.assertEqual(numeracion.siguiente('factura'), 'FAC-100000')
+
+    def test_bloque_de_una_transaccion_deshecha_no_se_reutiliza(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                self.assertEqual(numeracion.siguiente('siniestro'), 'SIN-100000')
+                raise RuntimeError('falla el INSERT')
+        # Otro worker toma el bloque que se liberó con el ROLLBACK
+        otro = list(numeracion._reservar('siniestro', 5).numeros)
+        self.assertEqual(otro[0], 100000)
+        self.assertNotIn(int(numeracion.siguiente('siniestro')[4:]), otro)
+
+    @override_settings(NUMERACION={'solicitud': 'SOL-{anio}{mes:02d}-{numero:07d}'})
+    def test_formato_configurable(self):
+        hoy = timezone.localdate()
+        self.assertEqual(numeracion.siguiente('solicitud'), f'SOL-{hoy:%Y%m}-0100000')
+        with self.assertRaises(numeracion.TipoDesconocido):
+            numeracion.siguiente('recibo')
+
+
+class CicloVidaTests(TestCase):
+    def setUp(self):
+        caches['respuestas'].clear()
+        self.agente = crear_datos(3)
+        self.polizas = list(Poliza.objects.order_by('id'))
+        ayer = date.today() - timedelta(days=1)
+        Poliza.objects.filter(id=self.polizas[0].id).update(fecha_vencimiento=ayer)
+        Poliza.objects.filter(id=self.polizas[1].id).update(fecha_vencimiento=ayer, estado='pendiente_pago')
+        Factura.objects.filter(poliza=self.polizas[0]).update(fecha_vencimiento=ayer)
+        estadisticas.recalcular_agente(self.agente.id)
+        self.transiciones = []
+
+    def test_barrido_de_vencimientos(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            resumen = ciclo_vida.barrer(tanda=1, registrar=self.transiciones.extend)
+        self.assertEqual(resumen['transiciones'], {
+            'poliza:activa->vencida': 1, 'poliza:pendiente_pago->vencida': 1, 'factura:pendiente->vencida': 1})
+        self.assertEqual(sorted(Poliza.objects.values_list('id', 'estado')), [
+            (self.polizas[0].id, 'vencida'), (self.polizas[1].id, 'vencida'), (self.polizas[2].id, 'activa')])
+        self.assertEqual(Factura.objects.get(poliza=self.polizas[0]).estado, 'vencida')
+        self.assertEqual(self.transiciones[0], ciclo_vida.Transicion(
+            'poliza', self.polizas[0].id, 'activa', 'vencida', 'vencimiento'))
+        self.assertEqual(len(self.transiciones), 3)
+        self.assertEqual(EstadisticaAgente.objects.get(agente=self.agente).polizas_activas, 1)
+        self.assertGreater(Poliza.objects.get(id=self.polizas[0].id).actualizado_en, self.polizas[0].actualizado_en)
+
+        # Ya no queda nada vencido
+        self.assertEqual(ciclo_vida.barrer(registrar=self.transiciones.extend)['filas'], 0)
+        self.assertEqual(len(self.transiciones), 3)
+
+    def test_baja_del_cliente_en_bloque(self):
+        admin = Usuario.objects.create_user(username='admin-ciclo', rol='ADMIN', is_staff=True)
+        cliente = self.polizas[2].cliente
+        client = APIClient()
+        client.force_authenticate(admin)
+        respuesta = client.patch(f'/api/clientes/{cliente.id}/toggle-estado/', {'is_active': False}, format='json')
+        self.assertEqual(respuesta.data['mensaje'], 'Cliente desactivado y 1 pólizas inactivadas.')
+        self.assertEqual(Poliza.objects.get(id=self.polizas[2].id).estado, 'inactiva')
+        self.assertEqual(EstadisticaAgente.objects.get(agente=self.agente).polizas_activas, 1)
+
+    def test_comando_con_auditoria(self):
+        salida, errores = StringIO(), StringIO()
+        call_command('barrer_ciclo_vida', auditoria='-', stdout=salida, stderr=errores)
+        lineas = [json.loads(linea) for linea in salida.getvalue().splitlines()]
+        self.assertEqual([(l['modelo'], l['antes']) for l in lineas],
+                         [('poliza', 'activa'), ('poliza', 'pendiente_pago'), ('factura', 'pendiente')])
+        self.assertIn('3 cambios', errores.getvalue())
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ImportacionUsuariosTests(TestCase):
+    CLIENTES = (
+        'username;password;first_name;last_name;email;fecha_nacimiento;direccion;identificacion;agente\n'
+        'ana;secreta123;Ana;Gómez;ana@correo.com;1990-05-01;Calle 1;CI-100;{agente}\n'
+        'beto;;Beto;Ruiz;;1985-02-03;Calle 2;CI-101;\n'
+        'ana;otra;Ana;Otra;;1990-05-01;Calle 3;CI-102;\n'
+        'existente;;;;;1990-05-01;Calle 4;CI-103;\n'
+        'carla;;;;no-es-correo;1990-13-01;Calle 5;CI-104;\n'
+        'dani;;;;;1991-01-01;Calle 6;CI-105;AG-NO-EXISTE\n'
+    )
+
+    def setUp(self):
+        self.agente = crear_datos(0)
+        Usuario.objects.create_user(username='existente')
+
+    def importar(self, texto, tipo='cliente', **opciones):
+        return importacion.importar(BytesIO(texto.encode()), tipo, **opciones)
+
+    def test_clientes_desde_csv(self):
+        resumen, errores = self.importar(self.CLIENTES.format(agente=self.agente.codigo_agente), procesos=1, tanda=2)
+        self.assertEqual((resumen['filas'], resumen['creados'], resumen['errores']), (6, 2, 4))
+        self.assertEqual([(e.linea, e.username, e.campo) for e in errores], [
+            (4, 'ana', 'username'), (5, 'existente', 'username'), (6, 'carla', 'email'),
+            (6, 'carla', 'fecha_nacimiento'), (7, 'dani', 'agente')])
+
+        ana = Cliente.objects.select_related('usuario').get(usuario__username='ana')
+        self.assertTrue(ana.usuario.check_password('secreta123'))
+        self.assertEqual((ana.usuario.rol, ana.agente_id, ana.identificacion), ('CLIENTE', self.agente.id, 'CI-100'))
+        self.assertIn('gomez', ana.busqueda)
+        self.assertFalse(Usuario.objects.get(username='beto').has_usable_password())
+        self.assertEqual(EstadisticaAgente.objects.get(agente=self.agente).total_clientes, 1)
+
+    def test_agentes_desde_jsonl_con_pool(self):
+        lineas = [json.dumps({'username': f'ag{i}', 'password': f'clave-{i}', 'codigo_agente': f'AG-X{i}',
+                              'fecha_contratacion': '2024-03-01'}) for i in range(5)]
+        lineas.insert(2, '{esto no es json')
+        # Como el comando: fork hereda los PASSWORD_HASHERS de la prueba
+        resumen, errores = self.importar('\n'.join(lineas), 'agente', procesos=2, tanda=2, fork=True)
+        self.assertEqual((resumen['filas'], resumen['creados'], resumen['procesos']), (6, 5, 2))
+        self.assertEqual([(e.linea, e.campo) for e in errores], [(3, '')])
+        agente = Agente.objects.select_related('usuario').get(codigo_agente='AG-X4')
+        self.assertTrue(agente.usuario.check_password('clave-4'))
+        self.assertEqual(agente.usuario.rol, 'AGENTE')
+        self.assertTrue(EstadisticaAgente.objects.filter(agente=agente).exists())
+
+    def test_csv_sin_username(self):
+        with self.assertRaises(importacion.ArchivoInvalido):
+            self.importar('nombre,identificacion\nAna,CI-1\n')
+
+    def test_endpoint(self):
+        archivo = self.CLIENTES.format(agente='').encode()
+        client = APIClient()
+        client.force_authenticate(self.agente.usuario)
+        respuesta = client.post('/api/usuarios/importar/', {'archivo': BytesIO(archivo)}, format='multipart')
+        self.assertEqual(respuesta.status_code, 403)
+
+        client.force_authenticate(Usuario.objects.create_user(username='admin', rol='ADMIN', is_staff=True))
+        respuesta = client.post('/api/usuarios/importar/', {'archivo': BytesIO(archivo)}, format='multipart')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.data['resumen']['creados'], 2)
+        # En el mismo worker: sin pool de procesos
+        self.assertEqual(respuesta.data['resumen']['procesos'], 1)
+        self.assertEqual(respuesta.data['errores'][0], {
+            'linea': 4, 'username': 'ana', 'campo': 'username', 'mensaje': 'Repetido en el archivo'})
+
+        # Ya importados: ahora todas fallan, y el reporte sale en CSV
+        respuesta = client.post('/api/usuarios/importar/?reporte=csv', {'archivo': BytesIO(archivo)}, format='multipart')
+        self.assertEqual(respuesta['Content-Type'], 'text/csv; charset=utf-8')
+        lineas = respuesta.content.decode().splitlines()
+        self.assertEqual(lineas[0], 'linea,username,campo,mensaje')
+        self.assertEqual(len(lineas), 1 + 7)
+
+    def test_comando(self):
+        with tempfile.TemporaryDirectory() as carpeta:
+            origen, reporte = os.path.join(carpeta, 'clientes.csv'), os.path.join(carpeta, 'errores.csv')
+            with open(origen, 'w', encoding='utf-8') as archivo:
+                archivo.write(self.CLIENTES.format(agente=''))
+            salida = StringIO()
+            call_command('importar_usuarios', origen, procesos=1, reporte=reporte, stdout=salida)
+            self.assertIn('2 clientes creados de 6 filas, 4 con errores', salida.getvalue())
+            with open(reporte, encoding='utf-8') as archivo:
+                self.assertEqual(len(archivo.read().splitlines()), 1 + 5)
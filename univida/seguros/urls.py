@@ -1,5 +1,5 @@
 # En seguros/urls.py - VERSIÓN CORREGIDA
-from django.urls import path
+from django.urls import path, re_path
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from . import views
 
@@ -7,6 +7,7 @@ urlpatterns = [
     # APIs para Clientes
     path('clientes/', views.lista_clientes, name='lista_clientes'),
     path('clientes/crear/', views.crear_cliente, name='crear_cliente'),
+    path('clientes/buscar/', views.buscar_clientes, name='buscar_clientes'),
     path('clientes/<int:cliente_id>/', views.detalle_cliente, name='detalle_cliente'),
     path('clientes/<int:cliente_id>/editar/', views.editar_cliente, name='editar_cliente'),
     path('clientes/<int:cliente_id>/eliminar/', views.eliminar_cliente, name='eliminar_cliente'),
@@ -37,9 +38,12 @@ urlpatterns = [
     path('beneficiarios/agregar/', views.agregar_beneficiario, name='agregar_beneficiario'),
     path('beneficiarios/<int:beneficiario_id>/eliminar/', views.eliminar_beneficiario, name='eliminar_beneficiario'),
     path('agente/dashboard-stats/', views.agente_dashboard_stats, name='agente_dashboard_stats'),
+    path('admin/dashboard-stats/', views.admin_dashboard_stats, name='admin_dashboard_stats'),
+    path('admin/cache-stats/', views.estadisticas_cache, name='estadisticas_cache'),
     
     #API PARA ACTIVAR/INACTIVAR CLIENTES DESDE AGENTE
     path('clientes/<int:cliente_id>/toggle-estado/', views.toggle_estado_cliente, name='toggle_estado_cliente'),
+    path('usuarios/importar/', views.importar_usuarios, name='importar_usuarios'),
 
     # APIs para Facturas y Pagos
     path('facturas/', views.lista_facturas, name='lista_facturas'),
@@ -60,11 +64,19 @@ urlpatterns = [
 
     # Ruta para generación de PDF de póliza
     path('polizas/<int:poliza_id>/pdf/', views.generar_pdf_poliza, name='generar_pdf_poliza'),
+    path('polizas/<int:poliza_id>/pdf/trabajo/', views.crear_trabajo_pdf, name='crear_trabajo_pdf'),
+    path('documentos/trabajos/<uuid:trabajo_id>/', views.estado_trabajo_pdf, name='estado_trabajo_pdf'),
+    path('documentos/trabajos/<uuid:trabajo_id>/descargar/', views.descargar_trabajo_pdf, name='descargar_trabajo_pdf'),
 
     # RUTAS PARA FACTURAS Y PAGOS
     path('facturas/', views.lista_facturas, name='lista_facturas'),
     path('pagos/', views.lista_pagos, name='lista_pagos'),
     path('pagos/iniciar-qr/', views.iniciar_pago_qr, name='iniciar_pago_qr'),
+    re_path(r'^pagos/qr/(?P<referencia>[\w-]+)\.(?P<formato>svg|png)$', views.imagen_qr_pago, name='imagen_qr_pago'),
     path('pagos/estado/<int:pago_id>/', views.verificar_estado_pago, name='verificar_estado_pago'),
+    path('pagos/estado/<int:pago_id>/esperar/', views.esperar_estado_pago, name='esperar_estado_pago'),
+    path('pagos/estado/<int:pago_id>/eventos/', views.eventos_estado_pago, name='eventos_estado_pago'),
+    path('pagos/conciliacion/', views.conciliar_extracto, name='conciliar_extracto'),
+    path('pagos/confirmaciones/', views.recibir_confirmaciones_pago, name='recibir_confirmaciones_pago'),
     path('pagos/simular-exito/<int:pago_id>/', views.simular_pago_exitoso, name='simular_pago_exitoso'),
 ]
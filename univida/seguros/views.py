@@ -1,32 +1,35 @@
 # en seguros/views.py - VERSIÓN MERGED
 
-from django.http import HttpResponse
-from django.template.loader import get_template
-from xhtml2pdf import pisa
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+import json
+import time
+import xml.etree.ElementTree as ET
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.http import quote_etag
+from django.views.decorators.http import require_GET
 from rest_framework import status
 from rest_framework.response import Response
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
 from django.utils import timezone
 from datetime import date, timedelta
 from decimal import Decimal
 from django.db import transaction 
-from django.db.models import Sum, Count
-import random
+from django.db.models import Sum, Count, OuterRef, Subquery
 from datetime import date
 from django.db.models import Q
-import qrcode
-import base64
-from io import BytesIO
 from django.http import JsonResponse
 from datetime import timedelta
 
-import random
 # Modelos
 from .models import (
     Cliente, Poliza, Beneficiario, Agente, Factura, Pago,
-    Siniestro, NotaPoliza, Usuario
+    Siniestro, NotaPoliza, Usuario, EstadisticaAgente, EstadisticaAgenteMes, TrabajoDocumento,
+    ConfirmacionPago
 )
 
 # Serializers
@@ -36,7 +39,34 @@ from .serializers import (
     UsuarioAgenteSerializer, SiniestroSerializer, CrearSiniestroSerializer, ActualizarSiniestroSerializer,
     NotaPolizaSerializer, CrearNotaPolizaSerializer, CrearClienteSerializer,
     EditarClienteSerializer, AgenteSerializer, EditarPerfilClienteSerializer, EditarPerfilAgenteSerializer,
-    SolicitarPolizaSerializer, BeneficiarioInputSerializer, AgenteEditarClienteSerializer
+    SolicitarPolizaSerializer, BeneficiarioInputSerializer, AgenteEditarClienteSerializer,
+    opciones_de_campos
+)
+from .consultas import precargar
+from .paginacion import PaginacionCursor
+from . import lectura_rapida
+from . import estadisticas
+from . import busqueda
+from .cache_respuestas import depende_de, en_cache, etiquetas_poliza
+from .autenticacion import perfil_de, usuario_de
+from .condicional import (
+    condicional, no_modificado, validadores_poliza, validadores_siniestro, validadores_cliente
+)
+from . import cache_respuestas
+from . import documentos
+from . import firma
+from . import codigos_qr
+from . import estado_pagos
+from . import confirmaciones
+from . import facturacion
+from . import conciliacion
+from . import numeracion
+from . import ciclo_vida
+from . import importacion
+from .notificaciones import canal_pago, notificador
+from .filtros import (
+    FILTROS_CLIENTE, FILTROS_POLIZA, FILTROS_FACTURA, FILTROS_PAGO, FILTROS_SINIESTRO,
+    FILTROS_BENEFICIARIO, FILTROS_NOTA
 )
 
 # API para Clientes
@@ -46,13 +76,22 @@ def lista_clientes(request):
     # --- VER LISTA (GET) ---
     if request.method == 'GET':
         # Si es AGENTE, solo ve sus propios clientes
-        if hasattr(request.user, 'agente'):
-            clientes = Cliente.objects.filter(agente=request.user.agente)
+        perfil = perfil_de(request)
+        if perfil.es_agente:
+            clientes = Cliente.objects.filter(agente_id=perfil.agente_id)
         else:
             # Si es Admin, ve todos
             clientes = Cliente.objects.all()
-            
-        serializer = ClienteSerializer(clientes, many=True)
+
+        clientes = FILTROS_CLIENTE.aplicar(clientes, request)
+        opciones = opciones_de_campos(request)
+        clientes = precargar(clientes, ClienteSerializer(**opciones))
+        paginador = PaginacionCursor(ordering=FILTROS_CLIENTE.ordenar(request, ('-id',)))
+        pagina = paginador.paginate_queryset(clientes, request)
+        if pagina is not None:
+            return paginador.get_paginated_response(ClienteSerializer(pagina, many=True, **opciones).data)
+
+        serializer = ClienteSerializer(clientes, many=True, **opciones)
         return Response(serializer.data)
     
     # --- CREAR CLIENTE (POST) ---
@@ -66,6 +105,30 @@ def lista_clientes(request):
             
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+
+# en seguros/views.py
+#BUSCADOR DE CLIENTES (NOMBRE, IDENTIFICACIÓN O EMAIL, TOLERA ERRORES DE TIPEO)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def buscar_clientes(request):
+    perfil = perfil_de(request)
+    if perfil.es_agente:
+        clientes = Cliente.objects.filter(agente_id=perfil.agente_id)
+    elif perfil.es_admin or perfil.es_staff:
+        clientes = Cliente.objects.all()
+    else:
+        return Response({'error': 'No autorizado'}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        limite = min(int(request.query_params.get('limite', 20)), 100)
+    except ValueError:
+        return Response({'limite': 'Debe ser un número'}, status=status.HTTP_400_BAD_REQUEST)
+
+    opciones = opciones_de_campos(request)
+    clientes = precargar(clientes, ClienteSerializer(**opciones))
+    resultados = busqueda.buscar_clientes(clientes, request.query_params.get('q', ''), max(limite, 1))
+    return Response(ClienteSerializer(resultados, many=True, **opciones).data)
+
 # API para Pólizas
 
 # en seguros/views.py
@@ -78,18 +141,27 @@ def lista_polizas(request):
     if request.method == 'GET':
         
         # Filtro para AGENTES
-        if hasattr(request.user, 'agente'):
+        perfil = perfil_de(request)
+        if perfil.es_agente:
             # Ve sus propias pólizas O las solicitudes huérfanas (cotizaciones sin agente)
             polizas = Poliza.objects.filter(
-                Q(agente=request.user.agente) | 
+                Q(agente_id=perfil.agente_id) | 
                 (Q(estado='cotizacion') & Q(agente__isnull=True))
             ).order_by('-id')
         else:
             # Admin ve todo
             polizas = Poliza.objects.all().order_by('-id')
 
-        serializer = PolizaSerializer(polizas, many=True)
-        return Response(serializer.data)
+        polizas = FILTROS_POLIZA.aplicar(polizas, request)
+        opciones = opciones_de_campos(request)
+        polizas = precargar(polizas, PolizaSerializer(**opciones))
+        paginador = PaginacionCursor(ordering=FILTROS_POLIZA.ordenar(request, ('-id',)))
+        pagina = paginador.paginate_queryset(polizas, request)
+        if pagina is not None:
+            return paginador.get_paginated_response(PolizaSerializer(pagina, many=True, **opciones).data)
+
+        # Lista completa: lectura rápida con values(), misma salida que PolizaSerializer
+        return Response(lectura_rapida.leer(polizas, PolizaSerializer(**opciones)))
     
     # --- POST: CREAR ---
     elif request.method == 'POST':
@@ -99,7 +171,7 @@ def lista_polizas(request):
             try:
                 with transaction.atomic():
                     # 1. Generar Número y Guardar Póliza Base
-                    numero_gen = f"POL-{random.randint(10000, 99999)}"
+                    numero_gen = numeracion.siguiente('poliza')
                     tipo_seguro = request.data.get('tipo_seguro', 'Plan General')
                     info_extra = f"Plan: {tipo_seguro}. Emitido por Agente."
 
@@ -109,8 +181,9 @@ def lista_polizas(request):
                     )
                     
                     # Asignar Agente (siempre que lo crea un agente)
-                    if hasattr(request.user, 'agente'):
-                        poliza.agente = request.user.agente
+                    perfil = perfil_de(request)
+                    if perfil.es_agente:
+                        poliza.agente = perfil.agente
 
                     # 2. Verificar si es PAGO INMEDIATO
                     if request.data.get('pago_inmediato') is True:
@@ -119,9 +192,10 @@ def lista_polizas(request):
                         # Crear Factura PAGADA
                         factura = Factura.objects.create(
                             poliza=poliza,
-                            numero_factura=f"FAC-{random.randint(10000, 99999)}",
+                            numero_factura=numeracion.siguiente('factura'),
                             monto=poliza.prima_anual, 
                             fecha_emision=date.today(),
+                            periodo=facturacion.periodo_de(date.today()),  # cubre el mes: facturar_periodo no la repite
                             fecha_vencimiento=date.today(),
                             estado='pagada',
                             concepto=f"Pago inicial póliza {poliza.numero_poliza}"
@@ -144,9 +218,10 @@ def lista_polizas(request):
                         # Crear Factura PENDIENTE
                         Factura.objects.create(
                             poliza=poliza,
-                            numero_factura=f"FAC-{random.randint(10000, 99999)}",
+                            numero_factura=numeracion.siguiente('factura'),
                             monto=poliza.prima_anual, 
                             fecha_emision=date.today(),
+                            periodo=facturacion.periodo_de(date.today()),
                             fecha_vencimiento=date.today() + timedelta(days=30), # 30 días para pagar
                             estado='pendiente',
                             concepto=f"Primera prima póliza {poliza.numero_poliza}"
@@ -184,9 +259,10 @@ def crear_poliza(request): # O la vista que usas para POST /api/polizas/
                     # A. Generar Factura
                     factura = Factura.objects.create(
                         poliza=poliza,
-                        numero_factura=f"FAC-{random.randint(10000, 99999)}",
+                        numero_factura=numeracion.siguiente('factura'),
                         monto=poliza.prima_anual, 
                         fecha_emision=date.today(),
+                        periodo=facturacion.periodo_de(date.today()),
                         fecha_vencimiento=date.today(),
                         estado='pagada', # Ya nace pagada
                         concepto=f"Pago inicial póliza {poliza.numero_poliza}"
@@ -222,7 +298,15 @@ def crear_poliza(request): # O la vista que usas para POST /api/polizas/
 @permission_classes([IsAuthenticated])
 def lista_beneficiarios(request):
     beneficiarios = Beneficiario.objects.all()
-    serializer = BeneficiarioSerializer(beneficiarios, many=True)
+    beneficiarios = FILTROS_BENEFICIARIO.aplicar(beneficiarios, request)
+    opciones = opciones_de_campos(request)
+    beneficiarios = precargar(beneficiarios, BeneficiarioSerializer(**opciones))
+    paginador = PaginacionCursor(ordering=FILTROS_BENEFICIARIO.ordenar(request, ('-id',)))
+    pagina = paginador.paginate_queryset(beneficiarios, request)
+    if pagina is not None:
+        return paginador.get_paginated_response(BeneficiarioSerializer(pagina, many=True, **opciones).data)
+
+    serializer = BeneficiarioSerializer(beneficiarios, many=True, **opciones)
     return Response(serializer.data)
 
 # en seguros/views.py
@@ -241,7 +325,7 @@ def agregar_beneficiario(request):
         return Response({'error': 'Póliza no encontrada'}, status=404)
 
     # (Opcional) Validar que el usuario sea el Agente de esa póliza o un Admin
-    if request.user.rol == 'AGENTE' and poliza.agente.usuario != request.user:
+    if request.user.rol == 'AGENTE' and poliza.agente_id != perfil_de(request).agente_id:
         return Response({'error': 'No tienes permiso'}, status=403)
 
     serializer = BeneficiarioSerializer(data=request.data)
@@ -266,15 +350,19 @@ def eliminar_beneficiario(request, beneficiario_id):
 # API para una póliza específica
 @api_view(['GET', 'PUT', 'PATCH'])
 @permission_classes([IsAuthenticated])
+@en_cache(alcance='usuario')
+@condicional(validadores_poliza)
 def detalle_poliza(request, poliza_id):
+    opciones = opciones_de_campos(request)
     try:
-        poliza = Poliza.objects.get(id=poliza_id)
+        poliza = precargar(Poliza.objects.all(), PolizaSerializer(**opciones)).get(id=poliza_id)
     except Poliza.DoesNotExist:
         return Response({'error': 'Póliza no encontrada'}, status=404)
 
     # --- VER (GET) ---
     if request.method == 'GET':
-        serializer = PolizaSerializer(poliza)
+        depende_de(request, *etiquetas_poliza(poliza))
+        serializer = PolizaSerializer(poliza, **opciones)
         return Response(serializer.data)
 
     # --- EDITAR / ASIGNAR (PATCH) ---
@@ -292,12 +380,13 @@ def detalle_poliza(request, poliza_id):
                     agente_asignado = None
 
                     # CASO 1: Es ADMIN asignando a alguien
-                    if request.user.rol == 'ADMIN' and nuevo_agente_id:
+                    perfil = perfil_de(request)
+                    if perfil.es_admin and nuevo_agente_id:
                         agente_asignado = Agente.objects.get(id=nuevo_agente_id)
                     
                     # CASO 2: Es AGENTE auto-asignándose
-                    elif hasattr(request.user, 'agente'):
-                        agente_asignado = request.user.agente
+                    elif perfil.es_agente:
+                        agente_asignado = perfil.agente
 
                     if agente_asignado:
                         # 1. Asignar Póliza
@@ -311,9 +400,10 @@ def detalle_poliza(request, poliza_id):
                         # 3. Generar Factura
                         Factura.objects.create(
                             poliza=poliza,
-                            numero_factura=f"FAC-{random.randint(10000, 99999)}",
+                            numero_factura=numeracion.siguiente('factura'),
                             monto=poliza.prima_anual, 
                             fecha_emision=date.today(),
+                            periodo=facturacion.periodo_de(date.today()),
                             fecha_vencimiento=date.today() + timedelta(days=15),
                             estado='pendiente',
                             concepto=f"Primera prima póliza {poliza.numero_poliza}"
@@ -341,34 +431,35 @@ def lista_facturas(request):
         queryset = Factura.objects.all().order_by('fecha_vencimiento')
         
         # --- FILTROS DE SEGURIDAD POR ROL ---
-        if request.user.rol == 'AGENTE':
+        perfil = perfil_de(request)
+        if perfil.rol == 'AGENTE':
             # El Agente solo ve facturas de SUS pólizas
-            if hasattr(request.user, 'agente'):
-                queryset = queryset.filter(poliza__agente=request.user.agente)
+            if perfil.es_agente:
+                queryset = queryset.filter(poliza__agente_id=perfil.agente_id)
             else:
                 queryset = queryset.none() # Si es agente pero no tiene perfil, no ve nada
 
-        elif request.user.rol == 'CLIENTE':
+        elif perfil.rol == 'CLIENTE':
             # El Cliente solo ve SUS propias facturas
-            if hasattr(request.user, 'cliente'):
-                queryset = queryset.filter(poliza__cliente__usuario=request.user)
+            if perfil.es_cliente:
+                queryset = queryset.filter(poliza__cliente_id=perfil.cliente_id)
             else:
                 queryset = queryset.none()
         
         # (Si es ADMIN, ve todo, así que no filtramos nada extra)
         # ------------------------------------
 
-        # Filtros adicionales de la URL (para el buscador del frontend)
-        poliza_id = request.query_params.get('poliza_id')
-        estado = request.query_params.get('estado')
-        
-        if poliza_id:
-            queryset = queryset.filter(poliza_id=poliza_id)
-        if estado:
-            queryset = queryset.filter(estado=estado)
-            
-        serializer = FacturaSerializer(queryset, many=True)
-        return Response(serializer.data)
+        # Filtros adicionales de la URL (poliza_id, estado, fechas, montos...)
+        queryset = FILTROS_FACTURA.aplicar(queryset, request)
+        opciones = opciones_de_campos(request)
+        queryset = precargar(queryset, FacturaSerializer(**opciones))
+        paginador = PaginacionCursor(ordering=FILTROS_FACTURA.ordenar(request, ('fecha_vencimiento',)))
+        pagina = paginador.paginate_queryset(queryset, request)
+        if pagina is not None:
+            return paginador.get_paginated_response(FacturaSerializer(pagina, many=True, **opciones).data)
+
+        # Lista completa: lectura rápida con values(), misma salida que FacturaSerializer
+        return Response(lectura_rapida.leer(queryset, FacturaSerializer(**opciones)))
     
     elif request.method == 'POST':
         # (Tu código de crear factura sigue igual)
@@ -392,10 +483,20 @@ def lista_pagos(request):
         
         # Si es CLIENTE, solo ve sus propios pagos
         elif request.user.rol == 'CLIENTE':
-            # Filtramos pagos donde la factura -> poliza -> cliente -> usuario sea el actual
-            pagos = Pago.objects.filter(factura__poliza__cliente__usuario=request.user)
-            
-        serializer = PagoSerializer(pagos, many=True)
+            # Filtramos pagos donde la factura -> poliza -> cliente sea el del usuario actual
+            perfil = perfil_de(request)
+            pagos = (Pago.objects.filter(factura__poliza__cliente_id=perfil.cliente_id)
+                     if perfil.es_cliente else Pago.objects.none())
+
+        pagos = FILTROS_PAGO.aplicar(pagos, request)
+        opciones = opciones_de_campos(request)
+        pagos = precargar(pagos, PagoSerializer(**opciones))
+        paginador = PaginacionCursor(ordering=FILTROS_PAGO.ordenar(request, ('-id',)))
+        pagina = paginador.paginate_queryset(pagos, request)
+        if pagina is not None:
+            return paginador.get_paginated_response(PagoSerializer(pagina, many=True, **opciones).data)
+
+        serializer = PagoSerializer(pagos, many=True, **opciones)
         return Response(serializer.data)
     """
     Gestión de Pagos. Al crear uno, verifica si la factura se completó.
@@ -440,33 +541,41 @@ def lista_pagos(request):
 def lista_siniestros(request):
     # --- GET: LISTAR (Con Filtros de Seguridad) ---
     if request.method == 'GET':
-        usuario = request.user
+        perfil = perfil_de(request)
         
-        if usuario.rol == 'ADMIN':
+        if perfil.es_admin:
             # Admin ve todo
             siniestros = Siniestro.objects.all().order_by('-fecha_reporte')
             
-        elif usuario.rol == 'AGENTE':
+        elif perfil.rol == 'AGENTE':
             # Agente ve siniestros de SUS clientes
             # (Filtramos por pólizas donde el agente sea este usuario)
-            if hasattr(usuario, 'agente'):
-                siniestros = Siniestro.objects.filter(poliza__agente=usuario.agente).order_by('-fecha_reporte')
+            if perfil.es_agente:
+                siniestros = Siniestro.objects.filter(poliza__agente_id=perfil.agente_id).order_by('-fecha_reporte')
             else:
                 siniestros = Siniestro.objects.none()
 
-        elif usuario.rol == 'CLIENTE':
+        elif perfil.rol == 'CLIENTE':
             # Cliente ve SOLO sus siniestros
             # (Filtramos por pólizas que pertenezcan al cliente de este usuario)
-            if hasattr(usuario, 'cliente'):
-                siniestros = Siniestro.objects.filter(poliza__cliente__usuario=usuario).order_by('-fecha_reporte')
+            if perfil.es_cliente:
+                siniestros = Siniestro.objects.filter(poliza__cliente_id=perfil.cliente_id).order_by('-fecha_reporte')
             else:
                 siniestros = Siniestro.objects.none()
         
         else:
             siniestros = Siniestro.objects.none()
 
-        serializer = SiniestroSerializer(siniestros, many=True)
-        return Response(serializer.data)
+        siniestros = FILTROS_SINIESTRO.aplicar(siniestros, request)
+        opciones = opciones_de_campos(request)
+        siniestros = precargar(siniestros, SiniestroSerializer(**opciones))
+        paginador = PaginacionCursor(ordering=FILTROS_SINIESTRO.ordenar(request, ('-fecha_reporte',)))
+        pagina = paginador.paginate_queryset(siniestros, request)
+        if pagina is not None:
+            return paginador.get_paginated_response(SiniestroSerializer(pagina, many=True, **opciones).data)
+
+        # Lista completa: lectura rápida con values(), misma salida que SiniestroSerializer
+        return Response(lectura_rapida.leer(siniestros, SiniestroSerializer(**opciones)))
 
     # --- POST: REPORTAR SINIESTRO ---
     elif request.method == 'POST':
@@ -475,8 +584,7 @@ def lista_siniestros(request):
         if serializer.is_valid():
             try:
                 # Generamos número de siniestro automático
-                import random
-                numero_gen = f"SIN-{random.randint(10000, 99999)}"
+                numero_gen = numeracion.siguiente('siniestro')
                 
                 # Guardamos inyectando el número y la fecha
                 siniestro = serializer.save(
@@ -497,8 +605,15 @@ def lista_siniestros(request):
 @permission_classes([IsAuthenticated])
 def lista_notas_poliza(request):
     if request.method == 'GET':
-        notas = NotaPoliza.objects.all()
-        serializer = NotaPolizaSerializer(notas, many=True)
+        notas = FILTROS_NOTA.aplicar(NotaPoliza.objects.all(), request)
+        opciones = opciones_de_campos(request)
+        notas = precargar(notas, NotaPolizaSerializer(**opciones))
+        paginador = PaginacionCursor(ordering=FILTROS_NOTA.ordenar(request, ('-id',)))
+        pagina = paginador.paginate_queryset(notas, request)
+        if pagina is not None:
+            return paginador.get_paginated_response(NotaPolizaSerializer(pagina, many=True, **opciones).data)
+
+        serializer = NotaPolizaSerializer(notas, many=True, **opciones)
         return Response(serializer.data)
 
     elif request.method == 'POST':
@@ -512,13 +627,14 @@ def lista_notas_poliza(request):
 @api_view(['GET', 'PATCH'])
 @permission_classes([IsAuthenticated])
 def detalle_siniestro(request, siniestro_id):
+    opciones = opciones_de_campos(request)
     try:
-        siniestro = Siniestro.objects.get(id=siniestro_id)
+        siniestro = precargar(Siniestro.objects.all(), SiniestroSerializer(**opciones)).get(id=siniestro_id)
     except Siniestro.DoesNotExist:
         return Response({'error': 'Siniestro no encontrado'}, status=status.HTTP_404_NOT_FOUND)
 
     if request.method == 'GET':
-        serializer = SiniestroSerializer(siniestro)
+        serializer = SiniestroSerializer(siniestro, **opciones)
         return Response(serializer.data)
 
     elif request.method == 'PATCH':
@@ -542,9 +658,10 @@ def detalle_siniestro(request, siniestro_id):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def detalle_nota_poliza(request, nota_id):
+    opciones = opciones_de_campos(request)
     try:
-        nota = NotaPoliza.objects.get(id=nota_id)
-        serializer = NotaPolizaSerializer(nota)
+        nota = precargar(NotaPoliza.objects.all(), NotaPolizaSerializer(**opciones)).get(id=nota_id)
+        serializer = NotaPolizaSerializer(nota, **opciones)
         return Response(serializer.data)
     except NotaPoliza.DoesNotExist:
         return Response({'error': 'Nota no encontrada'}, status=status.HTTP_404_NOT_FOUND)
@@ -841,8 +958,15 @@ def registrar_cliente_publico(request):
 @permission_classes([IsAuthenticated])
 def lista_notas_poliza(request):
     if request.method == 'GET':
-        notas = NotaPoliza.objects.all()
-        serializer = NotaPolizaSerializer(notas, many=True)
+        notas = FILTROS_NOTA.aplicar(NotaPoliza.objects.all(), request)
+        opciones = opciones_de_campos(request)
+        notas = precargar(notas, NotaPolizaSerializer(**opciones))
+        paginador = PaginacionCursor(ordering=FILTROS_NOTA.ordenar(request, ('-id',)))
+        pagina = paginador.paginate_queryset(notas, request)
+        if pagina is not None:
+            return paginador.get_paginated_response(NotaPolizaSerializer(pagina, many=True, **opciones).data)
+
+        serializer = NotaPolizaSerializer(notas, many=True, **opciones)
         return Response(serializer.data)
     
     elif request.method == 'POST':
@@ -855,14 +979,16 @@ def lista_notas_poliza(request):
 # APIs para detalles individuales
 @api_view(['GET', 'PATCH'])
 @permission_classes([IsAuthenticated])
+@condicional(validadores_siniestro)
 def detalle_siniestro(request, siniestro_id):
+    opciones = opciones_de_campos(request)
     try:
-        siniestro = Siniestro.objects.get(id=siniestro_id)
+        siniestro = precargar(Siniestro.objects.all(), SiniestroSerializer(**opciones)).get(id=siniestro_id)
     except Siniestro.DoesNotExist:
         return Response({'error': 'Siniestro no encontrado'}, status=status.HTTP_404_NOT_FOUND)
 
     if request.method == 'GET':
-        serializer = SiniestroSerializer(siniestro)
+        serializer = SiniestroSerializer(siniestro, **opciones)
         return Response(serializer.data)
 
     elif request.method == 'PATCH':
@@ -889,11 +1015,13 @@ def detalle_siniestro(request, siniestro_id):
 # En seguros/views.py - ACTUALIZAR lista_agentes
 @api_view(['GET'])
 @permission_classes([IsAdminUser])
+@en_cache(alcance='rol')
 def lista_agentes(request):
     """
     Lista todos los AGENTES (objetos Agente), no usuarios.
     """
     if request.method == 'GET':
+        depende_de(request, 'agentes')
         # Cambiar: devolver objetos Agente, no Usuario
         agentes = Agente.objects.all().select_related('usuario')
         serializer = AgenteSerializer(agentes, many=True)  # ← Usar AgenteSerializer, no UsuarioAgenteSerializer
@@ -940,16 +1068,18 @@ def crear_cliente(request):
 # API para detalles de cliente (ver y editar desde agente)
 @api_view(['GET', 'PUT', 'PATCH']) # <-- ¡ASEGÚRATE DE QUE ESTÉ ASÍ (SIN #)!
 @permission_classes([IsAuthenticated])
+@condicional(validadores_cliente)
 def detalle_cliente(request, cliente_id):
+    opciones = opciones_de_campos(request)
     try:
-        cliente = Cliente.objects.get(id=cliente_id)
+        cliente = precargar(Cliente.objects.all(), ClienteSerializer(**opciones)).get(id=cliente_id)
     except Cliente.DoesNotExist:
         return Response({'error': 'Cliente no encontrado'}, status=status.HTTP_404_NOT_FOUND)
 
     # --- VER (GET) ---
     if request.method == 'GET':
         # Usamos el serializer estándar para VER (tiene usuario_info)
-        serializer = ClienteSerializer(cliente)
+        serializer = ClienteSerializer(cliente, **opciones)
         return Response(serializer.data)
 
     # --- EDITAR (PATCH/PUT) ---
@@ -1074,14 +1204,15 @@ def cancelar_poliza(request, poliza_id):
 # APIs para que un cliente vea y edite su propio perfil
 @api_view(['GET', 'PATCH'])
 @permission_classes([IsAuthenticated]) # Solo usuarios logueados
+@en_cache(alcance='usuario')
 def mi_perfil_cliente(request):
-    try:
-        # Busca el cliente asociado al usuario actual
-        cliente = Cliente.objects.get(usuario=request.user)
-    except Cliente.DoesNotExist:
+    # El cliente asociado al usuario actual (ya viene cargado con el usuario)
+    cliente = perfil_de(request).cliente
+    if cliente is None:
         return Response({'error': 'Perfil de cliente no encontrado'}, status=status.HTTP_404_NOT_FOUND)
 
     if request.method == 'GET':
+        depende_de(request, f'cliente:{cliente.id}', f'usuario:{cliente.usuario_id}')
         serializer = EditarPerfilClienteSerializer(cliente)
         return Response(serializer.data)
 
@@ -1095,14 +1226,15 @@ def mi_perfil_cliente(request):
 #APIs para que un agente vea y edite su propio perfil
 @api_view(['GET', 'PATCH'])
 @permission_classes([IsAuthenticated])
+@en_cache(alcance='usuario')
 def mi_perfil_agente(request):
-    try:
-        # Busca al Agente asociado al usuario logueado
-        agente = Agente.objects.get(usuario=request.user)
-    except Agente.DoesNotExist:
+    # El Agente asociado al usuario logueado (ya viene cargado con el usuario)
+    agente = perfil_de(request).agente
+    if agente is None:
         return Response({'error': 'Perfil de agente no encontrado'}, status=status.HTTP_404_NOT_FOUND)
 
     if request.method == 'GET':
+        depende_de(request, f'agente:{agente.id}', f'usuario:{agente.usuario_id}')
         serializer = EditarPerfilAgenteSerializer(agente)
         return Response(serializer.data)
 
@@ -1118,9 +1250,8 @@ def mi_perfil_agente(request):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def solicitar_poliza(request):
-    try:
-        cliente = Cliente.objects.get(usuario=request.user)
-    except Cliente.DoesNotExist:
+    cliente = perfil_de(request).cliente
+    if cliente is None:
         return Response({'error': 'No tienes perfil de cliente'}, status=400)
 
     # --- VALIDACIÓN CORREGIDA ---
@@ -1145,8 +1276,7 @@ def solicitar_poliza(request):
         beneficiarios_data = datos.pop('beneficiarios', [])
 
         # 2. Cálculos automáticos para la póliza
-        import random
-        numero_poliza = f"SOL-{random.randint(10000, 99999)}"
+        numero_poliza = numeracion.siguiente('solicitud')
         
         inicio = date.today()
         fin = inicio + timedelta(days=365)
@@ -1206,42 +1336,85 @@ def solicitar_poliza(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def generar_pdf_poliza(request, poliza_id):
+    # (Opcional) Seguridad: Verificar que la póliza pertenezca al usuario que la pide
+    # if poliza.cliente.usuario != request.user:
+    #     return Response({'error': 'No autorizado'}, status=403)
+
+    # Si la póliza no cambió desde el último PDF, se sirve el del disco (ver seguros/documentos.py).
+    # ?firmado=1 lo entrega con la firma digital de la empresa (seguros/firma.py)
     try:
-        # Buscamos la póliza
-        poliza = Poliza.objects.get(id=poliza_id)
-        
-        # (Opcional) Seguridad: Verificar que la póliza pertenezca al usuario que la pide
-        # if poliza.cliente.usuario != request.user:
-        #     return Response({'error': 'No autorizado'}, status=403)
+        if request.query_params.get('firmado') in ('1', 'true'):
+            documento = firma.obtener_pdf_firmado(poliza_id)
+        else:
+            documento = documentos.obtener_pdf(poliza_id)
+    except Poliza.DoesNotExist:
+        return Response({'error': 'Póliza no encontrada'}, status=404)
+    except (documentos.ErrorPdf, firma.ErrorFirma):
+        return Response({'error': 'Error al generar PDF'}, status=500)
+    except ImproperlyConfigured:
+        return Response({'error': 'La firma digital no está configurada'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    return documentos.respuesta_archivo(request, documento.ruta, documento.nombre)
+
+
+#PDF EN SEGUNDO PLANO: SE PIDE, SE CONSULTA EL ESTADO Y SE DESCARGA
+def _datos_trabajo(request, trabajo):
+    datos = {'id': str(trabajo.id), 'poliza': trabajo.poliza_id, 'estado': trabajo.estado}
+    if trabajo.estado == 'listo':
+        datos['descarga'] = request.build_absolute_uri(f'/api/documentos/trabajos/{trabajo.id}/descargar/')
+    elif trabajo.estado == 'error':
+        datos['error'] = trabajo.error
+    return datos
 
+
+def _trabajo_de(request, trabajo_id):
+    """El trabajo si es de quien lo pide (o si es admin); None si no."""
+    perfil = perfil_de(request)
+    trabajo = TrabajoDocumento.objects.filter(id=trabajo_id).first()
+    if trabajo is None or not (perfil.es_admin or trabajo.usuario_id == perfil.usuario_id):
+        return None
+    return trabajo
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def crear_trabajo_pdf(request, poliza_id):
+    try:
+        trabajo = documentos.encolar(poliza_id, perfil_de(request).usuario_id)
     except Poliza.DoesNotExist:
         return Response({'error': 'Póliza no encontrada'}, status=404)
+    codigo = status.HTTP_200_OK if trabajo.estado == 'listo' else status.HTTP_202_ACCEPTED
+    return Response(_datos_trabajo(request, trabajo), status=codigo)
 
-    # Datos que enviaremos al HTML del PDF
-    context = {
-        'poliza': poliza,
-        'cliente': poliza.cliente,
-        'usuario': poliza.cliente.usuario,
-        'beneficiarios': poliza.beneficiarios.all(),
-        'fecha_hoy': date.today()
-    }
 
-    # Renderizar el HTML (Crearemos este archivo en el siguiente paso)
-    template = get_template('poliza_pdf.html')
-    html = template.render(context)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def estado_trabajo_pdf(request, trabajo_id):
+    trabajo = _trabajo_de(request, trabajo_id)
+    if trabajo is None:
+        return Response({'error': 'Trabajo no encontrado'}, status=404)
+    return Response(_datos_trabajo(request, trabajo))
 
-    # Crear el PDF
-    result = BytesIO()
-    pdf = pisa.pisaDocument(BytesIO(html.encode("ISO-8859-1")), result)
 
-    if not pdf.err:
-        response = HttpResponse(result.getvalue(), content_type='application/pdf')
-        # Esto hace que se descargue con el nombre correcto
-        filename = f"Poliza_{poliza.numero_poliza}.pdf"
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
-        return response
-    
-    return Response({'error': 'Error al generar PDF'}, status=500)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def descargar_trabajo_pdf(request, trabajo_id):
+    trabajo = _trabajo_de(request, trabajo_id)
+    if trabajo is None:
+        return Response({'error': 'Trabajo no encontrado'}, status=404)
+    if trabajo.estado != 'listo':
+        return Response(_datos_trabajo(request, trabajo), status=status.HTTP_409_CONFLICT)
+
+    ruta = documentos.ruta(trabajo.huella)
+    if not ruta.exists():
+        # Se borró del disco: se vuelve a generar (puede ser una versión más nueva)
+        try:
+            documento = documentos.obtener_pdf(trabajo.poliza_id)
+        except (Poliza.DoesNotExist, documentos.ErrorPdf):
+            return Response({'error': 'Error al generar PDF'}, status=500)
+        return documentos.respuesta_archivo(request, documento.ruta, documento.nombre)
+    nombre = documentos.nombre_descarga(trabajo.poliza.numero_poliza)
+    return documentos.respuesta_archivo(request, ruta, nombre)
 
 
 # en seguros/views.py
@@ -1271,18 +1444,9 @@ def toggle_estado_cliente(request, cliente_id):
 
     # 2. Lógica de Negocio: Si se está dando de BAJA (False)
     if nuevo_estado is False:
-        # Buscamos pólizas que estén 'vivas' (activa, pendiente, cotización)
-        polizas_activas = Poliza.objects.filter(
-            cliente=cliente, 
-            estado__in=['activa', 'pendiente_pago', 'cotizacion']
-        )
-        
-        # Las pasamos a 'inactiva'
-        count = 0
-        for p in polizas_activas:
-            p.estado = 'inactiva'
-            p.save()
-            count += 1
+        # Sus pólizas 'vivas' (activa, pendiente, cotización) pasan a 'inactiva'
+        # con un UPDATE, no un save() por póliza (ver ciclo_vida.py)
+        count = ciclo_vida.inactivar_polizas_cliente(cliente.id)
             
         mensaje = f'Cliente desactivado y {count} pólizas inactivadas.'
     else:
@@ -1295,30 +1459,35 @@ def toggle_estado_cliente(request, cliente_id):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def agente_dashboard_stats(request):
-    try:
-        agente = Agente.objects.get(usuario=request.user)
-    except Agente.DoesNotExist:
+    # Totales, ventas del mes y últimas ventas vienen precalculados en
+    # EstadisticaAgente (ver seguros/estadisticas.py): una lectura por PK.
+    perfil = perfil_de(request)
+    if not perfil.es_agente:
         return Response({'error': 'No eres un agente'}, status=403)
 
-    # 1. Totales Básicos
-    total_clientes = Cliente.objects.filter(agente=agente).count()
-    polizas_activas = Poliza.objects.filter(agente=agente, estado='activa').count()
+    hoy = timezone.localdate()
+    ventas_mes = EstadisticaAgenteMes.objects.filter(
+        agente_id=OuterRef('agente_id'), anio=hoy.year, mes=hoy.month
+    ).values('ventas_monto')[:1]
+    consulta = (EstadisticaAgente.objects.select_related('agente')
+                .annotate(ventas_mes=Subquery(ventas_mes))
+                .filter(agente_id=perfil.agente_id))
+    estadistica = consulta.first()
+    if estadistica is None:
+        # Agente sin fila todavía (creado antes de la tabla): se reconstruye una vez
+        estadisticas.recalcular_agente(perfil.agente_id)
+        estadistica = consulta.first()
+    agente = estadistica.agente
+
     solicitudes_pendientes = Poliza.objects.filter(estado='cotizacion').count() # O filtra solo las asignadas si aplica
 
-    # 2. Finanzas del Mes
-    hoy = timezone.now().date()
-    ventas_mes_monto = Poliza.objects.filter(
-        agente=agente,
-        estado='activa',
-        creado_en__month=hoy.month,
-        creado_en__year=hoy.year
-    ).aggregate(total=Sum('prima_anual'))['total'] or 0
-    
     # Calculamos comisión (ej: el agente gana el porcentaje definido en su perfil, o 10% por defecto)
+    ventas_mes_monto = estadistica.ventas_mes or 0
     porcentaje_comision = agente.comision if agente.comision else 10
     comisiones_estimadas = float(ventas_mes_monto) * (float(porcentaje_comision) / 100)
 
-    # 3. Pólizas por Vencer (Próximos 30 días) - ¡Oportunidad de Venta!
+    # Pólizas por Vencer (Próximos 30 días) - ¡Oportunidad de Venta!
+    # Depende del día de hoy, así que no se precalcula
     fecha_limite = hoy + timedelta(days=30)
     por_vencer_qs = Poliza.objects.filter(
         agente=agente,
@@ -1335,39 +1504,112 @@ def agente_dashboard_stats(request):
             'vence': p.fecha_vencimiento
         })
 
-    # 4. Últimas Ventas (Actividad Reciente)
-    ultimas_ventas_qs = Poliza.objects.filter(
-        agente=agente, 
-        estado='activa'
-    ).order_by('-creado_en')[:5]
-
-    ultimas_ventas_data = []
-    for p in ultimas_ventas_qs:
-        ultimas_ventas_data.append({
-            'id': p.id,
-            'plan': p.cobertura.split('.')[0] if p.cobertura else 'Seguro',
-            'monto': p.prima_anual,
-            'fecha': p.creado_en.date()
-        })
-
     data = {
-        'total_clientes': total_clientes,
-        'polizas_activas': polizas_activas,
+        'total_clientes': estadistica.total_clientes,
+        'polizas_activas': estadistica.polizas_activas,
         'solicitudes_pendientes': solicitudes_pendientes,
         'ventas_mes': ventas_mes_monto,
         'comisiones_mes': comisiones_estimadas, # Nuevo
         'por_vencer': por_vencer_data,          # Nuevo
-        'ultimas_ventas': ultimas_ventas_data   # Nuevo
+        'ultimas_ventas': estadistica.ultimas_ventas   # Nuevo
     }
     
     return Response(data)
 
 
+# en seguros/views.py
+#API CON LOS TOTALES DEL PANEL DEL ADMINISTRADOR
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def admin_dashboard_stats(request):
+    """
+    Totales del panel de administración calculados en la BD
+    (antes el frontend descargaba las 4 listas completas para contarlas).
+    """
+    # 1. Pólizas: conteo por estado y primas en una sola consulta
+    agregados_polizas = {'total': Count('id'), 'total_primas': Sum('prima_anual'),
+                         'primas_activas': Sum('prima_anual', filter=Q(estado='activa'))}
+    for estado, _ in Poliza.ESTADO_CHOICES:
+        agregados_polizas[estado] = Count('id', filter=Q(estado=estado))
+    polizas = Poliza.objects.aggregate(**agregados_polizas)
+
+    # 2. Siniestros: igual, con montos reclamados y aprobados
+    agregados_siniestros = {'total': Count('id'), 'total_reclamado': Sum('monto_reclamado'),
+                            'total_aprobado': Sum('monto_aprobado', filter=Q(estado__in=['aprobado', 'pagado']))}
+    for estado, _ in Siniestro.ESTADO_SINIESTRO:
+        agregados_siniestros[estado] = Count('id', filter=Q(estado=estado))
+    siniestros = Siniestro.objects.aggregate(**agregados_siniestros)
+
+    # 3. Actividad reciente (solo las columnas que muestra el panel)
+    ultimas_polizas = Poliza.objects.order_by('-id').values(
+        'id', 'numero_poliza', 'estado', 'prima_anual',
+        'cliente__usuario__first_name', 'cliente__usuario__last_name'
+    )[:5]
+    ultimos_siniestros = Siniestro.objects.order_by('-id').values(
+        'id', 'numero_siniestro', 'estado', 'tipo_siniestro', 'monto_reclamado', 'poliza__numero_poliza'
+    )[:5]
+    agentes_recientes = Agente.objects.order_by('-id').values(
+        'id', 'usuario__username', 'usuario__first_name', 'usuario__last_name', 'usuario__email'
+    )[:5]
+
+    data = {
+        'total_agentes': Agente.objects.count(),
+        'total_clientes': Cliente.objects.count(),
+        'total_polizas': polizas['total'],
+        'total_siniestros': siniestros['total'],
+        'polizas_activas': polizas['activa'],
+        'polizas_cotizacion': polizas['cotizacion'],
+        'siniestros_pendientes': siniestros['reportado'] + siniestros['en_revision'],
+        'siniestros_aprobados': siniestros['aprobado'],
+        'total_primas': polizas['total_primas'] or 0,
+        'primas_activas': polizas['primas_activas'] or 0,
+        'total_reclamado': siniestros['total_reclamado'] or 0,
+        'total_aprobado': siniestros['total_aprobado'] or 0,
+        'polizas_por_estado': {estado: polizas[estado] for estado, _ in Poliza.ESTADO_CHOICES if polizas[estado]},
+        'siniestros_por_estado': {estado: siniestros[estado] for estado, _ in Siniestro.ESTADO_SINIESTRO if siniestros[estado]},
+        'ultimas_polizas': [{
+            'id': p['id'],
+            'numero_poliza': p['numero_poliza'],
+            'estado': p['estado'],
+            'prima_anual': p['prima_anual'],
+            'cliente': f"{p['cliente__usuario__first_name']} {p['cliente__usuario__last_name']}",
+        } for p in ultimas_polizas],
+        'ultimos_siniestros': [{
+            'id': s['id'],
+            'numero_siniestro': s['numero_siniestro'],
+            'estado': s['estado'],
+            'tipo_siniestro': s['tipo_siniestro'],
+            'monto_reclamado': s['monto_reclamado'],
+            'numero_poliza': s['poliza__numero_poliza'],
+        } for s in ultimos_siniestros],
+        'agentes_recientes': [{
+            'id': a['id'],
+            'username': a['usuario__username'],
+            'first_name': a['usuario__first_name'],
+            'last_name': a['usuario__last_name'],
+            'email': a['usuario__email'],
+        } for a in agentes_recientes],
+    }
+
+    return Response(data)
+
+
+# en seguros/views.py
+#ACIERTOS Y FALLOS DE LA CACHE DE RESPUESTAS (PARA AJUSTARLA)
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminUser])
+def estadisticas_cache(request):
+    if request.method == 'DELETE':
+        cache_respuestas.reiniciar_estadisticas()
+    return Response(cache_respuestas.estadisticas())
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def iniciar_pago_qr(request):
     """
-    Crea un intento de pago y devuelve la imagen QR en Base64.
+    Crea un intento de pago y devuelve la URL de su imagen QR (se dibuja
+    aparte, en imagen_qr_pago, y queda en cache).
     """
     factura_id = request.data.get('factura_id')
     try:
@@ -1377,7 +1619,7 @@ def iniciar_pago_qr(request):
 
     # Creamos el registro del pago en estado 'pendiente'
     # Usamos la referencia para identificar este intento único
-    referencia_unica = f"QR-{random.randint(100000, 999999)}"
+    referencia_unica = codigos_qr.nueva_referencia()
     
     pago = Pago.objects.create(
         factura=factura,
@@ -1388,42 +1630,246 @@ def iniciar_pago_qr(request):
         descripcion="Esperando pago por QR..."
     )
 
-    # Generar el código QR (En la vida real, aquí llamarías a la API del Banco)
-    # Aquí generamos un QR que contiene una URL para "Simular el Pago"
-    # (Esto ayuda a probar el flujo sin dinero real)
-    url_simulacion = f"http://localhost:8000/api/pagos/simular-exito/{pago.id}/"
-    
-    qr = qrcode.QRCode(version=1, box_size=10, border=5)
-    qr.add_data(url_simulacion)
-    qr.make(fit=True)
-    img = qr.make_image(fill='black', back_color='white')
-
-    # Convertir imagen a Base64 para enviarla al Frontend
-    buffer = BytesIO()
-    img.save(buffer, format="PNG")
-    img_str = base64.b64encode(buffer.getvalue()).decode()
-
+    # El QR (ver seguros/codigos_qr.py) se dibuja cuando el navegador pide la imagen.
+    # qr_image sigue sirviendo como src de un <img>, ahora con una URL en vez de base64
+    url_qr = request.build_absolute_uri(f'/api/pagos/qr/{referencia_unica}.svg')
     return Response({
         'pago_id': pago.id,
         'referencia': referencia_unica,
-        'qr_image': f"data:image/png;base64,{img_str}",
+        'qr_image': url_qr,
+        'qr_png': request.build_absolute_uri(f'/api/pagos/qr/{referencia_unica}.png'),
         'mensaje': 'Escanea el QR para pagar'
     })
 
+
+# Imagen del QR de un pago. Vista normal de Django: la pide un <img>, que no
+# manda el token, y la referencia es larga y al azar (codigos_qr.nueva_referencia)
+@require_GET
+def imagen_qr_pago(request, referencia, formato):
+    contenido = codigos_qr.imagen(referencia, formato)
+    if contenido is None:
+        raise Http404('Pago no encontrado')
+    respuesta = HttpResponse(contenido, content_type=codigos_qr.FORMATOS[formato])
+    # Para una referencia la imagen no cambia nunca
+    respuesta['Cache-Control'] = 'private, max-age=86400, immutable'
+    return respuesta
+
 # 2. CHECK STATUS (POLLING)
+def _estado_publico(estado):
+    # Lo que ve el cliente: 'completado' o 'pendiente'
+    return 'completado' if estado == 'completado' else 'pendiente'
+
+
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def verificar_estado_pago(request, pago_id):
     """
-    El Frontend llama a esto cada 3 segundos para ver si ya se pagó.
+    Consulta puntual de si ya se pagó. Sale de la cache (estado_pagos.py);
+    la BD solo si no está. 'en_vivo' dice si el servidor corre por ASGI: el
+    frontend pasa entonces a eventos_estado_pago (SSE) y si no sigue
+    preguntando cada 3 segundos.
     """
-    try:
-        pago = Pago.objects.get(id=pago_id)
-        if pago.estado == 'completado':
-            return Response({'status': 'completado'})
-        return Response({'status': 'pendiente'})
-    except Pago.DoesNotExist:
+    estado = estado_pagos.estado(pago_id)
+    if estado is None:
         return Response({'status': 'error'}, status=404)
+    estado = _estado_publico(estado)
+    en_vivo = _bajo_asgi(request)
+
+    # El ETag es el estado mismo: el 304 tampoco necesita la BD
+    etag = quote_etag(f"pago-{pago_id}-{estado}{'-en-vivo' if en_vivo else ''}")
+    if no_modificado(request, etag, None):
+        respuesta = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        respuesta = Response({'status': estado, 'en_vivo': en_vivo})
+    respuesta['ETag'] = etag
+    respuesta['Cache-Control'] = 'private, no-cache'
+    return respuesta
+
+# 2b. ESTADO EN VIVO (SSE / LONG-POLL)
+# Vistas async de Django, no de DRF: servidas por ASGI (univida/asgi.py) cada
+# cliente esperando es una corutina dormida hasta que notificaciones.py avisa
+# que el pago cambió, no una consulta cada 3 segundos.
+# Por WSGI (gunicorn a secas) no esperan: Django junta todo el stream antes
+# de mandarlo y cada espera ocuparía un worker. Ahí responden enseguida con
+# el estado que haya.
+ESPERA_MAXIMA = 30      # long-poll: segundos como mucho antes de responder
+LATIDO_SSE = 15         # comentario para que los proxies no corten la conexión
+DURACION_SSE = 5 * 60   # después EventSource se reconecta solo
+RECONEXION_SSE = 3000   # ms hasta que EventSource vuelve a conectarse
+
+
+def _bajo_asgi(request):
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+def _no_autenticado():
+    return JsonResponse({'detail': 'Las credenciales de autenticación no se proveyeron o no son válidas.'},
+                        status=401)
+
+
+@require_GET
+async def esperar_estado_pago(request, pago_id):
+    """
+    Long-poll: responde apenas el estado deja de ser ?estado= (por defecto
+    'pendiente'), o a los ?espera= segundos (30 como mucho) con el que haya.
+    """
+    if await sync_to_async(usuario_de)(request) is None:
+        return _no_autenticado()
+    conocido = request.GET.get('estado', 'pendiente')
+    try:
+        espera = max(0.0, min(float(request.GET.get('espera', ESPERA_MAXIMA)), ESPERA_MAXIMA))
+    except ValueError:
+        espera = ESPERA_MAXIMA
+    if not _bajo_asgi(request):
+        espera = 0
+
+    # Primero la suscripción y después la BD: un aviso entre medio no se pierde
+    with notificador().suscribir(canal_pago(pago_id)) as suscripcion:
+        estado = await estado_pagos.aestado(pago_id)
+        if estado is None:
+            return JsonResponse({'status': 'error'}, status=404)
+        estado = _estado_publico(estado)
+        if estado == conocido:
+            aviso = await suscripcion.recibir(espera)
+            if aviso is not None:
+                estado = _estado_publico(aviso)
+    return JsonResponse({'status': estado})
+
+
+@require_GET
+async def eventos_estado_pago(request, pago_id):
+    """
+    Server-sent events: manda el estado al conectar y cada vez que cambia.
+    Termina al completarse el pago. El token va en ?token= (EventSource no
+    manda headers).
+    """
+    if await sync_to_async(usuario_de)(request) is None:
+        return _no_autenticado()
+    if await estado_pagos.aestado(pago_id) is None:
+        return JsonResponse({'status': 'error'}, status=404)
+
+    if not _bajo_asgi(request):
+        # Un solo evento y se corta: EventSource se reconecta a los
+        # RECONEXION_SSE ms, que es lo mismo que preguntar cada 3 segundos
+        estado = _estado_publico(await estado_pagos.aestado(pago_id))
+        respuesta = HttpResponse(f'retry: {RECONEXION_SSE}\ndata: {json.dumps({"status": estado})}\n\n',
+                                 content_type='text/event-stream')
+        respuesta['Cache-Control'] = 'no-cache'
+        return respuesta
+
+    async def eventos():
+        with notificador().suscribir(canal_pago(pago_id)) as suscripcion:
+            estado = _estado_publico(await estado_pagos.aestado(pago_id))
+            yield f'retry: {RECONEXION_SSE}\ndata: {json.dumps({"status": estado})}\n\n'
+            fin = time.monotonic() + DURACION_SSE
+            while estado != 'completado' and time.monotonic() < fin:
+                aviso = await suscripcion.recibir(min(LATIDO_SSE, fin - time.monotonic()))
+                if aviso is None:
+                    yield ': latido\n\n'
+                elif _estado_publico(aviso) != estado:
+                    estado = _estado_publico(aviso)
+                    yield f'data: {json.dumps({"status": estado})}\n\n'
+
+    respuesta = StreamingHttpResponse(eventos(), content_type='text/event-stream')
+    respuesta['Cache-Control'] = 'no-cache'
+    respuesta['X-Accel-Buffering'] = 'no'  # nginx: no juntar los eventos
+    return respuesta
+
+# 2c. CONFIRMACIONES DEL BANCO (WEBHOOK)
+@api_view(['POST'])
+@authentication_classes([])  # El banco no trae JWT: firma el cuerpo con BANCO_SECRETO
+@permission_classes([AllowAny])
+def recibir_confirmaciones_pago(request):
+    """
+    Callback del banco: una confirmación ({"referencia", "estado", "monto"})
+    o varias en {"confirmaciones": [...]}. Solo se guardan (sin repetir
+    referencias) y se contesta enseguida; se aplican por tandas aparte
+    (ver confirmaciones.py).
+    """
+    if not getattr(settings, 'BANCO_SECRETO', None):
+        return Response({'error': 'Confirmaciones del banco no configuradas (BANCO_SECRETO)'},
+                        status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    cuerpo = request.body
+    if not confirmaciones.firma_valida(cuerpo, request.headers.get(confirmaciones.CABECERA_FIRMA)):
+        return Response({'error': 'Firma inválida'}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        datos = json.loads(cuerpo)
+        lista = datos['confirmaciones'] if isinstance(datos, dict) and 'confirmaciones' in datos else [datos]
+        if not isinstance(lista, list) or not lista:
+            raise confirmaciones.ConfirmacionInvalida('No hay confirmaciones')
+        lista = [confirmaciones.normalizar(d) for d in lista]
+    except (ValueError, TypeError) as e:
+        # ConfirmacionInvalida y el JSON mal formado son ValueError
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    nuevas, repetidas = confirmaciones.recibir(lista)
+    return Response({'recibidas': len(lista), 'nuevas': nuevas, 'repetidas': repetidas},
+                    status=status.HTTP_202_ACCEPTED)
+
+# 2d. CONCILIACIÓN DE EXTRACTOS
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def conciliar_extracto(request):
+    """
+    Sube un extracto del banco (campo 'archivo', CSV o camt.053) y lo
+    concilia contra los pagos pendientes y las facturas abiertas (ver
+    conciliacion.py); un agente, solo contra los de sus pólizas. Con
+    ?reporte=csv devuelve el CSV de diferencias.
+    """
+    perfil = perfil_de(request)
+    if not (perfil.es_admin or perfil.es_staff or perfil.es_agente):
+        return Response({'error': 'Solo administradores y agentes concilian extractos'},
+                        status=status.HTTP_403_FORBIDDEN)
+    archivo = request.FILES.get('archivo')
+    if archivo is None:
+        return Response({'error': "Falta el archivo del extracto (campo 'archivo')"},
+                        status=status.HTTP_400_BAD_REQUEST)
+    agente_id = None if perfil.es_admin or perfil.es_staff else perfil.agente_id
+    try:
+        resumen, diferencias = conciliacion.conciliar(archivo.file, agente_id=agente_id)
+    except (conciliacion.ExtractoInvalido, ET.ParseError) as e:
+        return Response({'error': f'No se pudo leer el extracto: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    if request.query_params.get('reporte') == 'csv':
+        respuesta = HttpResponse(content_type='text/csv; charset=utf-8')
+        respuesta['Content-Disposition'] = 'attachment; filename="diferencias.csv"'
+        conciliacion.escribir_reporte(diferencias, respuesta)
+        return respuesta
+    # El JSON trae las primeras; el reporte completo sale con ?reporte=csv
+    return Response({
+        'resumen': resumen,
+        'diferencias': [d._asdict() for d in diferencias[:500]],
+    })
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def importar_usuarios(request):
+    """
+    Alta masiva de clientes o agentes (?tipo=cliente|agente) desde un CSV
+    o JSONL en el campo 'archivo' (ver importacion.py). Con ?reporte=csv
+    devuelve el CSV de errores por fila.
+    """
+    archivo = request.FILES.get('archivo')
+    if archivo is None:
+        return Response({'error': "Falta el archivo a importar (campo 'archivo')"},
+                        status=status.HTTP_400_BAD_REQUEST)
+    try:
+        resumen, errores = importacion.importar(archivo.file, request.query_params.get('tipo', 'cliente'),
+                                                procesos=settings.IMPORTACION_PROCESOS)
+    except importacion.ArchivoInvalido as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if request.query_params.get('reporte') == 'csv':
+        respuesta = HttpResponse(content_type='text/csv; charset=utf-8')
+        respuesta['Content-Disposition'] = 'attachment; filename="errores-importacion.csv"'
+        importacion.escribir_reporte(errores, respuesta)
+        return respuesta
+    # El JSON trae los primeros; el reporte completo sale con ?reporte=csv
+    return Response({
+        'resumen': resumen,
+        'errores': [e._asdict() for e in errores[:500]],
+    })
 
 # 3. WEBHOOK SIMULADO (Para probar)
 @api_view(['GET'])
@@ -1431,28 +1877,23 @@ def verificar_estado_pago(request, pago_id):
 def simular_pago_exitoso(request, pago_id):
     """
     Esta vista simula lo que haría el Banco al confirmar el dinero.
+    Es la URL de todos los QR de pago: entra como una confirmación más del
+    banco (confirmaciones.py), con sus bloqueos y sin aplicar dos veces el
+    mismo pago si el webhook llega también o se escanea dos veces.
     """
     try:
         pago = Pago.objects.get(id=pago_id)
-        
-        # --- LÓGICA DE ACTIVACIÓN AUTOMÁTICA ---
-        if pago.estado != 'completado':
-            pago.estado = 'completado'
-            pago.descripcion = "Pago verificado automáticamente por QR."
-            pago.save()
-            
-            # Actualizar Factura
-            factura = pago.factura
-            factura.estado = 'pagada'
-            factura.save()
-            
-            # Actualizar Póliza
-            poliza = factura.poliza
-            if poliza.estado == 'pendiente_pago':
-                poliza.estado = 'activa'
-                poliza.save()
-                
-        return HttpResponse("<h1>¡Pago Exitoso! ✅</h1><p>Ya puedes cerrar esta ventana. Tu póliza se activará en unos segundos.</p>")
-        
     except Pago.DoesNotExist:
-        return HttpResponse("Error: Pago no encontrado")
\ No newline at end of file
+        return HttpResponse("Error: Pago no encontrado")
+    if not pago.referencia_pago:
+        return HttpResponse("Error: El pago no tiene referencia")
+
+    confirmaciones.recibir([{'referencia': pago.referencia_pago, 'estado_banco': 'completado',
+                             'monto': pago.monto_pagado}], programar=False)
+    confirmaciones.procesar_pendientes()
+
+    pago.refresh_from_db(fields=['estado'])
+    if pago.estado != 'completado':
+        confirmacion = ConfirmacionPago.objects.filter(referencia=pago.referencia_pago).first()
+        return HttpResponse(f"Error: No se pudo confirmar el pago. {confirmacion.detalle if confirmacion else ''}")
+    return HttpResponse("<h1>¡Pago Exitoso! ✅</h1><p>Ya puedes cerrar esta ventana. Tu póliza se activará en unos segundos.</p>")
\ No newline at end of file
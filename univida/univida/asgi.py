@@ -3,6 +3,12 @@ ASGI config for univida project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+El estado de pagos en vivo (eventos_estado_pago / esperar_estado_pago) son
+vistas async: con un servidor ASGI (uvicorn, daphne...) cada conexión
+abierta es una corutina esperando, no un worker ocupado como con WSGI.
+Con gunicorn: gunicorn univida.asgi -k uvicorn.workers.UvicornWorker. Por
+WSGI esas vistas responden enseguida y el frontend pregunta cada 3 s.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
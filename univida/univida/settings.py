@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 import os
+import tempfile
 import dj_database_url
 
 
@@ -53,7 +54,7 @@ MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',  # ← AGREGAR ESTA LÍNEA
     'django.middleware.common.CommonMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'seguros.middleware.WhiteNoiseAsync',  # WhiteNoise, también en modo async (ASGI)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -143,13 +144,118 @@ AUTH_USER_MODEL = 'seguros.Usuario'
 # Configuración REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # Trae también el perfil (agente / cliente) en la misma consulta (seguros/autenticacion.py).
+        # Con AUTENTICACION_JWT=seguros.autenticacion.JWTSinConsulta el usuario sale de
+        # los claims del token y no se consulta la BD (necesita CACHE_REVOCACIONES compartida).
+        os.environ.get('AUTENTICACION_JWT', 'seguros.autenticacion.JWTConPerfil'),
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',  # Para desarrollo
     ]
 }
 
+# Paginación por cursor opcional de las listas (?cursor= / ?page_size=)
+PAGINACION_PAGE_SIZE = 50
+PAGINACION_MAX_PAGE_SIZE = 500
+
+# Workers del servidor web: gunicorn y uvicorn los toman de WEB_CONCURRENCY
+# (Render lo define). Con más de uno, lo que se avisa entre procesos tiene
+# que pasar por algo compartido (ver CACHE_COMPARTIDA y NOTIFICADOR_BACKEND)
+WORKERS = int(os.environ.get('WEB_CONCURRENCY', 1))
+
+# Las caches que tienen que verse entre procesos ('respuestas', 'avisos'): en
+# memoria con un solo proceso, en disco (compartida en la máquina) con varios
+# workers o con las confirmaciones de pago aplicadas por un worker aparte
+# (CONFIRMACIONES_EN_PROCESO=0). Con varias máquinas hace falta una de red,
+# p. ej. CACHE_RESPUESTAS_BACKEND=django.core.cache.backends.redis.RedisCache
+# y CACHE_RESPUESTAS_LOCATION=redis://...
+VARIOS_PROCESOS = WORKERS > 1 or os.environ.get('CONFIRMACIONES_EN_PROCESO', '1') != '1'
+CACHE_COMPARTIDA = ('django.core.cache.backends.filebased.FileBasedCache' if VARIOS_PROCESOS
+                    else 'django.core.cache.backends.locmem.LocMemCache')
+
+
+def _ubicacion_compartida(nombre):
+    return os.path.join(tempfile.gettempdir(), nombre) if VARIOS_PROCESOS else nombre
+
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Cache de respuestas de lectura (seguros/cache_respuestas.py)
+    'respuestas': {
+        'BACKEND': os.environ.get('CACHE_RESPUESTAS_BACKEND', CACHE_COMPARTIDA),
+        'LOCATION': os.environ.get('CACHE_RESPUESTAS_LOCATION', _ubicacion_compartida('univida-respuestas')),
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # Avisos de estado de pago entre workers (seguros/notificaciones.py)
+    'avisos': {
+        'BACKEND': os.environ.get('CACHE_AVISOS_BACKEND', CACHE_COMPARTIDA),
+        'LOCATION': os.environ.get('CACHE_AVISOS_LOCATION', _ubicacion_compartida('univida-avisos')),
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    # Sesiones JWT revocadas (seguros/autenticacion.py). Con varios workers tiene
+    # que ser compartida (CACHE_REVOCACIONES_BACKEND / CACHE_REVOCACIONES_LOCATION)
+    'revocaciones': {
+        'BACKEND': os.environ.get('CACHE_REVOCACIONES_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_REVOCACIONES_LOCATION', 'univida-revocaciones'),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+CACHE_RESPUESTAS = 'respuestas'
+CACHE_AVISOS = 'avisos'
+CACHE_REVOCACIONES = 'revocaciones'
+
+# PDFs generados (seguros/documentos.py): un archivo por huella de contenido.
+# Con varios workers/servidores tiene que ser un directorio compartido.
+DOCUMENTOS_ROOT = os.environ.get('DOCUMENTOS_ROOT', os.path.join(BASE_DIR, 'documentos'))
+DOCUMENTOS_HILOS = int(os.environ.get('DOCUMENTOS_HILOS', 2))
+# True = el trabajo se hace dentro del request (tests, depuración)
+DOCUMENTOS_SINCRONO = False
+
+# Firma digital de los PDF (seguros/firma.py). Para desarrollo se puede
+# generar una CA local con: python manage.py crear_ca_prueba
+FIRMA_CLAVE = os.environ.get('FIRMA_CLAVE')
+FIRMA_CERTIFICADO = os.environ.get('FIRMA_CERTIFICADO')
+FIRMA_CADENA = [ruta for ruta in os.environ.get('FIRMA_CADENA', '').split(',') if ruta]
+FIRMA_CLAVE_PASSWORD = os.environ.get('FIRMA_CLAVE_PASSWORD')
+
+# Estado de pagos en vivo (seguros/notificaciones.py). Con un solo proceso
+# alcanza el Notificador en memoria; con varios workers se usa
+# NotificadorCache sobre la cache 'avisos'. Solo hay SSE si se sirve por ASGI
+# (p. ej. gunicorn univida.asgi -k uvicorn.workers.UvicornWorker); por WSGI
+# el frontend pregunta cada 3 segundos.
+NOTIFICADOR_BACKEND = os.environ.get(
+    'NOTIFICADOR_BACKEND',
+    'seguros.notificaciones.NotificadorCache' if WORKERS > 1 else 'seguros.notificaciones.Notificador')
+# Cada cuánto mira la cache NotificadorCache (segundos)
+NOTIFICADOR_INTERVALO = float(os.environ.get('NOTIFICADOR_INTERVALO', 1))
+
+# Confirmaciones de pago del banco (seguros/confirmaciones.py). Sin secreto
+# el endpoint responde 503.
+BANCO_SECRETO = os.environ.get('BANCO_SECRETO')
+CONFIRMACIONES_TANDA = int(os.environ.get('CONFIRMACIONES_TANDA', 200))
+# False = no se aplican en el proceso web sino con `manage.py procesar_confirmaciones --continuo`
+CONFIRMACIONES_EN_PROCESO = os.environ.get('CONFIRMACIONES_EN_PROCESO', '1') == '1'
+# True = se aplican dentro del request (tests, depuración)
+CONFIRMACIONES_SINCRONO = False
+
+# Números de documento (seguros/numeracion.py): formato por tipo, con
+# {numero}, {anio} y {mes}. Cada worker reserva NUMERACION_BLOQUE de una vez.
+NUMERACION = {
+    'poliza': 'POL-{numero}',
+    'factura': 'FAC-{numero}',
+    'siniestro': 'SIN-{numero}',
+    'solicitud': 'SOL-{numero}',
+}
+NUMERACION_BLOQUE = int(os.environ.get('NUMERACION_BLOQUE', 50))
+
+# Importación masiva de clientes/agentes (seguros/importacion.py): procesos
+# que hashean contraseñas en el endpoint. Por defecto 1, en el mismo worker:
+# los archivos grandes, con el comando importar_usuarios (un proceso por núcleo)
+IMPORTACION_PROCESOS = int(os.environ.get('IMPORTACION_PROCESOS', 1))
+
 # Configuración CORS (permitir frontend)
 CORS_ALLOW_ALL_ORIGINS = True
 